@@ -2,8 +2,10 @@
 Example script to add events to the database programmatically.
 Use this as a template for integrating event logging into your applications.
 """
-from database.connection import get_session
-from database.models import Event, Service
+from database.bulk_load import bulk_load_events
+from database.collector import get_collector, log_event
+from database.connection import get_engine, get_session
+from database.models import Service
 from datetime import datetime, timedelta
 import random
 
@@ -11,6 +13,9 @@ def add_sample_events(service_name: str, num_events: int = 100):
     """
     Add sample events for a service.
     
+    Uses the bulk loader, so large counts are written in batches
+    (COPY on PostgreSQL) rather than one ORM object at a time.
+    
     Args:
         service_name: Name of the service
         num_events: Number of events to add
@@ -28,8 +33,9 @@ def add_sample_events(service_name: str, num_events: int = 100):
             actions = ["login", "checkout", "payment", "transfer", "view_statement", 
                       "apply_loan", "chat_start", "chat_end", "search", "filter"]
             
-            # Generate events
-            events = []
+            service_id = service.id
+
+        def generate_events():
             for i in range(num_events):
                 # Random timestamp in last 30 days
                 days_ago = random.randint(0, 30)
@@ -56,21 +62,19 @@ def add_sample_events(service_name: str, num_events: int = 100):
                         "Invalid input"
                     ])
                 
-                event = Event(
-                    service_id=service.id,
-                    action=action,
-                    status=status,
-                    timestamp=timestamp,
-                    journey_time=journey_time,
-                    error_message=error_message
-                )
-                events.append(event)
-            
-            # Bulk insert
-            session.add_all(events)
-            session.commit()
-            
-            print(f"✅ Successfully added {num_events} events for service '{service_name}'")
+                yield {
+                    "service_id": service_id,
+                    "action": action,
+                    "status": status,
+                    "timestamp": timestamp,
+                    "journey_time": journey_time,
+                    "error_message": error_message
+                }
+        
+        # Bulk insert
+        stats = bulk_load_events(get_engine(), generate_events())
+        
+        print(f"✅ Successfully added {num_events} events for service '{service_name}' ({stats.rows_per_second:,.0f} rows/s)")
             
     except Exception as e:
         print(f"❌ Error adding events: {e}")
@@ -79,41 +83,38 @@ def add_sample_events(service_name: str, num_events: int = 100):
 
 
 def add_single_event(service_name: str, action: str, status: str = "success", 
-                     journey_time: float = None, error_message: str = None):
+                     journey_time: float = None, error_message: str = None,
+                     client_event_id: str = None) -> bool:
     """
     Add a single event.
     
+    The event is queued on the background collector and written with others
+    in a batch, so the caller does not wait for the database. Call
+    get_collector().flush() to wait until queued events are written.
+    
     Args:
         service_name: Name of the service
         action: Action name (e.g., "user_login", "payment_submit")
         status: "success", "error", or "pending"
         journey_time: Time in seconds (optional)
         error_message: Error message if status is "error" (optional)
+        client_event_id: Your own unique id for the event (optional); an event
+            logged again with the same id is written only once
+    
+    Returns:
+        False if the collector's queue is full and the event was not queued
     """
-    try:
-        with get_session() as session:
-            service = session.query(Service).filter(Service.name == service_name).first()
-            
-            if not service:
-                print(f"Service '{service_name}' not found.")
-                return
-            
-            event = Event(
-                service_id=service.id,
-                action=action,
-                status=status,
-                timestamp=datetime.now(),
-                journey_time=journey_time,
-                error_message=error_message
-            )
-            
-            session.add(event)
-            session.commit()
-            
-            print(f"✅ Event added: {action} - {status}")
-            
-    except Exception as e:
-        print(f"❌ Error adding event: {e}")
+    queued = log_event(
+        service_name,
+        action,
+        status=status,
+        journey_time=journey_time,
+        error_message=error_message,
+        client_event_id=client_event_id
+    )
+    if not queued:
+        print(f"❌ Event queue is full; dropped: {action} - {status}")
+    return queued
 
 
 if __name__ == "__main__":
@@ -129,6 +130,7 @@ if __name__ == "__main__":
     #     status="success",
     #     journey_time=2.5
     # )
+    # get_collector().flush()
     
     print("Event logging script ready.")
     print("Uncomment the examples above to add events, or use the functions in your own code.")
@@ -3,6 +3,7 @@ Main Streamlit application entry point.
 Digital Service Analytics & UAT Readiness Platform (v5)
 """
 import streamlit as st
+import time
 import traceback
 from pages.login import show_login_page
 from pages.dashboard import show_dashboard_page
@@ -10,10 +11,13 @@ from pages.analytics import show_analytics_page
 from pages.uat_tracker import show_uat_tracker_page
 from pages.reports import show_reports_page
 from utils.auth import init_session_state, check_role_access
-from database.connection import init_database
+from config.settings import get_debug_config
+from database.connection import init_database, get_pool_stats
+from database.instrumentation import start_query_log, log_query_summary
+from database.scheduler import start_scheduler
 from utils.data_generator import generate_sample_data
 from utils.logger import logger
-from utils.ui import inject_custom_css
+from utils.ui import inject_custom_css, render_performance_panel
 
 # Page configuration
 st.set_page_config(
@@ -33,11 +37,15 @@ except Exception as e:
     st.error(f"Error initializing session: {e}")
     logger.error(f"Error initializing session: {e}")
 
-# Initialize database (non-blocking)
+# Initialize database (non-blocking). init_database is cached per process, so
+# only the first run pays for the schema check; later reruns are a cache hit.
 _db_initialized = False
 try:
+    _init_start = time.perf_counter()
     init_database()
+    start_scheduler()
     _db_initialized = True
+    logger.debug(f"Database bootstrap on rerun took {(time.perf_counter() - _init_start) * 1000:.2f} ms")
 except Exception as e:
     logger.error(f"Database initialization error: {e}")
     # Don't stop the app - allow login page to show
@@ -46,6 +54,14 @@ except Exception as e:
 
 def main():
     """Main application logic."""
+    # Record every SQL statement issued during this rerun
+    debug_config = get_debug_config()
+    query_log = start_query_log(
+        detect_n_plus_one=bool(debug_config["detect_n_plus_one"]),
+        n_plus_one_threshold=int(debug_config["n_plus_one_threshold"]),
+        query_budget=debug_config["query_budget"],
+    )
+
     # Check authentication
     if not st.session_state.get("authenticated", False):
         show_login_page()
@@ -103,6 +119,7 @@ def main():
         key="page_selector"
     )
     st.session_state["selected_page"] = selected_page
+    query_log.page = selected_page
 
     # Logout button
     st.sidebar.markdown("---")
@@ -119,6 +136,16 @@ def main():
         logger.error(f"Error loading page {selected_page}: {e}")
         st.exception(e)
 
+    log_query_summary(query_log)
+    if debug_config["strict"]:
+        query_log.check()
+    if check_role_access(["Analyst"]):
+        try:
+            pool_stats = get_pool_stats()
+        except Exception:
+            pool_stats = None
+        render_performance_panel(query_log, pool_stats)
+
 
 # Always call main() in Streamlit
 if __name__ == "__main__" or True:  # Always run in Streamlit
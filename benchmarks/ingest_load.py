@@ -0,0 +1,108 @@
+"""
+Load test for the HTTP ingestion service.
+
+Posts NDJSON batches of synthetic events to a running ``ingest_service``
+from concurrent keep-alive connections and reports accepted events per second,
+the response status mix (429/503 show the service shedding load) and request
+latency percentiles.
+
+Start the service against a scratch database, then run from the repository
+root::
+
+    uvicorn ingest_service:app --port 8600
+    python -m benchmarks.ingest_load --url http://127.0.0.1:8600 --service "Online Banking Portal" \\
+        --batches 500 --batch-size 1000 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import List, Tuple
+from urllib.parse import urlsplit
+
+ACTIONS = ["login", "checkout", "payment", "transfer", "view_statement", "search"]
+ERRORS = ["Timeout error", "Validation failed", "Network error", "Invalid input"]
+
+
+def _batch(service: str, size: int, rng: random.Random) -> bytes:
+    now = datetime.now()
+    lines = []
+    for _ in range(size):
+        status = rng.choices(["success", "error", "pending"], weights=[0.85, 0.10, 0.05])[0]
+        lines.append(json.dumps({
+            "service": service,
+            "action": rng.choice(ACTIONS),
+            "status": status,
+            "timestamp": (now - timedelta(seconds=rng.randint(0, 86400))).isoformat(),
+            "journey_time": round(rng.uniform(1.0, 60.0), 3) if status == "success" else None,
+            "error_message": rng.choice(ERRORS) if status == "error" else None,
+        }))
+    return ("\n".join(lines) + "\n").encode()
+
+
+async def _post(reader, writer, host: str, path: str, body: bytes) -> Tuple[int, dict]:
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/x-ndjson\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length)) if length else {}
+
+
+async def _worker(url: str, jobs: asyncio.Queue, results: List[Tuple[int, int, float]]) -> None:
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    try:
+        while True:
+            try:
+                body = jobs.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            status, response = await _post(reader, writer, parts.netloc, "/events", body)
+            results.append((status, response.get("accepted", 0), time.perf_counter() - start))
+    finally:
+        writer.close()
+
+
+async def run(url: str, service: str, batches: int, batch_size: int, concurrency: int) -> None:
+    """Post the batches and print throughput, status counts and latency."""
+    rng = random.Random(42)
+    jobs: asyncio.Queue = asyncio.Queue()
+    for _ in range(batches):
+        jobs.put_nowait(_batch(service, batch_size, rng))
+
+    results: List[Tuple[int, int, float]] = []
+    start = time.perf_counter()
+    await asyncio.gather(*[_worker(url, jobs, results) for _ in range(concurrency)])
+    seconds = time.perf_counter() - start
+
+    accepted = sum(result[1] for result in results)
+    latencies = sorted(result[2] * 1000 for result in results)
+    statuses = Counter(result[0] for result in results)
+    print(f"{len(results):,} requests, {accepted:,} events accepted in {seconds:.1f}s "
+          f"({accepted / seconds:,.0f} events/s)")
+    print("statuses: " + ", ".join(f"{status}: {count:,}" for status, count in sorted(statuses.items())))
+    print(f"latency ms: p50 {statistics.median(latencies):.0f}, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.0f}, max {latencies[-1]:.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8600", help="ingestion service base URL")
+    parser.add_argument("--service", required=True, help="existing service name to log events for")
+    parser.add_argument("--batches", type=int, default=500, help="requests to send")
+    parser.add_argument("--batch-size", type=int, default=1000, help="events per request")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent connections")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.service, args.batches, args.batch_size, args.concurrency))
@@ -3,7 +3,7 @@ Application configuration and settings management.
 """
 import os
 import streamlit as st
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 
 def get_db_config() -> Dict[str, Any]:
@@ -45,3 +45,249 @@ def get_users_config() -> Dict[str, Dict[str, str]]:
 
 
 
+
+
+# Pool profiles. "queue" keeps a client-side pool of TLS connections to Postgres;
+# "transaction" is tuned for a PgBouncer/Supavisor transaction pooler (port 6543),
+# where the server side already multiplexes and connections are cheap to recycle;
+# "null" reproduces the old behaviour of opening a connection per session.
+POOL_PROFILES: Dict[str, Dict[str, Any]] = {
+    "queue": {
+        "size": 5,
+        "max_overflow": 10,
+        "timeout": 30,
+        "recycle": 1800,
+        "pre_ping": True,
+        "use_lifo": True,
+    },
+    "transaction": {
+        "size": 10,
+        "max_overflow": 20,
+        "timeout": 10,
+        "recycle": 300,
+        "pre_ping": True,
+        "use_lifo": False,
+    },
+    "null": {},
+}
+
+
+def get_pool_config() -> Dict[str, Any]:
+    """Get connection pool settings from the optional [db.pool] secrets table."""
+    overrides: Dict[str, Any] = {}
+    try:
+        overrides = dict(st.secrets["db"]["pool"])
+    except (KeyError, FileNotFoundError):
+        pass
+
+    mode = str(overrides.pop("mode", "queue")).lower()
+    if mode not in POOL_PROFILES:
+        raise ValueError(
+            f"Unknown pool mode '{mode}'. Expected one of: {', '.join(POOL_PROFILES)}"
+        )
+
+    config = dict(POOL_PROFILES[mode])
+    config.update(overrides)
+    config["mode"] = mode
+    return config
+
+
+def get_db_backend() -> str:
+    """Get the database backend ("postgresql" or "sqlite") from [db] backend."""
+    try:
+        backend = str(st.secrets["db"].get("backend", "postgresql")).lower()
+    except (KeyError, FileNotFoundError):
+        return "postgresql"
+    if backend not in ("postgresql", "sqlite"):
+        raise ValueError(f"Unknown database backend '{backend}'. Expected 'postgresql' or 'sqlite'")
+    return backend
+
+
+# SQLite profile for CI and edge deployments. WAL lets readers run alongside a
+# writer, synchronous=NORMAL is durable in WAL mode without an fsync per commit,
+# and the memory-mapped I/O and page cache sizes suit multi-million row tables.
+SQLITE_DEFAULTS: Dict[str, Any] = {
+    "path": "test_database.db",
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 268435456,      # 256 MiB
+    "cache_size": -65536,        # negative = KiB, i.e. 64 MiB
+    "busy_timeout": 5000,        # ms to wait on a locked database
+    "analyze_interval": 3600,    # seconds between background ANALYZE runs; 0 disables
+    "analysis_limit": 1000,      # rows sampled per index by ANALYZE
+}
+
+
+def get_sqlite_config() -> Dict[str, Any]:
+    """Get SQLite settings, overridable from an optional [db.sqlite] secrets table."""
+    config = dict(SQLITE_DEFAULTS)
+    try:
+        config.update(dict(st.secrets["db"]["sqlite"]))
+    except (KeyError, FileNotFoundError):
+        pass
+    return config
+
+
+def get_replica_config() -> Optional[Dict[str, Any]]:
+    """
+    Get read-replica settings from the optional [db.replica] secrets table.
+
+    Missing keys fall back to the primary's values, so usually only ``host``
+    (and possibly ``port``) needs to be set. Returns None when no replica is
+    configured.
+    """
+    try:
+        overrides = dict(st.secrets["db"]["replica"])
+    except (KeyError, FileNotFoundError):
+        return None
+
+    config = get_db_config()
+    config["fallback_cooldown"] = 30
+    config.update(overrides)
+    return config
+
+
+def get_debug_config() -> Dict[str, Any]:
+    """
+    Get query diagnostics settings from the optional [debug] secrets table.
+
+    ``detect_n_plus_one`` flags a statement repeated with different parameters at
+    least ``n_plus_one_threshold`` times in one rerun; ``query_budget`` caps the
+    number of statements per rerun. With ``strict`` enabled a violation raises
+    instead of only being logged, which fails AppTest-based test runs.
+    """
+    config: Dict[str, Any] = {
+        "detect_n_plus_one": False,
+        "n_plus_one_threshold": 5,
+        "query_budget": None,
+        "strict": False,
+    }
+    try:
+        config.update(dict(st.secrets["debug"]))
+    except (KeyError, FileNotFoundError):
+        pass
+    return config
+
+
+def get_partitioning_config() -> Dict[str, Any]:
+    """
+    Get events partitioning settings from the optional [db.partitioning] secrets table.
+
+    Partitioning is PostgreSQL-only. With ``enabled`` set, new databases create
+    ``events`` as a table range-partitioned by month; existing databases are
+    converted with ``python manage.py partitions --convert``. ``months_ahead``
+    future partitions are kept ready, and partitions older than
+    ``retention_months`` (None keeps everything) are detached, or dropped when
+    ``drop_expired`` is set.
+    """
+    config: Dict[str, Any] = {
+        "enabled": False,
+        "months_ahead": 3,
+        "retention_months": None,
+        "drop_expired": False,
+    }
+    try:
+        config.update(dict(st.secrets["db"]["partitioning"]))
+    except (KeyError, FileNotFoundError):
+        pass
+    return config
+
+
+def get_rollup_config() -> Dict[str, Any]:
+    """
+    Get event rollup settings from the optional [rollups] secrets table.
+
+    The background scheduler refreshes ``event_rollups`` every
+    ``refresh_interval`` seconds (0 leaves it to ``python manage.py rollups``),
+    aggregating at most ``batch_size`` new events per transaction.
+    """
+    config: Dict[str, Any] = {
+        "refresh_interval": 60,
+        "batch_size": 100_000,
+    }
+    try:
+        config.update(dict(st.secrets["rollups"]))
+    except (KeyError, FileNotFoundError):
+        pass
+    return config
+
+
+def get_dashboard_config() -> Dict[str, Any]:
+    """
+    Get executive dashboard settings from the optional [dashboard] secrets table.
+
+    The dashboard KPIs are read from a materialized summary that the background
+    scheduler rebuilds every ``refresh_interval`` seconds (0 disables the
+    background refresh; ``python manage.py refresh-summary`` still works).
+    """
+    config: Dict[str, Any] = {
+        "refresh_interval": 300,
+    }
+    try:
+        config.update(dict(st.secrets["dashboard"]))
+    except (KeyError, FileNotFoundError):
+        pass
+    return config
+
+
+def get_archive_config() -> Dict[str, Any]:
+    """
+    Get cold-storage archive settings from the optional [archive] secrets table.
+
+    ``python manage.py archive`` moves events older than ``hot_days`` days out
+    of ``events`` into zstd-compressed Parquet files under ``path``, one
+    directory per day, ``batch_size`` events per transaction.
+    """
+    config: Dict[str, Any] = {
+        "path": "event_archive",
+        "hot_days": 90,
+        "batch_size": 100_000,
+    }
+    try:
+        config.update(dict(st.secrets["archive"]))
+    except (KeyError, FileNotFoundError):
+        pass
+    return config
+
+
+def get_collector_config() -> Dict[str, Any]:
+    """
+    Get event collector settings from the optional [collector] secrets table.
+
+    ``log_event`` queues up to ``queue_size`` events in memory; a background
+    thread writes them in batches of at most ``batch_size``, at least every
+    ``flush_interval`` seconds.
+    """
+    config: Dict[str, Any] = {
+        "queue_size": 10_000,
+        "batch_size": 1_000,
+        "flush_interval": 1.0,
+    }
+    try:
+        config.update(dict(st.secrets["collector"]))
+    except (KeyError, FileNotFoundError):
+        pass
+    return config
+
+
+def get_ingest_config() -> Dict[str, Any]:
+    """
+    Get HTTP ingestion service settings from the optional [ingest] secrets table.
+
+    A request body may hold at most ``max_batch_rows`` events in
+    ``max_body_bytes``. At most ``max_concurrent_writes`` batches are written
+    at once; beyond ``max_pending`` accepted requests new ones get 429, and a
+    request that waits ``write_timeout`` seconds for a write slot gets 503.
+    """
+    config: Dict[str, Any] = {
+        "max_body_bytes": 16 * 1024 * 1024,
+        "max_batch_rows": 10_000,
+        "max_concurrent_writes": 4,
+        "max_pending": 32,
+        "write_timeout": 5.0,
+    }
+    try:
+        config.update(dict(st.secrets["ingest"]))
+    except (KeyError, FileNotFoundError):
+        pass
+    return config
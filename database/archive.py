@@ -0,0 +1,283 @@
+"""
+Cold-storage archive of old events.
+
+``archive_events`` moves events older than the hot window out of ``events``
+into Parquet files, one directory per day::
+
+    event_archive/date=2024-01-31/part-000000001201-000000101200.parquet
+
+Files are zstd-compressed, sorted by timestamp, and store action, status and
+error message as (dictionary-encoded) names rather than lookup ids, so they
+can be read without the database. Only events already folded into the hourly
+rollups are archived: KPIs and charts keep covering archived days, and the
+archive only serves raw event rows.
+
+``read_archived_events`` reads them back with the filters pushed down to the
+Parquet reader: day directories outside the date range are skipped and row
+groups are pruned on their timestamp, service and promoted metadata
+statistics. The event explorer (``database.explorer``) pages through it
+together with the events table when a range reaches archived days.
+"""
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.engine import Engine
+from database.dimensions import DIMENSIONS
+from database.event_metadata import PROMOTED_KEYS, promoted_column_name
+from database.models import ArchiveCheckpoint, Event, RollupState
+from database.rollups import ROLLUP_NAME, refresh_rollups
+from utils.logger import logger
+
+ARCHIVE_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("service_id", pa.int64()),
+    ("action", pa.string()),
+    ("status", pa.string()),
+    ("timestamp", pa.timestamp("us")),
+    ("journey_time", pa.float64()),
+    ("error_message", pa.string()),
+    ("event_metadata", pa.string()),  # JSON text
+    # Promoted keys get their own columns so filters on them are pushed down
+    *[(promoted_column_name(key), pa.string()) for key in PROMOTED_KEYS],
+])
+
+# Columns returned by read_archived_events
+EVENT_COLUMNS = ["id", "service_id", "action", "status", "timestamp", "journey_time", "error_message"]
+
+_PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+_CHECKPOINTS = ArchiveCheckpoint.__table__
+
+# Rows per row group: small enough for useful min/max pruning within a day
+ROW_GROUP_SIZE = 50_000
+
+
+def archived_dates(path: str) -> List[date]:
+    """Days with archived events, oldest first."""
+    if not os.path.isdir(path):
+        return []
+    dates = []
+    for entry in os.listdir(path):
+        if entry.startswith("date="):
+            try:
+                dates.append(date.fromisoformat(entry[len("date="):]))
+            except ValueError:
+                continue
+    return sorted(dates)
+
+
+def _days_in(path: str, start: Optional[datetime], end: Optional[datetime]) -> List[date]:
+    return [
+        day for day in archived_dates(path)
+        if (start is None or day >= start.date())
+        and (end is None or datetime.combine(day, datetime.min.time()) < end)
+    ]
+
+
+def archive_overlaps(path: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> bool:
+    """Whether any archived day falls in ``[start, end)``."""
+    return bool(_days_in(path, start, end))
+
+
+def _batch_frame(conn, rows) -> pd.DataFrame:
+    """Decode a batch of event rows into the archive columns."""
+    df = pd.DataFrame(rows, columns=[
+        "id", "service_id", "action_id", "status_id", "timestamp", "journey_time", "error_message_id", "event_metadata",
+    ])
+    for key, dimension in DIMENSIONS.items():
+        ids = df.pop(f"{key}_id")
+        names = dimension.names(conn, ids.dropna().unique())
+        df[key] = ids.map(names)
+    metadata = df.pop("event_metadata")
+    for key in PROMOTED_KEYS:
+        df[promoted_column_name(key)] = metadata.map(
+            lambda value: None if not value or value.get(key) is None else str(value[key])
+        )
+    df["event_metadata"] = metadata.map(lambda value: json.dumps(value) if value else None)
+    return df
+
+
+def _part_name(low: int, high: int) -> str:
+    return f"part-{low:012d}-{high:012d}.parquet"
+
+
+def _write_day(path: str, day: date, df: pd.DataFrame, low: int, high: int) -> None:
+    """Write one day's events of a batch."""
+    directory = os.path.join(path, f"date={day.isoformat()}")
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, _part_name(low, high))
+    table = pa.Table.from_pandas(
+        df.sort_values(["timestamp", "id"])[ARCHIVE_SCHEMA.names], schema=ARCHIVE_SCHEMA, preserve_index=False
+    )
+    pq.write_table(
+        table, f"{target}.tmp", compression="zstd", row_group_size=ROW_GROUP_SIZE, write_statistics=True,
+    )
+    os.replace(f"{target}.tmp", target)
+
+
+def _discard_unfinished_batch(engine: Engine, path: str) -> None:
+    """Delete the files of a batch interrupted before its events were deleted."""
+    source = os.path.abspath(path)
+    with engine.begin() as conn:
+        checkpoint = conn.execute(select(_CHECKPOINTS).where(_CHECKPOINTS.c.path == source)).first()
+        if checkpoint is None:
+            return
+        # Its events are still in the table and are archived again, possibly
+        # in batches with other bounds, so none of its files may stay
+        for day in archived_dates(path):
+            directory = os.path.join(path, f"date={day.isoformat()}")
+            for name in os.listdir(directory):
+                if name.startswith(_part_name(checkpoint.low_id, checkpoint.high_id)):
+                    os.remove(os.path.join(directory, name))
+            if not os.listdir(directory):
+                os.rmdir(directory)
+        conn.execute(delete(_CHECKPOINTS).where(_CHECKPOINTS.c.path == source))
+    logger.info(f"Discarded the unfinished archive batch {checkpoint.low_id}..{checkpoint.high_id} in {path}")
+
+
+def archive_events(
+    engine: Engine,
+    path: str,
+    older_than: datetime,
+    batch_size: int = 100_000,
+    dry_run: bool = False,
+) -> int:
+    """
+    Move rolled-up events with ``timestamp < older_than`` into the archive.
+
+    Each batch's id range is recorded in ``archive_checkpoints`` before its
+    Parquet files are written, and the record is removed in the transaction
+    that deletes its events. The next run deletes the files of a batch that
+    was interrupted in between, whatever its batch size, so no event is
+    archived twice. Returns the number of events archived (or that would be,
+    with ``dry_run``).
+    """
+    refresh_rollups(engine)
+    watermark = func.coalesce(
+        select(RollupState.last_event_id).where(RollupState.name == ROLLUP_NAME).scalar_subquery(), 0
+    )
+    conditions = [Event.timestamp < older_than, Event.id <= watermark]
+
+    if dry_run:
+        with engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(Event).where(*conditions)).scalar()
+
+    _discard_unfinished_batch(engine, path)
+    source = os.path.abspath(path)
+    archived = 0
+    while True:
+        # The range is committed before any file is written
+        with engine.begin() as conn:
+            batch = select(Event.id).where(*conditions).order_by(Event.id).limit(batch_size).subquery()
+            low, high = conn.execute(select(func.min(batch.c.id), func.max(batch.c.id))).one()
+            if low is None:
+                break
+            conn.execute(insert(_CHECKPOINTS).values(path=source, low_id=low, high_id=high))
+
+        with engine.begin() as conn:
+            in_batch = [Event.id >= low, Event.id <= high, *conditions]
+            rows = conn.execute(
+                select(
+                    Event.id, Event.service_id, Event.action_id, Event.status_id, Event.timestamp,
+                    Event.journey_time, Event.error_message_id, Event.event_metadata,
+                ).where(*in_batch).order_by(Event.id)
+            ).all()
+            df = _batch_frame(conn, rows)
+            for day, day_df in df.groupby(df["timestamp"].dt.date):
+                _write_day(path, day, day_df, low, high)
+            conn.execute(delete(Event).where(*in_batch))
+            conn.execute(delete(_CHECKPOINTS).where(_CHECKPOINTS.c.path == source))
+            archived += len(rows)
+            logger.debug(f"Archived events {low}..{high} ({len(rows):,} events)")
+
+    if archived:
+        logger.info(f"Archived {archived:,} events older than {older_than:%Y-%m-%d} to {path}")
+    return archived
+
+
+def read_archived_events(
+    path: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    service_id: Optional[int] = None,
+    metadata: Optional[Dict[str, str]] = None,
+    limit: Optional[int] = None,
+    conditions: Optional[ds.Expression] = None,
+    newest_first: bool = True,
+) -> pd.DataFrame:
+    """
+    Archived events in ``[start, end)``, newest first when limited.
+
+    Returns the ``EVENT_COLUMNS`` with action, status and error message as
+    Categoricals. ``conditions`` is an extra filter on the archive columns,
+    pushed down with the others. With ``limit``, days are read newest first
+    (oldest first when ``newest_first`` is False) until enough rows are found.
+    """
+    days = _days_in(path, start, end)
+    if not days:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+
+    expression = ds.field("date").isin([day.isoformat() for day in days])
+    if start:
+        expression &= ds.field("timestamp") >= pa.scalar(start, pa.timestamp("us"))
+    if end:
+        expression &= ds.field("timestamp") < pa.scalar(end, pa.timestamp("us"))
+    if service_id:
+        expression &= ds.field("service_id") == service_id
+    if conditions is not None:
+        expression &= conditions
+    other_metadata = {}
+    for key, value in (metadata or {}).items():
+        if not value:
+            continue
+        if key in PROMOTED_KEYS:
+            expression &= ds.field(promoted_column_name(key)) == value
+        else:
+            other_metadata[key] = value
+
+    columns = EVENT_COLUMNS + (["event_metadata"] if other_metadata else [])
+    dataset = ds.dataset(path, format="parquet", partitioning=_PARTITIONING)
+
+    def _read(filter_expression) -> pd.DataFrame:
+        df = dataset.to_table(columns=columns, filter=filter_expression).to_pandas(
+            categories=["action", "status", "error_message"]
+        )
+        if other_metadata:
+            # Keys without their own column are matched on the parsed JSON
+            parsed = df.pop("event_metadata").map(lambda text: json.loads(text) if text else {})
+            df = df[parsed.map(lambda values: all(values.get(k) == v for k, v in other_metadata.items()))]
+        return df
+
+    if not limit:
+        return _read(expression).reset_index(drop=True)
+
+    frames, found = [], 0
+    for day in (reversed(days) if newest_first else days):
+        frame = _read(expression & (ds.field("date") == day.isoformat()))
+        frames.append(frame)
+        found += len(frame)
+        if found >= limit:
+            break
+    df = pd.concat(frames, ignore_index=True)
+    for column in ("action", "status", "error_message"):
+        df[column] = df[column].astype("category")
+    return df.sort_values(["timestamp", "id"], ascending=not newest_first).head(limit).reset_index(drop=True)
+
+
+def clear_archive(path: str) -> None:
+    """Delete every archived file (after events are cleared)."""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+
+
+def hot_window_start(hot_days: int, today: Optional[date] = None) -> datetime:
+    """Start of the hot window: midnight ``hot_days`` days ago."""
+    today = today or date.today()
+    return datetime.combine(today - timedelta(days=hot_days), datetime.min.time())
@@ -0,0 +1,187 @@
+"""
+Async database engine and sessions for loading page data concurrently.
+
+Streamlit runs each page script synchronously, so async work is submitted to a
+single long-lived event loop running on a background thread. Keeping one loop
+for the whole process lets the async engines pool their connections (asyncpg
+connections are bound to the loop that created them).
+
+Use ``gather_queries`` to run several independent queries at once, each in its
+own session, so a page waits for the slowest query instead of the sum of all.
+"""
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+import streamlit as st
+from config.settings import get_db_backend, get_pool_config, get_replica_config
+from database.connection import (
+    apply_sqlite_pragmas, build_pool_options, build_postgres_url, get_database_url,
+    mark_replica_down, replica_available,
+)
+from database.instrumentation import get_query_log, instrument_engine, set_query_log
+from utils.logger import logger
+
+AsyncQuery = Callable[[AsyncSession], Awaitable[Any]]
+
+
+@st.cache_resource
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """Start and cache the background event loop that runs all async database work."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="db-async-loop", daemon=True).start()
+    return loop
+
+
+def run_async(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on the database event loop and block until it finishes."""
+    query_log = get_query_log()
+
+    async def _with_query_log():
+        # Attribute statements run on the loop thread to the caller's request
+        set_query_log(query_log)
+        return await coro
+
+    return asyncio.run_coroutine_threadsafe(_with_query_log(), _get_event_loop()).result(timeout)
+
+
+def _async_url(sync_url: str) -> str:
+    """Swap the sync driver in a database URL for its async counterpart."""
+    url = make_url(sync_url)
+    driver = "sqlite+aiosqlite" if url.get_backend_name() == "sqlite" else "postgresql+asyncpg"
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def _create_async_engine(sync_url: str) -> AsyncEngine:
+    """Create an async engine with the same pool profile as the sync engine."""
+    pool_config = get_pool_config()
+    pool_options = build_pool_options(pool_config)
+    # The sync pool class is not async-aware; let SQLAlchemy pick the async
+    # adapted queue pool and keep only the sizing options.
+    if pool_options["poolclass"] is not NullPool:
+        pool_options.pop("poolclass")
+
+    if get_db_backend() == "sqlite":
+        engine = create_async_engine(_async_url(sync_url), echo=False, **pool_options)
+        event.listen(engine.sync_engine, "connect", apply_sqlite_pragmas)
+    else:
+        # asyncpg takes ssl/timeout rather than libpq's sslmode/connect_timeout
+        url = make_url(_async_url(sync_url))
+        connect_args = {"ssl": "require", "timeout": 10}
+        if pool_config["mode"] == "transaction":
+            # A transaction pooler runs each transaction on any server connection,
+            # where statements asyncpg prepared on another one do not exist; the
+            # pooler already multiplexes, so no client-side pool either
+            connect_args["statement_cache_size"] = 0
+            url = url.update_query_dict({"prepared_statement_cache_size": "0"})
+            pool_options = {"poolclass": NullPool}
+        engine = create_async_engine(
+            url,
+            echo=False,
+            connect_args=connect_args,
+            **pool_options
+        )
+    instrument_engine(engine.sync_engine)
+    logger.info(f"Async database engine created ({engine.url.drivername})")
+    return engine
+
+
+@st.cache_resource
+def get_async_engine() -> AsyncEngine:
+    """Create and cache the async engine for the primary database."""
+    return _create_async_engine(get_database_url())
+
+
+@st.cache_resource
+def get_async_replica_engine() -> Optional[AsyncEngine]:
+    """Create and cache the async read-replica engine, or None if none is configured."""
+    if get_db_backend() != "postgresql":
+        return None
+    replica_config = get_replica_config()
+    if replica_config is None:
+        return None
+    return _create_async_engine(build_postgres_url(replica_config))
+
+
+@st.cache_resource
+def get_async_session_factory() -> async_sessionmaker:
+    """Create and cache the async session factory for the primary database."""
+    return async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+
+
+@st.cache_resource
+def get_async_replica_session_factory() -> Optional[async_sessionmaker]:
+    """Create and cache the async read-replica session factory, or None without a replica."""
+    engine = get_async_replica_engine()
+    if engine is None:
+        return None
+    return async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+
+async def _open_readonly_session() -> AsyncSession:
+    """Open an async session on the replica, falling back to the primary."""
+    ReplicaSession = get_async_replica_session_factory()
+    if ReplicaSession is not None and replica_available():
+        session = ReplicaSession()
+        try:
+            await session.connection()
+            return session
+        except OperationalError as e:
+            await session.close()
+            mark_replica_down(e)
+    return get_async_session_factory()()
+
+
+@asynccontextmanager
+async def get_async_session(readonly: bool = False) -> AsyncIterator[AsyncSession]:
+    """Async counterpart of ``database.connection.get_session``."""
+    session = await _open_readonly_session() if readonly else get_async_session_factory()()
+    try:
+        yield session
+        if readonly:
+            await session.rollback()
+        else:
+            await session.commit()
+    except Exception as e:
+        await session.rollback()
+        raise e
+    finally:
+        await session.close()
+
+
+async def _run_in_session(query: AsyncQuery, readonly: bool) -> Any:
+    async with get_async_session(readonly=readonly) as session:
+        return await query(session)
+
+
+def gather_queries(readonly: bool = True, **queries: AsyncQuery) -> Dict[str, Any]:
+    """
+    Run independent queries concurrently and return their results by name.
+
+    Each query is an async callable taking an ``AsyncSession``; every query gets
+    its own session (and connection), since a session cannot be shared between
+    concurrent tasks. Example::
+
+        results = gather_queries(
+            services=count_services,
+            defects=summarize_defects,
+        )
+    """
+    # Resolve the cached factories on the calling (script) thread; the loop
+    # thread then only ever sees cache hits.
+    get_async_session_factory()
+    if readonly:
+        get_async_replica_session_factory()
+
+    async def _gather():
+        results = await asyncio.gather(
+            *(_run_in_session(query, readonly) for query in queries.values())
+        )
+        return dict(zip(queries.keys(), results))
+
+    return run_async(_gather())
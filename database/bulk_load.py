@@ -0,0 +1,297 @@
+"""
+High-throughput bulk loading of events.
+
+``bulk_load_events`` takes an iterable of event dicts (``service_id``,
+``action``, ``status``, ``timestamp`` and optionally ``journey_time``,
+``error_message``, ``event_metadata``, ``client_event_id``) and writes them
+in batches inside a single transaction:
+
+- PostgreSQL: each batch is streamed through ``COPY events (...) FROM STDIN``
+  as CSV, skipping per-row statement overhead entirely.
+- SQLite: each batch is one ``executemany`` of a prepared INSERT.
+
+Names are dictionary-encoded once per batch (see ``database.dimensions``) and
+the encoded tuples go straight to the DB-API cursor. The input is consumed
+lazily, so arbitrarily large sources load in constant memory. Rows go
+straight to the table: rollups pick them up on their next refresh, and no ORM
+hooks run.
+
+Retries are idempotent for events that carry a ``client_event_id``: batches
+with keys are written with ``INSERT ... ON CONFLICT DO NOTHING`` (via a COPY
+into a staging table on PostgreSQL) or ``INSERT OR IGNORE`` (SQLite) against
+the unique ``(client_event_id, timestamp)`` index, so the database drops
+repeats in bulk and ``LoadStats.duplicates`` counts them.
+
+From the command line, ``read_events_csv`` streams a CSV file with a header
+row of ``service`` (name) or ``service_id``, ``action``, ``status``,
+``timestamp`` (ISO 8601) and optional ``journey_time``, ``error_message``,
+``event_metadata`` (JSON) and ``client_event_id`` columns::
+
+    python manage.py load-events events.csv --batch-size 20000
+"""
+import csv
+import io
+import json
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.engine import Connection, Engine
+from database.dimensions import DIMENSIONS
+from database.models import Event, Service
+from utils.logger import logger
+
+DEFAULT_BATCH_SIZE = 10_000
+
+# Columns written, in COPY order
+COPY_COLUMNS = [
+    "service_id", "action_id", "status_id", "timestamp", "journey_time", "error_message_id", "event_metadata",
+    "client_event_id",
+]
+_COLUMN_LIST = ", ".join(f'"{column}"' for column in COPY_COLUMNS)
+_CLIENT_ID = COPY_COLUMNS.index("client_event_id")
+
+# Temporary table COPY fills before a deduplicating INSERT (PostgreSQL)
+_STAGING_TABLE = "events_staging"
+
+
+@dataclass
+class LoadStats:
+    """Outcome of a bulk load."""
+    rows: int = 0  # Rows inserted
+    batches: int = 0
+    seconds: float = 0.0
+    duplicates: int = 0  # Rows skipped because their client_event_id was already loaded
+
+    @property
+    def rows_per_second(self) -> float:
+        return (self.rows + self.duplicates) / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        skipped = f" ({self.duplicates:,} duplicates skipped)" if self.duplicates else ""
+        return (
+            f"{self.rows:,} rows{skipped} in {self.batches:,} batches, "
+            f"{self.seconds:.1f}s ({self.rows_per_second:,.0f} rows/s)"
+        )
+
+
+def batched(rows: Iterable[Dict], batch_size: int) -> Iterator[List[Dict]]:
+    """Split an iterable of rows into lists of at most ``batch_size``."""
+    iterator = iter(rows)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+def _encode_batch(conn: Connection, rows: List[Dict]) -> List[tuple]:
+    """Rows keyed by name as tuples of ``COPY_COLUMNS`` values, ready for the driver."""
+    ids = {key: dimension.ids_for(conn, (row.get(key) for row in rows)) for key, dimension in DIMENSIONS.items()}
+    actions, statuses, errors = ids["action"], ids["status"], ids["error_message"]
+    encoded = []
+    for row in rows:
+        error_message = row.get("error_message")
+        metadata = row.get("event_metadata")
+        encoded.append((
+            row["service_id"],
+            actions[row["action"]],
+            statuses[row.get("status") or "success"],
+            # The text layout SQLAlchemy's SQLite DateTime reads back
+            row["timestamp"].strftime("%Y-%m-%d %H:%M:%S.%f"),
+            row.get("journey_time"),
+            None if error_message is None else errors[error_message],
+            None if metadata is None else json.dumps(metadata),
+            row.get("client_event_id"),
+        ))
+    return encoded
+
+
+def _has_client_ids(rows: List[tuple]) -> bool:
+    return any(row[_CLIENT_ID] is not None for row in rows)
+
+
+def _copy_batch(cursor, rows: List[tuple]) -> int:
+    """
+    Stream one encoded batch through COPY ... FROM STDIN (PostgreSQL).
+
+    COPY cannot skip conflicting rows, so a batch carrying client event ids
+    is copied into a temporary staging table and moved over with
+    ``INSERT ... ON CONFLICT DO NOTHING``. Returns the rows inserted.
+    """
+    buffer = io.StringIO()
+    # Unquoted empty fields (None) are NULL in COPY's CSV format
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    if not _has_client_ids(rows):
+        cursor.copy_expert(f"COPY {Event.__tablename__} ({_COLUMN_LIST}) FROM STDIN WITH (FORMAT csv)", buffer)
+        return len(rows)
+
+    cursor.execute(
+        f"CREATE TEMP TABLE IF NOT EXISTS {_STAGING_TABLE} ON COMMIT DELETE ROWS "
+        f"AS SELECT {_COLUMN_LIST} FROM {Event.__tablename__} WITH NO DATA"
+    )
+    cursor.copy_expert(f"COPY {_STAGING_TABLE} ({_COLUMN_LIST}) FROM STDIN WITH (FORMAT csv)", buffer)
+    cursor.execute(
+        f"INSERT INTO {Event.__tablename__} ({_COLUMN_LIST}) SELECT {_COLUMN_LIST} FROM {_STAGING_TABLE} "
+        f'ON CONFLICT (client_event_id, "timestamp") DO NOTHING'
+    )
+    inserted = cursor.rowcount
+    # Later batches of the same transaction reuse the table
+    cursor.execute(f"TRUNCATE {_STAGING_TABLE}")
+    return inserted
+
+
+def _insert_batch(cursor, rows: List[tuple]) -> int:
+    """Insert one encoded batch with a single executemany (SQLite); returns the rows inserted."""
+    # Only batches with client event ids can hit the unique index
+    verb = "INSERT OR IGNORE" if _has_client_ids(rows) else "INSERT"
+    cursor.executemany(
+        f"{verb} INTO {Event.__tablename__} ({_COLUMN_LIST}) VALUES ({', '.join('?' for _ in COPY_COLUMNS)})",
+        rows,
+    )
+    # executemany sums the rows each execution inserted
+    return cursor.rowcount
+
+
+def read_events_csv(path: str, service_ids: Dict[str, int]) -> Iterator[Dict]:
+    """
+    Stream event rows from a CSV file.
+
+    ``service_ids`` maps service names to ids for files with a ``service``
+    column; an unknown name raises ``ValueError`` with its line number.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            if row.get("service_id"):
+                service_id = int(row["service_id"])
+            elif row.get("service") in service_ids:
+                service_id = service_ids[row["service"]]
+            else:
+                raise ValueError(f"{path}:{reader.line_num}: unknown service {row.get('service')!r}")
+            metadata = row.get("event_metadata")
+            yield {
+                "service_id": service_id,
+                "action": row["action"],
+                "status": row.get("status") or "success",
+                "timestamp": datetime.fromisoformat(row["timestamp"]),
+                "journey_time": float(row["journey_time"]) if row.get("journey_time") else None,
+                "error_message": row.get("error_message") or None,
+                "event_metadata": json.loads(metadata) if metadata else None,
+                "client_event_id": row.get("client_event_id") or None,
+            }
+
+
+def service_ids_by_name(conn: Connection) -> Dict[str, int]:
+    """Every service's id keyed by name, for ``read_events_csv``."""
+    return dict(conn.execute(select(Service.name, Service.id)).all())
+
+
+class ServiceIds:
+    """
+    Thread-safe service name → id cache for loaders that receive names.
+
+    A name or id that is not cached reloads the services, at most once every
+    ``reload_interval`` seconds so a stream of unknown names does not query
+    the table per row.
+    """
+
+    def __init__(self, engine: Engine, reload_interval: float = 5.0):
+        self.engine = engine
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._ids: Dict[str, int] = {}
+        self._known: set = set()
+        self._loaded_at: Optional[float] = None
+
+    def _find(self, lookup: Callable[[], Optional[int]]) -> Optional[int]:
+        with self._lock:
+            found = lookup()
+            now = time.monotonic()
+            if found is not None or (self._loaded_at is not None and now - self._loaded_at < self.reload_interval):
+                return found
+            with self.engine.connect() as conn:
+                self._ids = service_ids_by_name(conn)
+            self._known = set(self._ids.values())
+            self._loaded_at = now
+            return lookup()
+
+    def get(self, name: str) -> Optional[int]:
+        """Id of the service called ``name``, or None if there is none."""
+        return self._find(lambda: self._ids.get(name))
+
+    def exists(self, service_id: int) -> bool:
+        """Whether a service has this id."""
+        return self._find(lambda: service_id if service_id in self._known else None) is not None
+
+    def resolve(self, df: pd.DataFrame) -> pd.Series:
+        """
+        Service ids for a frame with ``service`` and ``service_id`` columns.
+
+        ``service_id`` wins when set; NA where the id or name is unknown. One
+        lookup per distinct value.
+        """
+        given = df["service_id"].dropna().unique()
+        known = {service_id: service_id for service_id in given if self.exists(int(service_id))}
+        names = df["service"].where(df["service_id"].isna())
+        ids = {name: self.get(name) for name in names.dropna().unique()}
+        return df["service_id"].map(known).fillna(names.map(ids)).astype("Int64")
+
+
+def _encode_frame(conn: Connection, df: pd.DataFrame) -> List[tuple]:
+    """``_encode_batch`` column by column, for a validated event frame."""
+    columns = {"service_id": df["service_id"].astype("Int64")}
+    for key, dimension in DIMENSIONS.items():
+        ids = dimension.ids_for(conn, df[key].dropna().unique())
+        columns[f"{key}_id"] = df[key].map(ids).astype("Int64")
+    columns["timestamp"] = df["timestamp"].dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+    columns["journey_time"] = df["journey_time"]
+    columns["event_metadata"] = df["event_metadata"].map(json.dumps, na_action="ignore")
+    columns["client_event_id"] = df["client_event_id"] if "client_event_id" in df.columns else None
+    frame = pd.DataFrame(columns)[COPY_COLUMNS].astype(object)
+    # Plain Python values with None for NA, which every driver binds
+    return list(frame.where(frame.notna(), None).itertuples(index=False, name=None))
+
+
+def _write(conn: Connection, encoded: Iterable[List[tuple]]) -> LoadStats:
+    write_batch = _copy_batch if conn.dialect.name == "postgresql" else _insert_batch
+    stats = LoadStats()
+    start = time.perf_counter()
+    # Straight to the driver: no per-row parameter processing in SQLAlchemy
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        for batch in encoded:
+            inserted = write_batch(cursor, batch)
+            stats.rows += inserted
+            stats.duplicates += len(batch) - inserted
+            stats.batches += 1
+            logger.debug(f"Loaded batch {stats.batches} ({stats.rows:,} rows so far)")
+    finally:
+        cursor.close()
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def load_batches(conn: Connection, rows: Iterable[Dict], batch_size: int = DEFAULT_BATCH_SIZE) -> LoadStats:
+    """Load events on an open connection; the caller owns the transaction."""
+    return _write(conn, (_encode_batch(conn, batch) for batch in batched(rows, batch_size)))
+
+
+def load_frame(conn: Connection, df: pd.DataFrame, batch_size: int = DEFAULT_BATCH_SIZE) -> LoadStats:
+    """
+    Load a validated event frame (see ``validate_event_frame``) with a
+    resolved ``service_id`` column; the caller owns the transaction.
+    """
+    return _write(conn, (
+        _encode_frame(conn, df.iloc[i:i + batch_size]) for i in range(0, len(df), batch_size)
+    ))
+
+
+def bulk_load_events(engine: Engine, rows: Iterable[Dict], batch_size: int = DEFAULT_BATCH_SIZE) -> LoadStats:
+    """Load events in batches within one transaction and report the throughput."""
+    with engine.begin() as conn:
+        stats = load_batches(conn, rows, batch_size)
+    logger.debug(f"Bulk loaded {stats}")
+    return stats
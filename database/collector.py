@@ -0,0 +1,264 @@
+"""
+Buffered write-behind collector for events logged one at a time.
+
+``log_event`` puts the event on a bounded in-memory queue and returns
+immediately; a background thread drains the queue and writes the events with
+the bulk loader in batches of up to ``batch_size``, at least every
+``flush_interval`` seconds. Request handlers never wait for the database.
+
+Back-pressure: when the queue is full, ``log_event`` returns False (or waits
+up to ``timeout`` seconds first) instead of growing without bound, and the
+caller decides whether to drop, retry or slow down. ``flush`` waits until
+everything queued so far is written, and ``close`` (also run at interpreter
+exit) stops accepting events and writes what is left.
+
+Each batch is checked with ``validate_event_frame`` before it is written,
+like events posted to the ingestion service: an event that breaks its rules
+or names an unknown service is logged and counted as failed on its own,
+without failing the rest of its batch.
+
+``metrics`` reports queue depth, accepted/rejected/written/duplicate/failed
+counts and flush latency. Events logged with a ``client_event_id`` are
+written once however often they are logged (see ``database.bulk_load``).
+"""
+import atexit
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+import pandas as pd
+from sqlalchemy.engine import Engine
+from config.settings import get_collector_config
+from database.bulk_load import ServiceIds, load_frame
+from database.connection import get_engine
+from utils.logger import logger
+from utils.validators import validate_event_frame
+
+# Attempts per batch before its events are counted as failed
+WRITE_ATTEMPTS = 3
+
+# Wakes the flusher when the collector closes
+_STOP = object()
+
+
+@dataclass
+class CollectorMetrics:
+    """Snapshot of a collector's counters."""
+    queue_depth: int
+    queue_size: int
+    accepted: int
+    rejected: int
+    written: int
+    duplicates: int
+    failed: int
+    flushes: int
+    last_flush_ms: float
+    max_flush_ms: float
+    avg_flush_ms: float
+
+
+class EventCollector:
+    """Queues events in memory and writes them in batches on a background thread."""
+
+    def __init__(
+        self,
+        engine: Engine,
+        queue_size: int = 10_000,
+        batch_size: int = 1_000,
+        flush_interval: float = 1.0,
+    ):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.service_ids = ServiceIds(engine)
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._closed = threading.Event()
+        # Guards the counters; flush() waits on it for ``processed`` to catch up
+        self._progress = threading.Condition()
+        self._accepted = self._rejected = self._written = self._duplicates = self._failed = self._processed = 0
+        self._flushes = 0
+        self._last_flush = self._max_flush = self._total_flush = 0.0
+        self._thread = threading.Thread(target=self._run, name="event-collector", daemon=True)
+        self._thread.start()
+
+    def log_event(
+        self,
+        service: Union[str, int],
+        action: str,
+        status: str = "success",
+        journey_time: Optional[float] = None,
+        error_message: Optional[str] = None,
+        event_metadata: Optional[Dict] = None,
+        timestamp: Optional[datetime] = None,
+        client_event_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        Queue an event for writing.
+
+        ``service`` is a service name or id. Returns False when the event was
+        rejected because the queue stayed full (immediately, or after
+        ``timeout`` seconds) or the collector is closed.
+        """
+        if self._closed.is_set():
+            return self._reject()
+        row = {
+            "service": service,
+            "action": action,
+            "status": status,
+            "timestamp": timestamp or datetime.now(),
+            "journey_time": journey_time,
+            "error_message": error_message,
+            "event_metadata": event_metadata,
+            "client_event_id": client_event_id,
+        }
+        try:
+            if timeout:
+                self._queue.put(row, timeout=timeout)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            return self._reject()
+        with self._progress:
+            self._accepted += 1
+        return True
+
+    def _reject(self) -> bool:
+        with self._progress:
+            self._rejected += 1
+        return False
+
+    def _next_batch(self) -> List[Dict]:
+        """Wait for events and take up to ``batch_size``, or what arrived within ``flush_interval``."""
+        batch: List[Dict] = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            wait = self.flush_interval if deadline is None else deadline - time.monotonic()
+            if wait <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                break
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return batch
+
+    def _valid_events(self, batch: List[Dict]) -> pd.DataFrame:
+        """The events of ``batch`` that can be written, with resolved service ids."""
+        df = pd.DataFrame.from_records(batch)
+        service = df.pop("service")
+        is_id = service.map(lambda value: isinstance(value, int) and not isinstance(value, bool)).astype(bool)
+        df["service"] = service.where(~is_id)
+        df["service_id"] = service.where(is_id)
+        # One bad event would otherwise fail the whole batch, and every retry of it
+        valid, invalid = validate_event_frame(df)
+        for index, message in invalid.items():
+            logger.warning(f"Event collector dropped an invalid event ({message}): {batch[index]}")
+        # Ids are checked too: one unknown id fails the foreign key for the whole batch
+        valid["service_id"] = self.service_ids.resolve(valid)
+        unknown = valid["service_id"].isna()
+        for index in valid.index[unknown]:
+            logger.warning(f"Event collector dropped an event for unknown service {batch[index]['service']!r}")
+        return valid[~unknown]
+
+    def _write(self, batch: List[Dict]) -> None:
+        start = time.perf_counter()
+        valid = self._valid_events(batch)
+        written = duplicates = 0
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            if valid.empty:
+                break
+            try:
+                with self.engine.begin() as conn:
+                    stats = load_frame(conn, valid, self.batch_size)
+                written, duplicates = stats.rows, stats.duplicates
+                break
+            except Exception as e:
+                logger.warning(f"Event collector write failed (attempt {attempt}/{WRITE_ATTEMPTS}): {e}")
+                if attempt < WRITE_ATTEMPTS:
+                    time.sleep(0.5 * attempt)
+        elapsed = time.perf_counter() - start
+        with self._progress:
+            self._written += written
+            self._duplicates += duplicates
+            self._failed += len(batch) - written - duplicates
+            self._processed += len(batch)
+            self._flushes += 1
+            self._last_flush = elapsed
+            self._max_flush = max(self._max_flush, elapsed)
+            self._total_flush += elapsed
+            self._progress.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            if self._closed.is_set() and self._queue.empty():
+                break
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every event queued so far is written; False on timeout."""
+        with self._progress:
+            target = self._accepted
+            return self._progress.wait_for(lambda: self._processed >= target, timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Stop accepting events, write the ones still queued and stop the thread."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        try:
+            self._queue.put_nowait(_STOP)
+        except queue.Full:
+            pass  # The flusher is busy and will see the closed flag once drained
+        self._thread.join(timeout)
+        logger.info(f"Event collector closed: {self.metrics()}")
+
+    def metrics(self) -> CollectorMetrics:
+        """Current queue depth, counts and flush latency."""
+        with self._progress:
+            return CollectorMetrics(
+                queue_depth=self._queue.qsize(),
+                queue_size=self._queue.maxsize,
+                accepted=self._accepted,
+                rejected=self._rejected,
+                written=self._written,
+                duplicates=self._duplicates,
+                failed=self._failed,
+                flushes=self._flushes,
+                last_flush_ms=self._last_flush * 1000,
+                max_flush_ms=self._max_flush * 1000,
+                avg_flush_ms=self._total_flush / self._flushes * 1000 if self._flushes else 0.0,
+            )
+
+
+_collector: Optional[EventCollector] = None
+_collector_lock = threading.Lock()
+
+
+def get_collector() -> EventCollector:
+    """The process-wide collector, created from ``[collector]`` on first use."""
+    global _collector
+    with _collector_lock:
+        if _collector is None:
+            config = get_collector_config()
+            _collector = EventCollector(
+                get_engine(),
+                queue_size=config["queue_size"],
+                batch_size=config["batch_size"],
+                flush_interval=config["flush_interval"],
+            )
+            atexit.register(_collector.close)
+        return _collector
+
+
+def log_event(service: Union[str, int], action: str, **kwargs) -> bool:
+    """Queue an event on the process-wide collector (see ``EventCollector.log_event``)."""
+    return get_collector().log_event(service, action, **kwargs)
@@ -0,0 +1,113 @@
+"""
+Columnar reads of query results.
+
+``read_frame`` runs a Core select and fetches the rows straight from the DBAPI
+cursor in blocks and converts each block into typed column arrays, which are
+concatenated at the end. No ``Row`` objects, ORM instances or per-row dicts
+are created, SQLAlchemy's per-value result processing (such as parsing
+SQLite's text timestamps one at a time) is replaced by vectorized conversions,
+and Python objects for only one block are alive at a time.
+
+``read_events_frame`` is the events reader behind the event explorer: the
+query selects ids only, and services and the dictionary-encoded columns are
+decoded into Categoricals from their small lookup tables, so no per-row
+strings are built either.
+"""
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.expression import Select
+from database.dimensions import DIMENSIONS, decode_categorical
+from database.models import Event, Service
+
+# Rows fetched from the cursor at a time
+FETCH_BATCH_SIZE = 50_000
+
+# Columns of the events query ``read_events_frame`` expects, with their dtypes
+EVENT_COLUMNS = {
+    "id": "int64",
+    "service_id": "Int64",
+    "action_id": "Int64",
+    "status_id": "Int64",
+    "timestamp": "datetime64[us]",
+    "journey_time": "float64",
+    "error_message_id": "Int64",
+}
+
+
+def read_frame(
+    conn: Connection,
+    query: Select,
+    dtypes: Optional[Dict[str, str]] = None,
+    batch_size: int = FETCH_BATCH_SIZE,
+) -> pd.DataFrame:
+    """
+    Run ``query`` and return its rows as a DataFrame, converted per column.
+
+    ``dtypes`` maps column names to pandas dtypes; ``datetime64`` columns are
+    parsed from the driver's values (text on SQLite) a block at a time. Other
+    columns are inferred by pandas.
+    """
+    dtypes = dtypes or {}
+    result = conn.execute(query)
+    names = list(result.keys())
+    blocks: List[List[pd.Series]] = [[] for _ in names]
+    # Raw driver values: the Row wrapper and its result processors are bypassed
+    cursor = result.cursor
+    try:
+        while rows := cursor.fetchmany(batch_size):
+            # Converted block by block, so Python objects for at most one block are alive
+            for column, name, values in zip(blocks, names, zip(*rows)):
+                column.append(_convert(values, dtypes.get(name)))
+    finally:
+        result.close()
+
+    if not blocks or not blocks[0]:
+        return pd.DataFrame({name: pd.Series([], dtype=dtypes.get(name, object)) for name in names}, columns=names)
+    return pd.DataFrame(
+        {name: pd.concat(column, ignore_index=True) for name, column in zip(names, blocks)}, columns=names
+    )
+
+
+def _convert(values: tuple, dtype: Optional[str]) -> pd.Series:
+    if dtype and dtype.startswith("datetime64"):
+        return pd.Series(pd.to_datetime(values, format="ISO8601"), dtype=dtype)
+    return pd.Series(values, dtype=dtype)
+
+
+def events_select() -> Select:
+    """The columns ``read_events_frame`` expects; add filters, ordering and limits."""
+    return select(*[getattr(Event, name) for name in EVENT_COLUMNS])
+
+
+def decode_services(conn: Connection, service_ids: pd.Series) -> Tuple[pd.Categorical, pd.Categorical]:
+    """Service names and channels as Categoricals, looked up once per distinct service."""
+    ids = pd.Categorical(service_ids)
+    services = {
+        row.id: (row.name, row.channel)
+        for row in conn.execute(select(Service.id, Service.name, Service.channel))
+    }
+    per_service = [services.get(service_id, (None, None)) for service_id in ids.categories]
+    names = pd.Categorical([name for name, _ in per_service])
+    channels = pd.Categorical([channel for _, channel in per_service])
+    return names[ids.codes], channels[ids.codes]
+
+
+def read_events_frame(conn: Connection, query: Select, batch_size: int = FETCH_BATCH_SIZE) -> pd.DataFrame:
+    """
+    Run an ``events_select`` query and return the events the way the pages use them.
+
+    Columns are ``id``, ``service``, ``channel``, ``action``, ``status``,
+    ``timestamp``, ``journey_time`` and ``error_message``; the name columns
+    are Categoricals.
+    """
+    df = read_frame(conn, query, EVENT_COLUMNS, batch_size)
+    service, channel = decode_services(conn, df.pop("service_id"))
+    df.insert(1, "service", service)
+    df.insert(2, "channel", channel)
+    # Ids come back from the database; names are decoded through the lookup
+    # cache into categoricals
+    for key in DIMENSIONS:
+        df.insert(df.columns.get_loc(f"{key}_id"), key, decode_categorical(df.pop(f"{key}_id"), key, conn))
+    return df
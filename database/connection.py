@@ -1,21 +1,61 @@
 """
 Database connection and session management.
+
+The backend is chosen with ``backend`` in the ``[db]`` secrets table: "postgresql"
+(default) or "sqlite" for local testing, CI and edge deployments.
 """
-from sqlalchemy import create_engine
+import os
+import threading
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import NullPool, QueuePool
 from contextlib import contextmanager
-from typing import Generator
+from typing import Any, Dict, Generator, Optional
 from urllib.parse import quote_plus
 import streamlit as st
-from config.settings import get_db_config
-from database.models import Base
+from config.settings import (
+    get_db_backend, get_db_config, get_partitioning_config, get_pool_config,
+    get_replica_config, get_sqlite_config,
+)
+from database.instrumentation import instrument_engine
+from database.migrations import ensure_schema
 from utils.logger import logger
 
 
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait to check out a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wait_lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            with self._wait_lock:
+                self.checkouts += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+
+
 def get_database_url() -> str:
-    """Construct database URL from configuration with proper encoding."""
-    config = get_db_config()
+    """Construct database URL for the configured backend with proper encoding."""
+    if get_db_backend() == "sqlite":
+        return f"sqlite:///{get_sqlite_config()['path']}"
+    return build_postgres_url(get_db_config())
+
+
+def build_postgres_url(config: Dict[str, Any]) -> str:
+    """Build a Postgres URL from a host/port/database/user/password mapping."""
     # URL-encode username and password to handle special characters
     user = quote_plus(config['user'])
     password = quote_plus(config['password'])
@@ -26,22 +66,68 @@ def get_database_url() -> str:
     return f"postgresql://{user}:{password}@{host}:{port}/{database}"
 
 
+def _create_postgres_engine(database_url: str) -> Engine:
+    """Create a pooled Postgres engine."""
+    pool_config = get_pool_config()
+    # Supabase requires SSL connections
+    engine = create_engine(
+        database_url,
+        echo=False,
+        connect_args={
+            "connect_timeout": 10,
+            "sslmode": "require"
+        },
+        **build_pool_options(pool_config)
+    )
+    logger.info(f"Database engine created (postgresql, pool mode: {pool_config['mode']})")
+    return instrument_engine(engine)
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Connect-event hook that applies the SQLite tuning profile to a new connection."""
+    sqlite_config = get_sqlite_config()
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={sqlite_config['journal_mode']}")
+    cursor.execute(f"PRAGMA synchronous={sqlite_config['synchronous']}")
+    cursor.execute(f"PRAGMA mmap_size={int(sqlite_config['mmap_size'])}")
+    cursor.execute(f"PRAGMA cache_size={int(sqlite_config['cache_size'])}")
+    cursor.execute(f"PRAGMA busy_timeout={int(sqlite_config['busy_timeout'])}")
+    cursor.execute(f"PRAGMA analysis_limit={int(sqlite_config['analysis_limit'])}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def _create_sqlite_engine(database_url: str) -> Engine:
+    """Create a SQLite engine with the tuned pragma profile applied to every connection."""
+    sqlite_config = get_sqlite_config()
+    db_dir = os.path.dirname(sqlite_config["path"])
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+
+    engine = create_engine(
+        database_url,
+        echo=False,
+        connect_args={"timeout": sqlite_config["busy_timeout"] / 1000},
+        **build_pool_options(get_pool_config())
+    )
+
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+
+    logger.info(
+        f"Database engine created (sqlite at {sqlite_config['path']}, "
+        f"journal_mode={sqlite_config['journal_mode']})"
+    )
+    return instrument_engine(engine)
+
+
 @st.cache_resource
 def get_engine():
-    """Create and cache database engine."""
+    """Create and cache the database engine for the configured backend."""
     try:
         database_url = get_database_url()
-        # Supabase requires SSL connections
-        engine = create_engine(
-            database_url,
-            poolclass=NullPool,
-            echo=False,
-            connect_args={
-                "connect_timeout": 10,
-                "sslmode": "require"
-            }
-        )
-        return engine
+        if get_db_backend() == "sqlite":
+            return _create_sqlite_engine(database_url)
+        return _create_postgres_engine(database_url)
     except KeyError as e:
         # Database config not set up yet
         st.warning("⚠️ Database not configured. Please set up Supabase credentials in `.streamlit/secrets.toml`")
@@ -58,6 +144,83 @@ def get_engine():
         st.stop()
 
 
+_analyze_lock = threading.Lock()
+_last_analyze: Optional[float] = None
+
+
+def _run_sqlite_analyze(engine: Engine) -> None:
+    """Refresh SQLite planner statistics."""
+    start = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("ANALYZE")
+            conn.commit()
+        logger.info(f"SQLite ANALYZE completed in {(time.perf_counter() - start) * 1000:.1f} ms")
+    except Exception as e:
+        logger.warning(f"SQLite ANALYZE failed: {e}")
+
+
+def _maybe_analyze_sqlite() -> None:
+    """Start a background ANALYZE when the configured interval has elapsed."""
+    global _last_analyze
+    interval = get_sqlite_config()["analyze_interval"]
+    if not interval:
+        return
+    if _last_analyze is not None and time.monotonic() - _last_analyze < interval:
+        return
+    with _analyze_lock:
+        if _last_analyze is not None and time.monotonic() - _last_analyze < interval:
+            return
+        _last_analyze = time.monotonic()
+    threading.Thread(
+        target=_run_sqlite_analyze, args=(get_engine(),), name="sqlite-analyze", daemon=True
+    ).start()
+
+
+def build_pool_options(pool_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Translate a pool profile into create_engine keyword arguments."""
+    if pool_config["mode"] == "null":
+        return {"poolclass": NullPool}
+
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": int(pool_config["size"]),
+        "max_overflow": int(pool_config["max_overflow"]),
+        "pool_timeout": float(pool_config["timeout"]),
+        "pool_recycle": int(pool_config["recycle"]),
+        "pool_pre_ping": bool(pool_config["pre_ping"]),
+        "pool_use_lifo": bool(pool_config.get("use_lifo", False)),
+        # Transaction poolers hand the server connection to another client after
+        # each transaction, so never leave one open when returning to the pool.
+        "pool_reset_on_return": "rollback",
+    }
+
+
+def get_pool_stats(readonly: bool = False) -> Dict[str, Any]:
+    """Return connection pool statistics for sizing the pool under load."""
+    engine = (get_replica_engine() if readonly else None) or get_engine()
+    pool = engine.pool
+    stats: Dict[str, Any] = {"mode": get_pool_config()["mode"], "pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        })
+    if isinstance(pool, TimedQueuePool):
+        with pool._wait_lock:
+            checkouts = pool.checkouts
+            total_wait = pool.total_wait
+            max_wait = pool.max_wait
+        stats.update({
+            "checkouts": checkouts,
+            "avg_wait_ms": (total_wait / checkouts * 1000) if checkouts else 0.0,
+            "max_wait_ms": max_wait * 1000,
+        })
+    return stats
+
+
 @st.cache_resource
 def get_session_factory():
     """Create and cache session factory."""
@@ -65,14 +228,90 @@ def get_session_factory():
     return sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+@st.cache_resource
+def get_replica_engine() -> Optional[Engine]:
+    """Create and cache the read-replica engine, or return None if none is configured."""
+    if get_db_backend() != "postgresql":
+        return None
+    replica_config = get_replica_config()
+    if replica_config is None:
+        return None
+    engine = create_engine(
+        build_postgres_url(replica_config),
+        echo=False,
+        connect_args={
+            "connect_timeout": 5,
+            "sslmode": "require"
+        },
+        **build_pool_options(get_pool_config())
+    )
+    logger.info(f"Read-replica engine created ({replica_config['host']})")
+    return instrument_engine(engine)
+
+
+@st.cache_resource
+def get_replica_session_factory():
+    """Create and cache the read-replica session factory, or None without a replica."""
+    engine = get_replica_engine()
+    if engine is None:
+        return None
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+# monotonic time until which the replica is skipped after a failed connection
+_replica_down_until = 0.0
+
+
+def replica_available() -> bool:
+    """Return False while the replica is in its post-failure cooldown."""
+    return time.monotonic() >= _replica_down_until
+
+
+def mark_replica_down(error: Exception) -> None:
+    """Skip the replica for the configured cooldown after a connection failure."""
+    global _replica_down_until
+    _replica_down_until = time.monotonic() + float(get_replica_config()["fallback_cooldown"])
+    logger.warning(f"Read replica unavailable, falling back to primary: {error}")
+
+
+def _open_readonly_session() -> Session:
+    """Open a session on the replica, falling back to the primary if it is unavailable."""
+    ReplicaSession = get_replica_session_factory()
+    if ReplicaSession is not None and replica_available():
+        session = ReplicaSession()
+        try:
+            # Check out a connection now so an unreachable replica fails here
+            session.connection()
+            return session
+        except OperationalError as e:
+            session.close()
+            mark_replica_down(e)
+
+    return get_session_factory()()
+
+
 @contextmanager
-def get_session() -> Generator[Session, None, None]:
-    """Get database session with automatic cleanup."""
-    SessionLocal = get_session_factory()
-    session = SessionLocal()
+def get_session(readonly: bool = False) -> Generator[Session, None, None]:
+    """
+    Get database session with automatic cleanup.
+
+    Pass ``readonly=True`` for page loads that only read: they are routed to the
+    configured read replica (falling back to the primary) and end with a
+    rollback instead of a commit.
+    """
+    if get_db_backend() == "sqlite":
+        _maybe_analyze_sqlite()
+    if readonly:
+        session = _open_readonly_session()
+    else:
+        SessionLocal = get_session_factory()
+        session = SessionLocal()
     try:
         yield session
-        session.commit()
+        if readonly:
+            session.rollback()
+        else:
+            session.commit()
     except Exception as e:
         session.rollback()
         raise e
@@ -80,10 +319,17 @@ def get_session() -> Generator[Session, None, None]:
         session.close()
 
 
+@st.cache_resource
 def init_database():
-    """Initialize database tables."""
+    """
+    Initialize database tables once per process.
+
+    Streamlit re-runs app.py on every interaction; caching the bootstrap as a
+    resource means the schema version check only hits the database on the first
+    run of each server process.
+    """
     engine = get_engine()
-    Base.metadata.create_all(bind=engine)
+    ensure_schema(engine, partition_events=get_partitioning_config()["enabled"])
     return engine
 
 
@@ -0,0 +1,160 @@
+"""
+Counter caches for test case and defect tallies.
+
+``services`` carries per-service test case counts (in total and by status) and
+defect counts (in total, open and critical), and ``test_cases`` carries its
+defect count, so the summary tiles read one row per service instead of
+counting every test case and defect.
+
+The counters are kept in step on every ORM flush: ``record_removed_counts``
+(before it) and ``apply_counter_deltas`` (after it) work out what the
+inserted, updated and deleted test cases and defects add to or remove from
+each counter, and apply the differences as ``col = col + delta`` updates in
+the same transaction, so concurrent writers never overwrite each other's
+changes.
+
+Bulk ``query(...).update()``/``delete()`` and Core statements bypass the flush;
+``repair_counters`` (``python manage.py repair-counters``) recomputes every
+counter from the rows.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, inspect, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from database.models import Defect, Service, TestCase
+
+
+@dataclass(frozen=True)
+class Counter:
+    """``target.column`` counts ``source`` rows pointing at it, optionally with ``attribute == value``."""
+    target: type
+    column: str
+    source: type
+    foreign_key: str
+    attribute: Optional[str] = None
+    value: Optional[str] = None
+
+    def matches(self, values: Dict[str, object]) -> bool:
+        return self.attribute is None or values[self.attribute] == self.value
+
+
+COUNTERS: List[Counter] = [
+    Counter(Service, "test_cases_count", TestCase, "service_id"),
+    Counter(Service, "not_started_test_cases_count", TestCase, "service_id", "status", "Not Started"),
+    Counter(Service, "passed_test_cases_count", TestCase, "service_id", "status", "Passed"),
+    Counter(Service, "failed_test_cases_count", TestCase, "service_id", "status", "Failed"),
+    Counter(Service, "blocked_test_cases_count", TestCase, "service_id", "status", "Blocked"),
+    Counter(Service, "defects_count", Defect, "service_id"),
+    Counter(Service, "open_defects_count", Defect, "service_id", "status", "Open"),
+    Counter(Service, "critical_defects_count", Defect, "service_id", "severity", "Critical"),
+    Counter(TestCase, "defects_count", Defect, "test_case_id"),
+]
+
+_COUNTED_ATTRIBUTES = {
+    source: sorted({
+        name for counter in COUNTERS if counter.source is source
+        for name in (counter.foreign_key, counter.attribute) if name
+    })
+    for source in {counter.source for counter in COUNTERS}
+}
+
+
+_DELTAS_KEY = "counter_deltas"
+
+
+def _contribute(deltas: Dict[Tuple[type, int, str], int], obj, values: Dict[str, object], sign: int) -> None:
+    for counter in COUNTERS:
+        if counter.source is type(obj) and counter.matches(values):
+            target_id = values[counter.foreign_key]
+            if target_id is not None:
+                deltas[(counter.target, target_id, counter.column)] += sign
+
+
+def _counts_changed(obj, names: List[str]) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in names)
+
+
+def record_removed_counts(session: Session) -> None:
+    """
+    Before a flush: subtract what updated and deleted rows counted for.
+
+    The stored values are read back in one query per model, since attribute
+    history misses the old value when an expired attribute is overwritten,
+    and after the flush they are gone.
+    """
+    deltas: Dict[Tuple[type, int, str], int] = defaultdict(int)
+    recounted = []
+    for source, names in _COUNTED_ATTRIBUTES.items():
+        updated = [obj for obj in session.dirty if type(obj) is source and _counts_changed(obj, names)]
+        changed = {
+            inspect(obj).identity[0]: obj
+            for obj in (*updated, *session.deleted)
+            if type(obj) is source and inspect(obj).persistent
+        }
+        recounted.extend(updated)
+        if not changed:
+            continue
+        table = source.__table__
+        stored = session.connection().execute(
+            select(table.c.id, *[table.c[name] for name in names]).where(table.c.id.in_(list(changed)))
+        )
+        for row in stored.mappings():
+            _contribute(deltas, changed[row["id"]], dict(row), -1)
+    session.info[_DELTAS_KEY] = (deltas, recounted)
+
+
+def apply_counter_deltas(session: Session) -> None:
+    """After a flush: add what inserted and recounted rows count for, and apply the changes."""
+    deltas, recounted = session.info.pop(_DELTAS_KEY, (defaultdict(int), []))
+    for obj in (*session.new, *recounted):
+        if type(obj) in _COUNTED_ATTRIBUTES:
+            # Foreign keys set through relationships are populated by now
+            _contribute(deltas, obj, {name: getattr(obj, name) for name in _COUNTED_ATTRIBUTES[type(obj)]}, +1)
+
+    by_row: Dict[Tuple[type, int], Dict[str, int]] = defaultdict(dict)
+    for (target, target_id, column), delta in deltas.items():
+        if delta:
+            by_row[(target, target_id)][column] = delta
+    if not by_row:
+        return
+
+    conn = session.connection()
+    # A stable order keeps concurrent flushes from deadlocking on each other's rows
+    for (target, target_id), changes in sorted(by_row.items(), key=lambda item: (item[0][0].__tablename__, item[0][1])):
+        table = target.__table__
+        conn.execute(
+            update(table)
+            .where(table.c.id == target_id)
+            .values({column: table.c[column] + delta for column, delta in changes.items()})
+        )
+
+
+def _expected(counter: Counter):
+    """Correlated subquery counting the rows behind ``counter``."""
+    source = counter.source.__table__
+    target = counter.target.__table__
+    conditions = [source.c[counter.foreign_key] == target.c.id]
+    if counter.attribute is not None:
+        conditions.append(source.c[counter.attribute] == counter.value)
+    return select(func.count()).select_from(source).where(*conditions).scalar_subquery()
+
+
+def repair_counters(conn: Connection) -> Dict[str, int]:
+    """
+    Recompute every counter from the rows it counts.
+
+    Returns the number of rows corrected per ``table.column``; all zero when
+    the counters were consistent.
+    """
+    corrected = {}
+    for counter in COUNTERS:
+        table = counter.target.__table__
+        expected = _expected(counter)
+        result = conn.execute(
+            update(table).where(table.c[counter.column] != expected).values({counter.column: expected})
+        )
+        corrected[f"{table.name}.{counter.column}"] = result.rowcount
+    return corrected
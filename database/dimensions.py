@@ -0,0 +1,198 @@
+"""
+Dictionary-encoded event dimensions.
+
+``events`` stores ``action``, ``status`` and ``error_message`` as small integer
+ids into the ``event_actions``, ``event_statuses`` and ``error_messages``
+lookup tables. Each table has a ``Dimension`` here: a process-wide, thread-safe
+name↔id cache that the write path uses to encode names (adding unseen ones to
+the table) and the read path uses to decode ids, so neither joins the lookup
+tables per row.
+
+Statuses are a closed set, seeded with ``STATUS_IDS``: an unknown status
+raises instead of being added, so a typo cannot become a new status in
+every breakdown. Actions and error messages are added as they are seen.
+
+Ids inserted by a transaction are only cached once it commits; a rolled back
+lookup row is never handed to another writer. ``Event(action=..., status=...)``
+keeps working through the model's name attributes, which are resolved in bulk
+at flush time by ``resolve_pending_names``.
+"""
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional
+import pandas as pd
+from sqlalchemy import Table, event, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql.expression import ColumnElement
+from database.models import ErrorMessage, Event, EventAction, EventStatusName
+
+# Names looked up per IN (...) query
+_LOOKUP_CHUNK = 500
+
+# conn.info key holding the ids this connection's open transaction inserted
+_UNCOMMITTED_KEY = "dimension_uncommitted"
+
+
+class Dimension:
+    """Cached name↔id mapping of one lookup table."""
+
+    def __init__(self, table: Table, name_column: str, hashed: bool = False, closed: bool = False):
+        self.table = table
+        self.name_column = table.c[name_column]
+        # Unique on md5(name) instead of the name on PostgreSQL, for unbounded names
+        self.hashed = hashed
+        # Unknown names raise ValueError instead of being inserted
+        self.closed = closed
+        self._lock = threading.Lock()
+        self._ids: Dict[str, int] = {}
+        self._names: Dict[int, str] = {}
+
+    def _remember(self, mapping: Dict[str, int]) -> None:
+        with self._lock:
+            self._ids.update(mapping)
+            self._names.update((value_id, name) for name, value_id in mapping.items())
+
+    def _uncommitted(self, conn: Connection) -> Dict[str, int]:
+        return conn.info.setdefault(_UNCOMMITTED_KEY, {}).setdefault(self.table.name, {})
+
+    def _key(self, conn: Connection) -> ColumnElement:
+        """The expression the table's unique index is on."""
+        return func.md5(self.name_column) if self.hashed and conn.dialect.name == "postgresql" else self.name_column
+
+    def _fetch(self, conn: Connection, names: List[str]) -> Dict[str, int]:
+        key = self._key(conn)
+        found = {}
+        for i in range(0, len(names), _LOOKUP_CHUNK):
+            chunk = names[i:i + _LOOKUP_CHUNK]
+            if key is not self.name_column:
+                # Seek on the hash index; PostgreSQL's md5() hashes the UTF-8 text
+                chunk = [hashlib.md5(name.encode("utf-8")).hexdigest() for name in chunk]
+            found.update(conn.execute(
+                select(self.name_column, self.table.c.id).where(key.in_(chunk))
+            ).all())
+        return found
+
+    def ids_for(self, conn: Connection, names: Iterable[Optional[str]]) -> Dict[str, int]:
+        """Ids for ``names``, inserting the ones the table does not have yet (unless ``closed``)."""
+        wanted = {name for name in names if name is not None}
+        with self._lock:
+            result = {name: self._ids[name] for name in wanted if name in self._ids}
+        uncommitted = self._uncommitted(conn)
+        result.update((name, uncommitted[name]) for name in wanted - result.keys() if name in uncommitted)
+
+        missing = sorted(wanted - result.keys())
+        if not missing:
+            return result
+        existing = self._fetch(conn, missing)
+        self._remember(existing)
+        result.update(existing)
+
+        new = [name for name in missing if name not in existing]
+        if new and self.closed:
+            raise ValueError(f"Unknown {self.table.name} name(s): {', '.join(map(repr, new))}")
+        if new:
+            insert = pg_insert if conn.dialect.name == "postgresql" else sqlite_insert
+            conn.execute(
+                insert(self.table)
+                .values([{self.name_column.name: name} for name in new])
+                .on_conflict_do_nothing(index_elements=[self._key(conn)])
+            )
+            # Includes rows a concurrent writer committed in the meantime
+            inserted = self._fetch(conn, new)
+            uncommitted.update(inserted)
+            result.update(inserted)
+        return result
+
+    def id_for(self, conn: Connection, name: Optional[str]) -> Optional[int]:
+        """Id for a single name (None stays None)."""
+        return None if name is None else self.ids_for(conn, [name])[name]
+
+    def names(self, conn: Optional[Connection] = None, ids: Iterable[int] = ()) -> Dict[int, str]:
+        """The id → name mapping, reloading the table if any of ``ids`` is unknown."""
+        with self._lock:
+            if self._names and all(value_id in self._names for value_id in ids):
+                return dict(self._names)
+        return self._load(conn)
+
+    def name_for(self, conn: Optional[Connection], value_id: int) -> str:
+        """Name for a single id."""
+        with self._lock:
+            name = self._names.get(value_id)
+        return name if name is not None else self.names(conn, [value_id])[value_id]
+
+    def _load(self, conn: Optional[Connection]) -> Dict[int, str]:
+        if conn is None:
+            from database.connection import get_engine
+            with get_engine().connect() as own_conn:
+                return self._load(own_conn)
+        mapping = dict(conn.execute(select(self.name_column, self.table.c.id)).all())
+        uncommitted = conn.info.get(_UNCOMMITTED_KEY, {}).get(self.table.name, {})
+        self._remember({name: value_id for name, value_id in mapping.items() if name not in uncommitted})
+        return {value_id: name for name, value_id in mapping.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids.clear()
+            self._names.clear()
+
+
+DIMENSIONS: Dict[str, Dimension] = {
+    "action": Dimension(EventAction.__table__, "name"),
+    "status": Dimension(EventStatusName.__table__, "name", closed=True),
+    "error_message": Dimension(ErrorMessage.__table__, "message", hashed=True),
+}
+
+
+def resolve_pending_names(conn: Connection, events: List[Event]) -> None:
+    """Set the id columns of events whose names were assigned since the last flush."""
+    for key, dimension in DIMENSIONS.items():
+        attribute = Event.__dict__[key]
+        assigned = [obj for obj in events if attribute.pending_attr in obj.__dict__]
+        if not assigned:
+            continue
+        ids = dimension.ids_for(conn, (obj.__dict__[attribute.pending_attr] for obj in assigned))
+        for obj in assigned:
+            name = obj.__dict__.pop(attribute.pending_attr)
+            setattr(obj, attribute.id_attr, None if name is None else ids[name])
+
+
+def encode_names(conn: Connection, rows: List[dict]) -> List[dict]:
+    """
+    Rows for ``Event.__table__.insert()`` from rows keyed by name.
+
+    ``action``, ``status`` and ``error_message`` values are replaced with their
+    ``*_id`` columns, one lookup per dimension for the whole batch.
+    """
+    ids = {key: dimension.ids_for(conn, (row.get(key) for row in rows)) for key, dimension in DIMENSIONS.items()}
+    encoded = []
+    for row in rows:
+        row = dict(row)
+        for key in DIMENSIONS:
+            if key in row:
+                name = row.pop(key)
+                row[f"{key}_id"] = None if name is None else ids[key][name]
+        encoded.append(row)
+    return encoded
+
+
+def decode_categorical(ids: pd.Series, key: str, conn: Optional[Connection] = None) -> pd.Categorical:
+    """Turn a Series of lookup ids into a Categorical of names without per-row strings."""
+    present = sorted(int(value_id) for value_id in ids.dropna().unique())
+    names = DIMENSIONS[key].names(conn, present)
+    codes = ids.map({value_id: code for code, value_id in enumerate(present)}).fillna(-1).astype("int64")
+    return pd.Categorical.from_codes(codes, categories=[names[value_id] for value_id in present])
+
+
+@event.listens_for(Engine, "commit")
+def _cache_committed_ids(conn):
+    for table_name, mapping in conn.info.pop(_UNCOMMITTED_KEY, {}).items():
+        for dimension in DIMENSIONS.values():
+            if dimension.table.name == table_name:
+                dimension._remember(mapping)
+
+
+@event.listens_for(Engine, "rollback")
+def _discard_uncommitted_ids(conn):
+    conn.info.pop(_UNCOMMITTED_KEY, None)
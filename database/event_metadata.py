@@ -0,0 +1,84 @@
+"""
+Filtering events on ``event_metadata``.
+
+``event_metadata`` is a JSON object per event (e.g. ``{"app_version": "4.0.0",
+"region": "eu-west"}``). On PostgreSQL it is ``jsonb`` with a
+``jsonb_path_ops`` GIN index, and filters compile to containment
+(``event_metadata @> '{"region": "eu-west"}'``), which the index serves for any
+key. On SQLite the frequently filtered keys in ``PROMOTED_KEYS`` are exposed as
+virtual generated columns (``meta_region`` = ``json_extract(event_metadata,
+'$.region')``) with an index each; other keys fall back to ``json_extract``.
+
+Use ``metadata_matches(key, value)`` as a WHERE condition; it compiles to the
+right form for the connection's backend.
+"""
+import re
+from typing import Dict, List
+from sqlalchemy import func, literal_column, text, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement, FunctionElement
+from database.models import Event
+
+# Keys offered in the analytics filters and indexed individually on SQLite
+PROMOTED_KEYS = ("app_version", "region", "device")
+
+_KEY_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def promoted_column_name(key: str) -> str:
+    """Name of the SQLite generated column for a promoted key."""
+    return f"meta_{key}"
+
+
+class metadata_matches(FunctionElement):
+    """True when the event's metadata has ``key`` equal to ``value``."""
+    # Untyped on purpose: a Boolean type makes SQLite render "(...) = 1",
+    # which hides the comparison from the index
+    name = "metadata_matches"
+    inherit_cache = False
+
+    def __init__(self, key: str, value: str):
+        if not _KEY_PATTERN.match(key):
+            raise ValueError(f"Invalid metadata key: {key!r}")
+        self.key = key
+        self.value = value
+        super().__init__()
+
+
+@compiles(metadata_matches, "postgresql")
+def _metadata_matches_postgresql(element, compiler, **kw):
+    # The column's generic JSON type would compile contains() to LIKE
+    column = type_coerce(Event.event_metadata, JSONB)
+    return compiler.process(column.contains({element.key: element.value}), **kw)
+
+
+@compiles(metadata_matches)
+def _metadata_matches_default(element, compiler, **kw):
+    if element.key in PROMOTED_KEYS:
+        target = literal_column(f"{Event.__tablename__}.{promoted_column_name(element.key)}")
+    else:
+        target = func.json_extract(Event.event_metadata, f"$.{element.key}")
+    return compiler.process(target == element.value, **kw)
+
+
+def metadata_conditions(metadata: Dict[str, str]) -> List[ColumnElement]:
+    """WHERE conditions for every non-empty key/value pair."""
+    return [metadata_matches(key, value) for key, value in metadata.items() if value]
+
+
+def promote_metadata_keys(conn: Connection) -> None:
+    """Add the indexed generated columns for PROMOTED_KEYS (SQLite only)."""
+    if conn.dialect.name != "sqlite":
+        return
+    # table_xinfo also lists hidden generated columns
+    existing = {row[1] for row in conn.execute(text("PRAGMA table_xinfo(events)"))}
+    for key in PROMOTED_KEYS:
+        column = promoted_column_name(key)
+        if column not in existing:
+            conn.execute(text(
+                f"ALTER TABLE events ADD COLUMN {column} TEXT "
+                f"GENERATED ALWAYS AS (json_extract(event_metadata, '$.{key}')) VIRTUAL"
+            ))
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_events_{column} ON events ({column})"))
@@ -0,0 +1,267 @@
+"""
+Keyset-paginated browsing of raw events.
+
+``event_page`` returns one page of events in ``(timestamp, id)`` order. The
+next page is asked for with the key of the last row shown, so the database
+seeks to it through the timestamp indexes instead of skipping ``OFFSET``
+rows: every page costs about the same however deep it is, and only one page
+of rows leaves the database whatever the size of the window.
+
+``EventFilters`` holds the page filters (window, service and metadata plus
+column filters on status, action, channel, error message and journey time),
+applied in the database. ``estimate_event_count`` gives the number of
+matching events: exact from the hourly rollups when the filters allow it,
+otherwise counted up to ``COUNT_CAP``.
+
+When an archive path is given, days moved to the Parquet archive are paged
+through as well: the same filters and key are pushed down to
+``read_archived_events``, and its page is merged with the table's. Archived
+days are only read when they can fall on the page.
+"""
+import operator
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from functools import reduce
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.expression import ColumnElement
+from database.archive import archive_overlaps, archived_dates, read_archived_events
+from database.columnar import decode_services, events_select, read_events_frame
+from database.dimensions import DIMENSIONS
+from database.event_metadata import metadata_conditions
+from database.models import ErrorMessage, Event, EventAction, EventStatusName, Service
+from database.rollups import rollup_rows
+
+# Events per page
+PAGE_SIZE = 100
+
+# Events counted before the estimate is reported as "at least"
+COUNT_CAP = 10_000
+
+# Position of an event in the page order: its (timestamp, id)
+EventKey = Tuple[datetime, int]
+
+
+@dataclass(frozen=True)
+class EventFilters:
+    """Filters of the event explorer; empty values do not filter."""
+    start: Optional[datetime] = None  # Half-open [start, end), see event_time_bounds
+    end: Optional[datetime] = None
+    service_id: Optional[int] = None
+    metadata: Dict[str, str] = field(default_factory=dict)
+    statuses: Tuple[str, ...] = ()
+    actions: Tuple[str, ...] = ()
+    channels: Tuple[str, ...] = ()
+    error_text: str = ""  # Case-insensitive substring of the error message
+    min_journey_time: Optional[float] = None
+    max_journey_time: Optional[float] = None
+
+    @property
+    def uses_raw_columns(self) -> bool:
+        """Whether a filter needs columns the hourly rollups do not keep."""
+        return bool(self.error_text) or self.min_journey_time is not None or self.max_journey_time is not None
+
+    def conditions(self) -> List[ColumnElement]:
+        """The filters as conditions on ``Event``."""
+        conditions = []
+        if self.start:
+            conditions.append(Event.timestamp >= self.start)
+        if self.end:
+            conditions.append(Event.timestamp < self.end)
+        if self.service_id:
+            conditions.append(Event.service_id == self.service_id)
+        if self.metadata:
+            conditions.extend(metadata_conditions(self.metadata))
+        # Names are matched in the small lookup tables, events by id
+        if self.statuses:
+            conditions.append(Event.status_id.in_(
+                select(EventStatusName.id).where(EventStatusName.name.in_(self.statuses))
+            ))
+        if self.actions:
+            conditions.append(Event.action_id.in_(
+                select(EventAction.id).where(EventAction.name.in_(self.actions))
+            ))
+        if self.channels:
+            conditions.append(Event.service_id.in_(select(Service.id).where(Service.channel.in_(self.channels))))
+        if self.error_text:
+            conditions.append(Event.error_message_id.in_(
+                select(ErrorMessage.id).where(ErrorMessage.message.icontains(self.error_text, autoescape=True))
+            ))
+        if self.min_journey_time is not None:
+            conditions.append(Event.journey_time >= self.min_journey_time)
+        if self.max_journey_time is not None:
+            conditions.append(Event.journey_time <= self.max_journey_time)
+        return conditions
+
+
+def _after(key: EventKey, descending: bool) -> ColumnElement:
+    """Events after ``key`` in page order."""
+    timestamp, event_id = key
+    # The plain bound on the timestamp is what the index seeks on; the OR
+    # only breaks ties between events with the same timestamp
+    if descending:
+        return and_(Event.timestamp <= timestamp, or_(Event.timestamp < timestamp, Event.id < event_id))
+    return and_(Event.timestamp >= timestamp, or_(Event.timestamp > timestamp, Event.id > event_id))
+
+
+def _archive_conditions(
+    conn: Connection,
+    filters: EventFilters,
+    after: Optional[EventKey] = None,
+    descending: bool = True,
+) -> Optional[ds.Expression]:
+    """The column filters and ``after`` as a filter on the archive columns."""
+    conditions = []
+    if filters.statuses:
+        conditions.append(ds.field("status").isin(list(filters.statuses)))
+    if filters.actions:
+        conditions.append(ds.field("action").isin(list(filters.actions)))
+    if filters.channels:
+        service_ids = conn.execute(select(Service.id).where(Service.channel.in_(filters.channels))).scalars().all()
+        conditions.append(ds.field("service_id").isin(service_ids))
+    if filters.error_text:
+        conditions.append(pc.match_substring(ds.field("error_message"), filters.error_text, ignore_case=True))
+    if filters.min_journey_time is not None:
+        conditions.append(ds.field("journey_time") >= filters.min_journey_time)
+    if filters.max_journey_time is not None:
+        conditions.append(ds.field("journey_time") <= filters.max_journey_time)
+    if after:
+        timestamp = pa.scalar(after[0], pa.timestamp("us"))
+        earlier = operator.lt if descending else operator.gt
+        conditions.append(
+            earlier(ds.field("timestamp"), timestamp)
+            | ((ds.field("timestamp") == timestamp) & earlier(ds.field("id"), after[1]))
+        )
+    return reduce(operator.and_, conditions) if conditions else None
+
+
+def _archive_bounds(
+    filters: EventFilters, after: Optional[EventKey], descending: bool
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """The part of the window still ahead of ``after`` in page order."""
+    start, end = filters.start, filters.end
+    if after and descending:
+        end = after[0] + timedelta(microseconds=1)
+    elif after:
+        start = after[0]
+    return start, end
+
+
+def _archive_can_hold(archive_path: str, df: pd.DataFrame, limit: int, descending: bool) -> bool:
+    """Whether archived events could be among the first ``limit``, given those read from the table."""
+    if len(df) < limit:
+        return True
+    # A full page that ends before the archived days (in page order) is complete
+    boundary = df["timestamp"].iloc[limit - 1]
+    days = archived_dates(archive_path)
+    if descending:
+        return boundary < datetime.combine(days[-1] + timedelta(days=1), datetime.min.time())
+    return boundary >= datetime.combine(days[0], datetime.min.time())
+
+
+def _with_archived_page(
+    conn: Connection,
+    df: pd.DataFrame,
+    archive_path: str,
+    filters: EventFilters,
+    after: Optional[EventKey],
+    descending: bool,
+    limit: int,
+) -> pd.DataFrame:
+    """Merge the next ``limit`` archived events into a page read from the table."""
+    start, end = _archive_bounds(filters, after, descending)
+    if not archive_overlaps(archive_path, start, end) or not _archive_can_hold(archive_path, df, limit, descending):
+        return df
+    archived = read_archived_events(
+        archive_path, start, end, filters.service_id, filters.metadata, limit,
+        _archive_conditions(conn, filters, after, descending), newest_first=descending,
+    )
+    if archived.empty:
+        return df
+    service, channel = decode_services(conn, archived.pop("service_id"))
+    archived.insert(1, "service", service)
+    archived.insert(2, "channel", channel)
+
+    combined = pd.concat([df, archived[df.columns]], ignore_index=True)
+    for column in ["service", "channel", *DIMENSIONS]:
+        combined[column] = combined[column].astype("category")
+    return combined.sort_values(["timestamp", "id"], ascending=not descending).head(limit).reset_index(drop=True)
+
+
+def event_page(
+    conn: Connection,
+    filters: EventFilters,
+    after: Optional[EventKey] = None,
+    descending: bool = True,
+    page_size: int = PAGE_SIZE,
+    archive_path: Optional[str] = None,
+) -> Tuple[pd.DataFrame, Optional[EventKey]]:
+    """
+    One page of events matching ``filters``, newest first unless ``descending`` is False.
+
+    ``after`` is the key of the last event of the previous page (None for the
+    first page). Returns the page, in the columns of ``read_events_frame``,
+    and the key to pass for the next page, or None on the last page. With
+    ``archive_path``, archived events are included.
+    """
+    table_filters = filters
+    if after:
+        # The key replaces the window bound on its side: given both, SQLite
+        # seeks on the window bound and scans every event up to the key
+        table_filters = replace(filters, end=None) if descending else replace(filters, start=None)
+    query = events_select().where(*table_filters.conditions())
+    if after:
+        query = query.where(_after(after, descending))
+    if descending:
+        query = query.order_by(Event.timestamp.desc(), Event.id.desc())
+    else:
+        query = query.order_by(Event.timestamp, Event.id)
+    # One extra row tells whether there is a next page
+    df = read_events_frame(conn, query.limit(page_size + 1))
+    if archive_path:
+        df = _with_archived_page(conn, df, archive_path, filters, after, descending, page_size + 1)
+    if len(df) <= page_size:
+        return df, None
+    df = df.iloc[:page_size]
+    last = df.iloc[-1]
+    return df, (last["timestamp"].to_pydatetime(), int(last["id"]))
+
+
+def estimate_event_count(
+    conn: Connection, filters: EventFilters, archive_path: Optional[str] = None
+) -> Tuple[int, bool]:
+    """
+    Number of events matching ``filters``, and whether it is exact.
+
+    Filters the rollups keep are counted exactly from them (archived days are
+    still in the rollups). Otherwise matching events, archived ones too with
+    ``archive_path``, are counted up to ``COUNT_CAP`` and a capped count is
+    not exact.
+    """
+    if not filters.uses_raw_columns:
+        rows = rollup_rows(
+            filters.start, filters.end, filters.service_id, metadata_conditions(filters.metadata)
+        ).subquery()
+        conditions = []
+        if filters.statuses:
+            conditions.append(rows.c.status.in_(filters.statuses))
+        if filters.actions:
+            conditions.append(rows.c.action.in_(filters.actions))
+        if filters.channels:
+            conditions.append(rows.c.service_id.in_(select(Service.id).where(Service.channel.in_(filters.channels))))
+        total = conn.execute(select(func.coalesce(func.sum(rows.c.event_count), 0)).where(*conditions)).scalar()
+        return int(total), True
+
+    capped = select(Event.id).where(*filters.conditions()).limit(COUNT_CAP + 1).subquery()
+    count = conn.execute(select(func.count()).select_from(capped)).scalar()
+    if archive_path and count <= COUNT_CAP and archive_overlaps(archive_path, filters.start, filters.end):
+        count += len(read_archived_events(
+            archive_path, filters.start, filters.end, filters.service_id, filters.metadata,
+            COUNT_CAP + 1 - count, _archive_conditions(conn, filters),
+        ))
+    return min(count, COUNT_CAP), count <= COUNT_CAP
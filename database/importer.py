@@ -0,0 +1,222 @@
+"""
+Streaming, resumable import of event files.
+
+``import_events`` reads a CSV, NDJSON or Parquet file (CSV and NDJSON may be
+compressed) in chunks of ``chunk_size`` rows, so memory stays bounded however
+large the file is. For each chunk it:
+
+1. renames columns onto the event fields (``column_map``, e.g.
+   ``{"svc": "service", "ts": "timestamp"}``); other columns are ignored,
+2. validates the chunk with the vectorized ``validate_event_frame``,
+3. resolves service names through one ``ServiceIds`` cache for the import,
+4. bulk-inserts the valid rows and records the chunk in ``import_checkpoints``
+   in the same transaction.
+
+A rerun of an interrupted import skips the chunks already committed, so no
+row is loaded twice. The checkpoint is keyed by the file's path; when its size
+or modification time changed, the import starts over.
+
+From the command line::
+
+    python manage.py import-events extract.ndjson.gz --chunk-size 50000 --map ts=timestamp
+"""
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import pandas as pd
+import pyarrow.parquet as pq
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import Engine
+from database.bulk_load import ServiceIds, load_frame
+from database.models import ImportCheckpoint
+from utils.logger import logger
+from utils.validators import validate_event_frame
+
+FORMATS = ("csv", "ndjson", "parquet")
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+EVENT_FIELDS = [
+    "service", "service_id", "action", "status", "timestamp", "journey_time", "error_message", "event_metadata",
+    "client_event_id",
+]
+
+_EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "ndjson", ".parquet": "parquet"}
+_COMPRESSION_EXTENSIONS = (".gz", ".bz2", ".xz", ".zst", ".zip")
+
+# Rejected rows kept as examples in ImportStats
+MAX_SAMPLE_ERRORS = 20
+
+_CHECKPOINTS = ImportCheckpoint.__table__
+
+
+@dataclass
+class ImportStats:
+    """Outcome of an import run."""
+    rows_loaded: int = 0
+    rows_rejected: int = 0
+    rows_duplicate: int = 0  # Already loaded under the same client_event_id
+    chunks: int = 0
+    chunks_skipped: int = 0
+    seconds: float = 0.0
+    already_complete: bool = False
+    errors: List[Tuple[int, str]] = field(default_factory=list)  # (row number, error) examples
+
+    @property
+    def rows_per_second(self) -> float:
+        rows = self.rows_loaded + self.rows_rejected + self.rows_duplicate
+        return rows / self.seconds if self.seconds else 0.0
+
+
+def detect_format(path: str) -> str:
+    """The file format implied by the extension (before any compression suffix)."""
+    name = path.lower()
+    for suffix in _COMPRESSION_EXTENSIONS:
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+            break
+    extension = os.path.splitext(name)[1]
+    if extension not in _EXTENSIONS:
+        raise ValueError(f"Cannot tell the format of {path}; pass one of: {', '.join(FORMATS)}")
+    return _EXTENSIONS[extension]
+
+
+def read_chunks(path: str, file_format: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Yield the file as DataFrames of at most ``chunk_size`` rows, indexed by row number from 1."""
+    if file_format == "csv":
+        # Everything as text: validation does the typing, and a bad value only rejects its row
+        chunks = pd.read_csv(path, chunksize=chunk_size, dtype=str)
+    elif file_format == "ndjson":
+        chunks = pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False, convert_dates=False)
+    elif file_format == "parquet":
+        chunks = (batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size))
+    else:
+        raise ValueError(f"Unknown format {file_format!r}; expected one of: {', '.join(FORMATS)}")
+
+    offset = 1
+    for chunk in chunks:
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        yield chunk
+
+
+def _parse_metadata(value):
+    """JSON text (CSV, Parquet string columns) to a dict; anything else is left for validation."""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _prepare_chunk(chunk: pd.DataFrame, column_map: Dict[str, str]) -> pd.DataFrame:
+    chunk = chunk.rename(columns=column_map)
+    chunk = chunk[[column for column in EVENT_FIELDS if column in chunk.columns]]
+    if "event_metadata" in chunk.columns:
+        chunk = chunk.assign(event_metadata=chunk["event_metadata"].map(_parse_metadata))
+    return chunk
+
+
+def _fingerprint(path: str) -> str:
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _start(engine: Engine, source: str, fingerprint: str, chunk_size: int, restart: bool) -> Optional[ImportCheckpoint]:
+    """The checkpoint to resume from, or None after starting a fresh one."""
+    with engine.begin() as conn:
+        checkpoint = conn.execute(select(_CHECKPOINTS).where(_CHECKPOINTS.c.source == source)).first()
+        if checkpoint is not None and not restart and checkpoint.fingerprint == fingerprint:
+            return checkpoint
+        conn.execute(delete(_CHECKPOINTS).where(_CHECKPOINTS.c.source == source))
+        conn.execute(insert(_CHECKPOINTS).values(
+            source=source, fingerprint=fingerprint, chunk_size=chunk_size,
+            chunks_done=0, rows_loaded=0, rows_rejected=0,
+        ))
+    return None
+
+
+def import_events(
+    engine: Engine,
+    path: str,
+    file_format: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    column_map: Optional[Dict[str, str]] = None,
+    restart: bool = False,
+    on_chunk: Optional[Callable[[int, ImportStats], None]] = None,
+) -> ImportStats:
+    """
+    Import an event file chunk by chunk, resuming after the last committed chunk.
+
+    ``on_chunk(chunk_number, stats)`` is called after each committed chunk,
+    for progress reporting. With ``restart`` any previous progress is
+    discarded and the whole file is loaded again.
+    """
+    file_format = file_format or detect_format(path)
+    column_map = column_map or {}
+    source = os.path.abspath(path)
+    stats = ImportStats()
+
+    checkpoint = _start(engine, source, _fingerprint(path), chunk_size, restart)
+    resume_from = 0
+    if checkpoint is not None:
+        if checkpoint.completed_at is not None:
+            stats.already_complete = True
+            return stats
+        resume_from = checkpoint.chunks_done
+        if checkpoint.chunk_size != chunk_size:
+            # Chunk boundaries must match the committed ones
+            logger.info(f"Resuming {source} with its original chunk size {checkpoint.chunk_size:,}")
+            chunk_size = checkpoint.chunk_size
+        logger.info(f"Resuming {source} after chunk {resume_from:,} ({checkpoint.rows_loaded:,} rows loaded)")
+
+    services = ServiceIds(engine)
+    start = time.perf_counter()
+    for number, chunk in enumerate(read_chunks(path, file_format, chunk_size), start=1):
+        if number <= resume_from:
+            stats.chunks_skipped += 1
+            continue
+
+        valid, invalid = validate_event_frame(_prepare_chunk(chunk, column_map))
+        errors = list(invalid.items())
+        valid = valid.assign(service_id=services.resolve(valid))
+        unknown = valid["service_id"].isna()
+        errors.extend((row, "unknown service") for row in valid.index[unknown])
+        valid = valid[~unknown]
+
+        with engine.begin() as conn:
+            loaded = load_frame(conn, valid, chunk_size)
+            conn.execute(
+                update(_CHECKPOINTS)
+                .where(_CHECKPOINTS.c.source == source)
+                .values(
+                    chunks_done=number,
+                    rows_loaded=_CHECKPOINTS.c.rows_loaded + loaded.rows,
+                    rows_rejected=_CHECKPOINTS.c.rows_rejected + len(errors),
+                )
+            )
+
+        stats.chunks += 1
+        stats.rows_loaded += loaded.rows
+        stats.rows_duplicate += loaded.duplicates
+        stats.rows_rejected += len(errors)
+        stats.errors.extend(sorted(errors)[: MAX_SAMPLE_ERRORS - len(stats.errors)])
+        stats.seconds = time.perf_counter() - start
+        if on_chunk:
+            on_chunk(number, stats)
+
+    with engine.begin() as conn:
+        conn.execute(
+            update(_CHECKPOINTS).where(_CHECKPOINTS.c.source == source).values(completed_at=datetime.utcnow())
+        )
+    stats.seconds = time.perf_counter() - start
+    logger.info(
+        f"Imported {source}: {stats.rows_loaded:,} rows loaded, {stats.rows_duplicate:,} duplicates skipped, "
+        f"{stats.rows_rejected:,} rejected "
+        f"in {stats.chunks:,} chunks ({stats.rows_per_second:,.0f} rows/s)"
+    )
+    return stats
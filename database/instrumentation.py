@@ -0,0 +1,235 @@
+"""
+SQL query instrumentation.
+
+Engine event hooks record every statement's duration and row count into a
+per-request ``QueryLog``. A request is one Streamlit rerun: ``app.py`` starts a
+log before rendering and reads it back afterwards for the Performance panel
+and the application log. The current log is held in a context variable, so
+statements issued from the async event loop (see ``database.async_connection``)
+are attributed to the rerun that submitted them.
+
+The log can also police a request: with N+1 detection enabled it flags a
+statement executed repeatedly with different parameters (typically a query per
+row inside a loop) together with the call site, and ``query_budget`` caps the
+number of statements. ``QueryLog.check`` or the ``query_budget`` context manager
+raise ``QueryBudgetExceeded`` so tests can fail on a regression.
+"""
+import os
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from utils.logger import logger
+
+# Statements kept per request; further statements are counted but not stored.
+MAX_RECORDS = 500
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Database plumbing that sits between application code and the driver; call
+# sites are reported at the first frame outside these.
+_PLUMBING_FILES = {
+    os.path.join(_PROJECT_ROOT, "database", name)
+    for name in ("instrumentation.py", "connection.py", "async_connection.py")
+}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a request exceeds its query budget or contains an N+1 pattern."""
+
+
+@dataclass
+class NPlusOneFinding:
+    """A statement repeated with different parameters within one request."""
+    statement: str
+    executions: int
+    call_site: str
+
+    def describe(self) -> str:
+        """Human-readable description for logs and the Performance panel."""
+        return (
+            f"N+1 query: executed {self.executions}x with different parameters at "
+            f"{self.call_site}: {' '.join(self.statement.split())[:200]}"
+        )
+
+
+def _find_call_site() -> str:
+    """Return 'path:line in function' for the innermost application frame."""
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if (
+            filename.startswith(_PROJECT_ROOT)
+            and filename not in _PLUMBING_FILES
+            and "site-packages" not in filename
+        ):
+            return f"{os.path.relpath(filename, _PROJECT_ROOT)}:{frame.lineno} in {frame.name}"
+    return "unknown"
+
+
+@dataclass
+class QueryRecord:
+    """One executed statement."""
+    statement: str
+    duration_ms: float
+    rows: Optional[int]
+    page: Optional[str]
+
+
+@dataclass
+class QueryLog:
+    """Statements executed during one request (Streamlit rerun)."""
+    page: Optional[str] = None
+    records: List[QueryRecord] = field(default_factory=list)
+    query_count: int = 0
+    total_ms: float = 0.0
+    total_rows: Optional[int] = None  # None until a driver reports a row count
+    started_at: float = field(default_factory=time.perf_counter)
+    detect_n_plus_one: bool = False
+    n_plus_one_threshold: int = 5
+    query_budget: Optional[int] = None
+    n_plus_one: Dict[str, NPlusOneFinding] = field(default_factory=dict)
+    _parameter_sets: Dict[str, Set[str]] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, statement: str, duration_ms: float, rows: Optional[int], parameters=None) -> None:
+        """Record a statement; safe to call from several threads."""
+        with self._lock:
+            self.query_count += 1
+            self.total_ms += duration_ms
+            if rows is not None:
+                self.total_rows = (self.total_rows or 0) + rows
+            if len(self.records) < MAX_RECORDS:
+                self.records.append(QueryRecord(statement, duration_ms, rows, self.page))
+            if self.detect_n_plus_one:
+                self._track_repetition(statement, parameters)
+
+    def _track_repetition(self, statement: str, parameters) -> None:
+        parameter_sets = self._parameter_sets.setdefault(statement, set())
+        parameter_sets.add(repr(parameters))
+        executions = len(parameter_sets)
+        if executions < self.n_plus_one_threshold:
+            return
+        finding = self.n_plus_one.get(statement)
+        if finding is None:
+            # The stack at this point is inside the offending loop
+            self.n_plus_one[statement] = NPlusOneFinding(statement, executions, _find_call_site())
+        else:
+            finding.executions = executions
+
+    def violations(self) -> List[str]:
+        """Describe every N+1 finding and a blown query budget, if any."""
+        problems = [finding.describe() for finding in self.n_plus_one.values()]
+        if self.query_budget is not None and self.query_count > self.query_budget:
+            problems.append(
+                f"Query budget exceeded on {self.page or 'app'}: "
+                f"{self.query_count} queries (budget {self.query_budget})"
+            )
+        return problems
+
+    def check(self) -> None:
+        """Raise QueryBudgetExceeded if the request has any violations."""
+        problems = self.violations()
+        if problems:
+            raise QueryBudgetExceeded("\n".join(problems))
+
+    def elapsed_ms(self) -> float:
+        """Wall-clock time since the request started."""
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def summary(self) -> str:
+        """One-line summary for the application log."""
+        rows = "unknown" if self.total_rows is None else f"{self.total_rows:,}"
+        return (
+            f"{self.page or 'app'}: {self.query_count} queries, {self.total_ms:.1f} ms in database, "
+            f"{rows} rows, {self.elapsed_ms():.0f} ms total"
+        )
+
+
+_current_log: ContextVar[Optional[QueryLog]] = ContextVar("query_log", default=None)
+
+
+def start_query_log(
+    page: Optional[str] = None,
+    detect_n_plus_one: bool = False,
+    n_plus_one_threshold: int = 5,
+    query_budget: Optional[int] = None,
+) -> QueryLog:
+    """Begin recording statements for a new request and return its log."""
+    log = QueryLog(
+        page=page,
+        detect_n_plus_one=detect_n_plus_one,
+        n_plus_one_threshold=n_plus_one_threshold,
+        query_budget=query_budget,
+    )
+    _current_log.set(log)
+    return log
+
+
+def get_query_log() -> Optional[QueryLog]:
+    """Return the log for the current request, if one was started."""
+    return _current_log.get()
+
+
+def set_query_log(log: Optional[QueryLog]) -> None:
+    """Attach an existing log to the current context (e.g. another thread or task)."""
+    _current_log.set(log)
+
+
+@contextmanager
+def query_budget(max_queries: Optional[int] = None, n_plus_one_threshold: int = 5) -> Iterator[QueryLog]:
+    """
+    Fail the enclosed code if it runs more than ``max_queries`` statements or
+    repeats a statement N+1 style; intended for tests::
+
+        with query_budget(max_queries=10):
+            load_dashboard_data()
+    """
+    previous = get_query_log()
+    log = start_query_log(
+        page="query_budget",
+        detect_n_plus_one=True,
+        n_plus_one_threshold=n_plus_one_threshold,
+        query_budget=max_queries,
+    )
+    try:
+        yield log
+    finally:
+        set_query_log(previous)
+    log.check()
+
+
+def log_query_summary(log: QueryLog) -> None:
+    """Write a request's query statistics to the application logger."""
+    logger.info(f"SQL {log.summary()}")
+    for problem in log.violations():
+        logger.warning(problem)
+    for record in log.records:
+        rows = "?" if record.rows is None else record.rows
+        logger.debug(f"SQL {record.duration_ms:8.2f} ms {rows:>6} rows  {' '.join(record.statement.split())[:200]}")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["query_start_time"].pop()
+    log = _current_log.get()
+    if log is None:
+        return
+    # rowcount is the number of rows returned for Postgres SELECTs; SQLite
+    # reports -1 for queries, which we record as unknown.
+    rows = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+    log.add(statement, (time.perf_counter() - start) * 1000, rows, parameters)
+
+
+def instrument_engine(engine: Engine) -> Engine:
+    """Attach the timing hooks to an engine (pass ``AsyncEngine.sync_engine`` for async)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
@@ -0,0 +1,254 @@
+"""
+Schema versioning and migrations.
+
+The schema version is stored in the ``schema_version`` table. On startup the
+application reads the latest applied version with a single query and only falls
+back to ``create_all`` (which introspects every table) and the migration steps
+below when the database is behind the code.
+"""
+import time
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from database.models import STATUS_IDS, Base, SchemaVersion
+from database.counters import COUNTERS, repair_counters
+from database.event_metadata import promote_metadata_keys
+from database.partitioning import convert_events_table
+from database.summary import create_dashboard_summary
+from utils.logger import logger
+
+
+# Bump this together with a new entry in MIGRATIONS whenever the models change.
+SCHEMA_VERSION = 10
+
+
+def _add_event_filter_indexes(conn: Connection) -> None:
+    """v2: composite, partial and BRIN indexes on events replace the single-column ones."""
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_events_service_id_timestamp ON events (service_id, "timestamp")'
+    ))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_events_timestamp_status ON events ("timestamp", status)'
+    ))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_events_errors_timestamp ON events ("timestamp") '
+        "WHERE status = 'error'"
+    ))
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_events_timestamp_brin ON events USING brin ("timestamp")'
+        ))
+    # Both are leading-column prefixes of the composite indexes above
+    conn.execute(text("DROP INDEX IF EXISTS ix_events_service_id"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_events_timestamp"))
+
+
+def _add_event_rollups(conn: Connection) -> None:
+    """v3: event_rollups and rollup_state are created by create_all; refresh_rollups backfills them."""
+
+
+def _add_dashboard_summary(conn: Connection) -> None:
+    """v4: materialized dashboard summary (a view on PostgreSQL, a table on SQLite)."""
+    # The PostgreSQL view reads the counter caches added in v7, which creates it
+    if conn.dialect.name != "postgresql":
+        create_dashboard_summary(conn)
+
+
+def _add_event_metadata_indexes(conn: Connection) -> None:
+    """v5: jsonb event_metadata with a GIN index (PostgreSQL), indexed promoted keys (SQLite)."""
+    if conn.dialect.name == "postgresql":
+        # Existing values were written as JSON text; blank strings become NULL
+        conn.execute(text(
+            "ALTER TABLE events ALTER COLUMN event_metadata TYPE jsonb USING "
+            "CASE WHEN btrim(event_metadata) = '' THEN NULL ELSE event_metadata::jsonb END"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_events_metadata_gin ON events USING gin (event_metadata jsonb_path_ops)"
+        ))
+    else:
+        # The promoted columns run json_extract on every row when indexed,
+        # which fails on blank or malformed text
+        conn.execute(text(
+            "UPDATE events SET event_metadata = NULL "
+            "WHERE trim(event_metadata) = '' OR NOT json_valid(event_metadata)"
+        ))
+    promote_metadata_keys(conn)
+
+
+def _encode_event_dimensions(conn: Connection) -> None:
+    """v6: action, status and error_message move to lookup tables referenced by id."""
+    # The lookup tables exist (create_all). The status dimension is closed, so
+    # event_statuses must hold STATUS_IDS, in order so the ids match, before the
+    # statuses found in events are added
+    conn.execute(text(
+        "INSERT INTO event_statuses (name) VALUES "
+        + ", ".join(f"('{name}')" for name in STATUS_IDS)
+        + " ON CONFLICT (name) DO NOTHING"
+    ))
+    # error_messages is unique on md5(message) on PostgreSQL, see ErrorMessage
+    message_key, message_match = "message", "message = events.error_message"
+    if conn.dialect.name == "postgresql":
+        message_key = "md5(message)"
+        message_match = f"md5(message) = md5(events.error_message) AND {message_match}"
+    for table, column, key, source in (
+        ("event_actions", "name", "name", "action"),
+        ("event_statuses", "name", "name", "status"),
+        ("error_messages", "message", message_key, "error_message"),
+    ):
+        conn.execute(text(
+            f"INSERT INTO {table} ({column}) SELECT DISTINCT {source} FROM events "
+            f"WHERE {source} IS NOT NULL ON CONFLICT ({key}) DO NOTHING"
+        ))
+    status_type = "SMALLINT" if conn.dialect.name == "postgresql" else "INTEGER"
+    conn.execute(text("ALTER TABLE events ADD COLUMN action_id INTEGER REFERENCES event_actions (id)"))
+    conn.execute(text(f"ALTER TABLE events ADD COLUMN status_id {status_type} REFERENCES event_statuses (id)"))
+    conn.execute(text("ALTER TABLE events ADD COLUMN error_message_id INTEGER REFERENCES error_messages (id)"))
+    conn.execute(text(
+        "UPDATE events SET "
+        "action_id = (SELECT id FROM event_actions WHERE name = events.action), "
+        "status_id = (SELECT id FROM event_statuses WHERE name = events.status), "
+        f"error_message_id = (SELECT id FROM error_messages WHERE {message_match})"
+    ))
+
+    # Indexes on the old columns block dropping them on SQLite
+    conn.execute(text("DROP INDEX IF EXISTS ix_events_timestamp_status"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_events_errors_timestamp"))
+    for column in ("action", "status", "error_message"):
+        conn.execute(text(f"ALTER TABLE events DROP COLUMN {column}"))
+    if conn.dialect.name == "postgresql":
+        # SQLite cannot add NOT NULL to existing columns; the model enforces it there
+        conn.execute(text("ALTER TABLE events ALTER COLUMN action_id SET NOT NULL"))
+        conn.execute(text("ALTER TABLE events ALTER COLUMN status_id SET NOT NULL"))
+        conn.execute(text(f"ALTER TABLE events ALTER COLUMN status_id SET DEFAULT {STATUS_IDS['success']}"))
+
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_events_timestamp_status ON events ("timestamp", status_id)'
+    ))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_events_errors_timestamp ON events ("timestamp") '
+        f"WHERE status_id = {STATUS_IDS['error']}"
+    ))
+    logger.info(
+        "Event dimensions encoded; the old text columns' space is reclaimed by "
+        "VACUUM (SQLite) or VACUUM FULL / pg_repack (PostgreSQL)"
+    )
+
+
+def _add_counter_caches(conn: Connection) -> None:
+    """v7: test case and defect counter caches on services and test_cases, filled from the rows."""
+    for counter in COUNTERS:
+        conn.execute(text(
+            f"ALTER TABLE {counter.target.__tablename__} "
+            f"ADD COLUMN {counter.column} INTEGER NOT NULL DEFAULT 0"
+        ))
+    repair_counters(conn)
+    if conn.dialect.name == "postgresql":
+        # The view definition now sums the counters
+        conn.execute(text("DROP MATERIALIZED VIEW IF EXISTS dashboard_summary"))
+        create_dashboard_summary(conn)
+
+
+def _add_import_checkpoints(conn: Connection) -> None:
+    """v8: import_checkpoints is created by create_all."""
+
+
+def _add_client_event_ids(conn: Connection) -> None:
+    """v9: optional client_event_id on events, unique with the timestamp."""
+    conn.execute(text("ALTER TABLE events ADD COLUMN client_event_id VARCHAR(100)"))
+    conn.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS ix_events_client_event_id ON events (client_event_id, "timestamp")'
+    ))
+
+
+def _add_archive_checkpoints(conn: Connection) -> None:
+    """v10: archive_checkpoints is created by create_all."""
+
+
+# (version, description, step). A step upgrades a database from version - 1 to
+# version and receives a connection inside the migration transaction. Tables that
+# are new in that version are already created by create_all before steps run.
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (2, "composite and partial indexes on events", _add_event_filter_indexes),
+    (3, "hourly event rollups", _add_event_rollups),
+    (4, "materialized dashboard summary", _add_dashboard_summary),
+    (5, "indexed event metadata", _add_event_metadata_indexes),
+    (6, "dictionary-encoded event dimensions", _encode_event_dimensions),
+    (7, "test case and defect counter caches", _add_counter_caches),
+    (8, "resumable event import checkpoints", _add_import_checkpoints),
+    (9, "client event ids for idempotent ingestion", _add_client_event_ids),
+    (10, "archive batch checkpoints", _add_archive_checkpoints),
+]
+
+# Arbitrary application-wide key for the Postgres advisory lock that serialises
+# migrations when several app processes start at once.
+_MIGRATION_LOCK_KEY = 74_210_001
+
+
+def get_applied_version(engine: Engine) -> Optional[int]:
+    """Return the latest applied schema version, or None if the table is missing."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(func.max(SchemaVersion.version))).scalar()
+    except (OperationalError, ProgrammingError):
+        return None
+
+
+def ensure_schema(engine: Engine, partition_events: bool = False) -> int:
+    """
+    Bring the database schema up to SCHEMA_VERSION.
+
+    With ``partition_events`` a new PostgreSQL database gets a monthly
+    partitioned ``events`` table (see ``database.partitioning``); existing
+    databases are converted separately with ``manage.py partitions --convert``.
+
+    Returns the schema version the database is at afterwards.
+    """
+    start = time.perf_counter()
+    applied = get_applied_version(engine)
+    if applied is not None and applied >= SCHEMA_VERSION:
+        logger.info(
+            f"Schema v{applied} up to date; bootstrap check took "
+            f"{(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+        return applied
+
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _MIGRATION_LOCK_KEY})
+            # Another process may have migrated while we waited for the lock.
+            if inspect(conn).has_table(SchemaVersion.__tablename__):
+                applied = conn.execute(select(func.max(SchemaVersion.version))).scalar()
+                if applied is not None and applied >= SCHEMA_VERSION:
+                    return applied
+
+        # Databases created before versioning have the original tables but no
+        # version row; treat them as version 1 so later steps still run.
+        if applied is None and inspect(conn).has_table("events"):
+            applied = 1
+        is_new = applied is None
+
+        Base.metadata.create_all(bind=conn)
+        if is_new and partition_events and conn.dialect.name == "postgresql":
+            convert_events_table(conn)
+        if is_new:
+            # Not part of Base.metadata (a view on PostgreSQL, generated columns on SQLite)
+            create_dashboard_summary(conn)
+            promote_metadata_keys(conn)
+
+        if not is_new:
+            for version, description, step in MIGRATIONS:
+                if version > applied:
+                    logger.info(f"Applying schema migration v{version}: {description}")
+                    step(conn)
+
+        conn.execute(
+            SchemaVersion.__table__.insert(),
+            {"version": SCHEMA_VERSION, "description": "initial schema" if is_new else "migrated"},
+        )
+
+    logger.info(
+        f"Schema {'created' if is_new else f'migrated from v{applied}'} at "
+        f"v{SCHEMA_VERSION} in {(time.perf_counter() - start) * 1000:.1f} ms"
+    )
+    return SCHEMA_VERSION
@@ -1,9 +1,11 @@
 """
 SQLAlchemy database models for the Digital Service Analytics platform.
 """
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text, Enum
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, ForeignKey, Float, Text, Enum, Index, JSON, event, func, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import Session, object_session, relationship
+from sqlalchemy.orm.attributes import flag_dirty
 from datetime import datetime
 import enum
 
@@ -24,6 +26,9 @@ class EventStatus(enum.Enum):
     PENDING = "pending"
 
 
+# Fixed ids of the seeded event_statuses rows, in enum order
+STATUS_IDS = {status.value: i for i, status in enumerate(EventStatus, start=1)}
+
 class DefectSeverity(enum.Enum):
     """Defect severity enumeration."""
     CRITICAL = "Critical"
@@ -64,6 +69,16 @@ class Service(Base):
     description = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Counter caches maintained on flush (see database.counters)
+    test_cases_count = Column(Integer, nullable=False, default=0, server_default="0")
+    not_started_test_cases_count = Column(Integer, nullable=False, default=0, server_default="0")
+    passed_test_cases_count = Column(Integer, nullable=False, default=0, server_default="0")
+    failed_test_cases_count = Column(Integer, nullable=False, default=0, server_default="0")
+    blocked_test_cases_count = Column(Integer, nullable=False, default=0, server_default="0")
+    defects_count = Column(Integer, nullable=False, default=0, server_default="0")
+    open_defects_count = Column(Integer, nullable=False, default=0, server_default="0")
+    critical_defects_count = Column(Integer, nullable=False, default=0, server_default="0")
+
     # Relationships
     events = relationship("Event", back_populates="service", cascade="all, delete-orphan")
     test_cases = relationship("TestCase", back_populates="service", cascade="all, delete-orphan")
@@ -72,24 +87,161 @@ class Service(Base):
         return f"<Service(name='{self.name}', channel='{self.channel}')>"
 
 
+class EventAction(Base):
+    """Lookup table of event action names."""
+    __tablename__ = "event_actions"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(200), nullable=False, unique=True)
+
+    def __repr__(self):
+        return f"<EventAction(id={self.id}, name='{self.name}')>"
+
+
+class EventStatusName(Base):
+    """Lookup table of event statuses, seeded with STATUS_IDS."""
+    __tablename__ = "event_statuses"
+
+    # SQLite only autoincrements INTEGER primary keys
+    id = Column(SmallInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    name = Column(String(50), nullable=False, unique=True)
+
+    def __repr__(self):
+        return f"<EventStatusName(id={self.id}, name='{self.name}')>"
+
+
+@event.listens_for(EventStatusName.__table__, "after_create")
+def _seed_event_statuses(target, connection, **kw):
+    # Inserted in order into the empty table, so the ids match STATUS_IDS,
+    # which the partial error index relies on
+    connection.execute(target.insert(), [{"name": name} for name in STATUS_IDS])
+
+
+class ErrorMessage(Base):
+    """Lookup table of distinct event error messages."""
+    __tablename__ = "error_messages"
+
+    id = Column(Integer, primary_key=True)
+    message = Column(Text, nullable=False)
+
+    __table_args__ = (
+        # PostgreSQL b-tree entries are limited to about 2.7KB, so unbounded
+        # messages are kept unique by their hash there (see Dimension.hashed)
+        Index("ix_error_messages_message", "message", unique=True).ddl_if(dialect="sqlite"),
+        Index("ix_error_messages_message_md5", func.md5(text("message")), unique=True).ddl_if(dialect="postgresql"),
+    )
+
+    def __repr__(self):
+        return f"<ErrorMessage(id={self.id}, message='{self.message[:50]}')>"
+
+
+class _DimensionAttribute:
+    """
+    Name-valued attribute backed by a lookup-table id column.
+
+    Assigning a name stores it until the next flush, where the session hook in
+    ``database.dimensions`` resolves all pending names in one lookup per table.
+    Reading decodes the id through the in-process cache.
+    """
+
+    def __init__(self, dimension: str, id_attr: str):
+        self.dimension = dimension
+        self.id_attr = id_attr
+
+    def __set_name__(self, owner, name):
+        self.pending_attr = f"_pending_{name}"
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        if self.pending_attr in obj.__dict__:
+            return obj.__dict__[self.pending_attr]
+        value_id = getattr(obj, self.id_attr)
+        if value_id is None:
+            return None
+        from database.dimensions import DIMENSIONS
+        session = object_session(obj)
+        return DIMENSIONS[self.dimension].name_for(session.connection() if session else None, value_id)
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.pending_attr] = value
+        # Lets the flush see events whose only change is a pending name
+        flag_dirty(obj)
+
+
 class Event(Base):
     """Digital journey event model."""
     __tablename__ = "events"
 
     id = Column(Integer, primary_key=True, index=True)
-    service_id = Column(Integer, ForeignKey("services.id"), nullable=False, index=True)
-    action = Column(String(200), nullable=False)  # login, checkout, payment, etc.
-    status = Column(String(50), nullable=False, default="success")
-    timestamp = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    service_id = Column(Integer, ForeignKey("services.id"), nullable=False)
+    # action, status and error_message are stored as lookup-table ids
+    action_id = Column(Integer, ForeignKey("event_actions.id"), nullable=False)
+    status_id = Column(SmallInteger, ForeignKey("event_statuses.id"), nullable=False, default=STATUS_IDS["success"])
+    timestamp = Column(DateTime, nullable=False, default=datetime.utcnow)
     journey_time = Column(Float, nullable=True)  # Time in seconds
-    error_message = Column(Text, nullable=True)
-    event_metadata = Column(Text, nullable=True)  # JSON string for additional data
+    error_message_id = Column(Integer, ForeignKey("error_messages.id"), nullable=True)
+    # JSON object of additional attributes; jsonb on PostgreSQL (see database.event_metadata)
+    event_metadata = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
+    # Sender's id for the event; repeats with the same timestamp are dropped (see database.bulk_load)
+    client_event_id = Column(String(100), nullable=True)
+
+    # Names for the id columns: login, checkout, payment, etc.
+    action = _DimensionAttribute("action", "action_id")
+    status = _DimensionAttribute("status", "status_id")
+    error_message = _DimensionAttribute("error_message", "error_message_id")
+
+    # Indexes follow the filters the pages actually use. The composite indexes
+    # also serve the single-column lookups their leading column covers.
+    __table_args__ = (
+        # Analytics: one service over a time range
+        Index("ix_events_service_id_timestamp", "service_id", "timestamp"),
+        # Dashboard: time window broken down by status
+        Index("ix_events_timestamp_status", "timestamp", "status_id"),
+        # Error drill-downs touch a small fraction of rows
+        Index(
+            "ix_events_errors_timestamp", "timestamp",
+            postgresql_where=text(f"status_id = {STATUS_IDS['error']}"),
+            sqlite_where=text(f"status_id = {STATUS_IDS['error']}"),
+        ),
+        # Tiny block-range index for time scans on large, append-only tables
+        Index("ix_events_timestamp_brin", "timestamp", postgresql_using="brin").ddl_if(dialect="postgresql"),
+        # Idempotent ingestion; includes the partition key so it also works partitioned
+        Index("ix_events_client_event_id", "client_event_id", "timestamp", unique=True),
+        # Metadata containment filters (@>); SQLite indexes promoted keys instead
+        Index(
+            "ix_events_metadata_gin", "event_metadata",
+            postgresql_using="gin", postgresql_ops={"event_metadata": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     # Relationships
     service = relationship("Service", back_populates="events")
 
     def __repr__(self):
-        return f"<Event(service_id={self.service_id}, action='{self.action}', status='{self.status}')>"
+        return f"<Event(service_id={self.service_id}, action_id={self.action_id}, status_id={self.status_id})>"
+
+
+@event.listens_for(Session, "before_flush")
+def _resolve_event_names(session, flush_context, instances):
+    # Imported here: database.dimensions imports these models
+    from database.dimensions import resolve_pending_names
+    events = [obj for obj in (*session.new, *session.dirty) if isinstance(obj, Event)]
+    if events:
+        resolve_pending_names(session.connection(), events)
+
+
+@event.listens_for(Session, "before_flush")
+def _record_counted_rows(session, flush_context, instances):
+    # Imported here: database.counters imports these models
+    from database.counters import record_removed_counts
+    record_removed_counts(session)
+
+
+@event.listens_for(Session, "after_flush")
+def _update_counter_caches(session, flush_context):
+    from database.counters import apply_counter_deltas
+    apply_counter_deltas(session)
 
 
 class TestCase(Base):
@@ -105,6 +257,8 @@ class TestCase(Base):
     status = Column(String(50), default="Not Started")  # Not Started, Passed, Failed, Blocked
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Counter cache maintained on flush (see database.counters)
+    defects_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationships
     service = relationship("Service", back_populates="test_cases")
@@ -140,3 +294,82 @@ class Defect(Base):
 
 
 
+
+
+class EventRollup(Base):
+    """Hourly event aggregates per service, action and status."""
+    __tablename__ = "event_rollups"
+
+    hour = Column(DateTime, primary_key=True)  # Start of the hour
+    service_id = Column(Integer, ForeignKey("services.id"), primary_key=True)
+    action = Column(String(200), primary_key=True)
+    status = Column(String(50), primary_key=True)
+    event_count = Column(Integer, nullable=False, default=0)
+    # Journey time is only recorded for some events, so it has its own count
+    journey_count = Column(Integer, nullable=False, default=0)
+    journey_time_sum = Column(Float, nullable=False, default=0.0)
+    journey_time_sumsq = Column(Float, nullable=False, default=0.0)
+    journey_time_min = Column(Float, nullable=True)
+    journey_time_max = Column(Float, nullable=True)
+
+    __table_args__ = (
+        # Per-service windows; windows across all services use the primary key
+        Index("ix_event_rollups_service_id_hour", "service_id", "hour"),
+    )
+
+    def __repr__(self):
+        return f"<EventRollup(hour={self.hour}, service_id={self.service_id}, status='{self.status}')>"
+
+
+class RollupState(Base):
+    """High-water marks of incrementally maintained aggregates."""
+    __tablename__ = "rollup_state"
+
+    name = Column(String(100), primary_key=True)
+    last_event_id = Column(Integer, nullable=False, default=0)  # Highest Event.id aggregated
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<RollupState(name='{self.name}', last_event_id={self.last_event_id})>"
+
+
+class ImportCheckpoint(Base):
+    """Progress of resumable event file imports."""
+    __tablename__ = "import_checkpoints"
+
+    source = Column(String(500), primary_key=True)  # Absolute path of the imported file
+    fingerprint = Column(String(100), nullable=False)  # Size and modification time when started
+    chunk_size = Column(Integer, nullable=False)
+    chunks_done = Column(Integer, nullable=False, default=0)  # Chunks committed so far
+    rows_loaded = Column(Integer, nullable=False, default=0)
+    rows_rejected = Column(Integer, nullable=False, default=0)
+    completed_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ImportCheckpoint(source='{self.source}', chunks_done={self.chunks_done})>"
+
+
+class ArchiveCheckpoint(Base):
+    """Event id range of an archive batch whose files may be written but whose events are not deleted yet."""
+    __tablename__ = "archive_checkpoints"
+
+    path = Column(String(500), primary_key=True)  # Absolute path of the archive
+    low_id = Column(Integer, nullable=False)
+    high_id = Column(Integer, nullable=False)
+    started_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ArchiveCheckpoint(path='{self.path}', low_id={self.low_id}, high_id={self.high_id})>"
+
+
+class SchemaVersion(Base):
+    """Applied schema versions, used to skip table introspection on startup."""
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String(300), nullable=True)
+    applied_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<SchemaVersion(version={self.version})>"
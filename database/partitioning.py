@@ -0,0 +1,206 @@
+"""
+Monthly range partitioning of the events table (PostgreSQL only).
+
+With partitioning enabled ``events`` is a partitioned table with one child per
+calendar month (``events_p2024_01`` holds January 2024) plus ``events_default``
+for rows outside every monthly range. Queries that filter ``timestamp`` with
+constant bounds only touch the months they cover, and retention becomes a
+metadata operation: an expired month is detached (and optionally dropped)
+instead of deleted row by row.
+
+Postgres requires the partition key in every unique constraint, so the primary
+key of a partitioned ``events`` is ``(id, timestamp)``. Ids still come from the
+same sequence and stay unique, so the ORM keeps treating ``id`` as the key.
+
+``maintain_partitions`` is run by ``python manage.py partitions`` and should be
+scheduled (e.g. daily) so future months always exist before rows arrive.
+"""
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Union
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from database.models import Event
+from utils.logger import logger
+
+DEFAULT_PARTITION = "events_default"
+_PARTITION_NAME = re.compile(r"^events_p(\d{4})_(\d{2})$")
+
+
+def _month_start(value: Union[date, datetime]) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Name of the partition holding ``month``."""
+    return f"events_p{month.year:04d}_{month.month:02d}"
+
+
+def event_time_bounds(
+    start_date: Optional[Union[date, datetime]] = None,
+    end_date: Optional[Union[date, datetime]] = None,
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Turn an inclusive day range into half-open ``[start, end)`` timestamps.
+
+    Both bounds are plain constants on day boundaries, so filtering
+    ``Event.timestamp >= start`` and ``Event.timestamp < end`` lets the planner
+    prune partitions (and use the timestamp indexes) without any function
+    applied to the column.
+    """
+    start = datetime.combine(start_date, datetime.min.time()) if start_date else None
+    end = datetime.combine(end_date, datetime.min.time()) + timedelta(days=1) if end_date else None
+    return start, end
+
+
+def is_partitioned(conn: Connection) -> bool:
+    """Whether ``events`` is a partitioned table on this connection's database."""
+    if conn.dialect.name != "postgresql":
+        return False
+    relkind = conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass('events')")
+    ).scalar()
+    return relkind == "p"
+
+
+def list_partitions(conn: Connection) -> List[Tuple[str, date]]:
+    """Monthly partitions currently attached to ``events``, oldest first."""
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('events')"
+    ))
+    partitions = []
+    for (name,) in rows:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(conn: Connection, month: date) -> str:
+    """
+    Create and attach the partition for ``month``.
+
+    Rows for that month that already landed in the default partition are moved
+    into the new partition first, since Postgres refuses to attach a range the
+    default partition still holds rows for.
+    """
+    name = partition_name(month)
+    lower, upper = month.isoformat(), _add_months(month, 1).isoformat()
+    conn.execute(text(f"CREATE TABLE {name} (LIKE events INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+        f"WHERE \"timestamp\" >= '{lower}' AND \"timestamp\" < '{upper}' RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ))
+    conn.execute(text(f"ALTER TABLE events ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')"))
+    logger.info(f"Created events partition {name}")
+    return name
+
+
+def _table_constraints(conn: Connection, table: str) -> Dict[str, str]:
+    """Foreign key and check constraints of ``table``: name → definition."""
+    return dict(conn.execute(text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = CAST(:table AS regclass) AND contype IN ('f', 'c')"
+    ), {"table": table}).all())
+
+
+def convert_events_table(conn: Connection, months_ahead: int = 3) -> None:
+    """
+    Rebuild ``events`` as a monthly partitioned table, keeping its rows.
+
+    Runs inside the caller's transaction. On an existing database this copies
+    every event once, so run it in a maintenance window; new databases convert
+    the empty table at creation. Foreign key and check constraints are carried
+    over unchanged; the primary key becomes ``(id, timestamp)``.
+    """
+    if is_partitioned(conn):
+        return
+
+    constraints = _table_constraints(conn, "events")
+    conn.execute(text("ALTER TABLE events RENAME TO events_legacy"))
+    conn.execute(text("ALTER TABLE events_legacy RENAME CONSTRAINT events_pkey TO events_legacy_pkey"))
+    for index in Event.__table__.indexes:
+        conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence('events_legacy', 'id')")).scalar()
+
+    conn.execute(text(
+        'CREATE TABLE events (LIKE events_legacy INCLUDING DEFAULTS) PARTITION BY RANGE ("timestamp")'
+    ))
+    conn.execute(text('ALTER TABLE events ADD PRIMARY KEY (id, "timestamp")'))
+    for index in Event.__table__.indexes:
+        index.create(conn)
+    conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF events DEFAULT"))
+
+    oldest = conn.execute(text('SELECT min("timestamp") FROM events_legacy')).scalar()
+    month = _month_start(oldest or datetime.now())
+    last = _add_months(_month_start(datetime.now()), months_ahead)
+    while month <= last:
+        create_partition(conn, month)
+        month = _add_months(month, 1)
+
+    conn.execute(text("INSERT INTO events SELECT * FROM events_legacy"))
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY events.id"))
+    conn.execute(text("DROP TABLE events_legacy"))
+    # LIKE copies no constraints; added after the copy so rows are checked once
+    for name, definition in constraints.items():
+        conn.execute(text(f'ALTER TABLE events ADD CONSTRAINT "{name}" {definition}'))
+    converted = _table_constraints(conn, "events")
+    if converted != constraints:
+        raise RuntimeError(f"events constraints changed in conversion: {constraints} -> {converted}")
+    logger.info("Converted events to a monthly partitioned table")
+
+
+def maintain_partitions(
+    conn: Connection,
+    months_ahead: int = 3,
+    retention_months: Optional[int] = None,
+    drop_expired: bool = False,
+    dry_run: bool = False,
+    today: Optional[date] = None,
+) -> Dict[str, List[str]]:
+    """
+    Pre-create future partitions and retire expired ones.
+
+    Ensures a partition exists for the current month and the next
+    ``months_ahead`` months. With ``retention_months`` set, partitions whose
+    whole month ended before the first day of the month ``retention_months``
+    ago are detached (left as standalone tables, e.g. for archiving) or, with
+    ``drop_expired``, dropped. Each step is a catalog change, so its cost does
+    not depend on how many rows the month holds.
+
+    Returns the partition names by action ("created", "detached", "dropped").
+    """
+    summary: Dict[str, List[str]] = {"created": [], "detached": [], "dropped": []}
+    current = _month_start(today or date.today())
+    existing = {month: name for name, month in list_partitions(conn)}
+
+    for offset in range(months_ahead + 1):
+        month = _add_months(current, offset)
+        if month not in existing:
+            summary["created"].append(partition_name(month) if dry_run else create_partition(conn, month))
+
+    if retention_months is not None:
+        cutoff = _add_months(current, -retention_months)
+        for month, name in sorted(existing.items()):
+            if _add_months(month, 1) > cutoff:
+                break
+            if drop_expired:
+                summary["dropped"].append(name)
+            else:
+                summary["detached"].append(name)
+            if dry_run:
+                continue
+            conn.execute(text(f"ALTER TABLE events DETACH PARTITION {name}"))
+            if drop_expired:
+                conn.execute(text(f"DROP TABLE {name}"))
+            logger.info(f"{'Dropped' if drop_expired else 'Detached'} expired events partition {name}")
+
+    return summary
@@ -0,0 +1,300 @@
+"""
+Hourly event rollups.
+
+``event_rollups`` holds one row per (hour, service, action, status) with the
+event count and journey-time count, sum, sum of squares, min and max, which is
+enough to derive totals, rates, means and standard deviations for any window
+made of whole hours. Pages read a few thousand rollup rows instead of every raw
+event in the window.
+
+``refresh_rollups`` folds new events into the table incrementally: the highest
+``Event.id`` already aggregated is kept in ``rollup_state``, and each run
+aggregates the events above it in bounded batches. ``rollup_rows`` returns the
+rollups for a window plus the events above the high-water mark aggregated on
+the fly, so readers get exact figures even when the job is behind.
+``kpi_totals`` sums those rows in the database into the single row of counts
+behind the KPI tiles.
+
+The refresh runs on the background scheduler (every ``[rollups]
+refresh_interval`` seconds) and from ``python manage.py rollups``. Rollups
+are not adjusted when events are updated or deleted; ``clear_all_data`` resets
+them together with the events, and detached partitions keep their rollups.
+"""
+import time
+from datetime import datetime
+from typing import Optional, Sequence
+from sqlalchemy import DateTime, case, func, select, text, union_all, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement, FunctionElement, Select
+from database.models import Event, EventAction, EventRollup, EventStatusName, RollupState
+from utils.logger import logger
+
+ROLLUP_NAME = "event_rollups"
+
+# Seconds a refresh waits for inserts in flight to finish before skipping
+SETTLE_TIMEOUT = 5.0
+
+
+class hour_bucket(FunctionElement):
+    """Truncate a timestamp to the start of its hour."""
+    type = DateTime()
+    name = "hour_bucket"
+    inherit_cache = True
+
+
+@compiles(hour_bucket, "postgresql")
+def _hour_bucket_postgresql(element, compiler, **kw):
+    return f"date_trunc('hour', {compiler.process(element.clauses, **kw)})"
+
+
+@compiles(hour_bucket, "sqlite")
+def _hour_bucket_sqlite(element, compiler, **kw):
+    # Same text format SQLAlchemy stores DateTime values in, so buckets compare
+    # and conflict correctly with stored rollup hours
+    return f"strftime('%Y-%m-%d %H:00:00.000000', {compiler.process(element.clauses, **kw)})"
+
+
+def _aggregate_events(*conditions) -> Select:
+    """Aggregate raw events matching ``conditions`` into rollup-shaped rows."""
+    bucket = hour_bucket(Event.timestamp)
+    # Grouped by id; the names are joined in per group, not per event
+    grouped = select(
+        bucket.label("hour"),
+        Event.service_id,
+        Event.action_id,
+        Event.status_id,
+        func.count().label("event_count"),
+        func.count(Event.journey_time).label("journey_count"),
+        func.coalesce(func.sum(Event.journey_time), 0.0).label("journey_time_sum"),
+        func.coalesce(func.sum(Event.journey_time * Event.journey_time), 0.0).label("journey_time_sumsq"),
+        func.min(Event.journey_time).label("journey_time_min"),
+        func.max(Event.journey_time).label("journey_time_max"),
+    ).where(*conditions).group_by(bucket, Event.service_id, Event.action_id, Event.status_id).subquery()
+    return (
+        select(
+            grouped.c.hour,
+            grouped.c.service_id,
+            EventAction.name.label("action"),
+            EventStatusName.name.label("status"),
+            grouped.c.event_count,
+            grouped.c.journey_count,
+            grouped.c.journey_time_sum,
+            grouped.c.journey_time_sumsq,
+            grouped.c.journey_time_min,
+            grouped.c.journey_time_max,
+        )
+        .join_from(grouped, EventAction, EventAction.id == grouped.c.action_id)
+        .join(EventStatusName, EventStatusName.id == grouped.c.status_id)
+    )
+
+
+def rollup_rows(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    service_id: Optional[int] = None,
+    event_conditions: Sequence[ColumnElement] = (),
+) -> Select:
+    """
+    Rollup rows for hours in ``[start, end)``, including events not yet rolled up.
+
+    Bounds should fall on hour boundaries; an hour is included when it starts
+    inside the window. The rollups and the high-water mark are read in the same
+    statement, so no event is counted twice or missed.
+
+    ``event_conditions`` filter on event columns the rollups do not keep (such
+    as metadata); the rows are then aggregated from the matching raw events.
+    """
+    if event_conditions:
+        conditions = list(event_conditions)
+        if start:
+            conditions.append(Event.timestamp >= start)
+        if end:
+            conditions.append(Event.timestamp < end)
+        if service_id:
+            conditions.append(Event.service_id == service_id)
+        return _aggregate_events(*conditions)
+
+    rolled_conditions = []
+    tail_conditions = [
+        Event.id > func.coalesce(
+            select(RollupState.last_event_id).where(RollupState.name == ROLLUP_NAME).scalar_subquery(), 0
+        )
+    ]
+    if start:
+        rolled_conditions.append(EventRollup.hour >= start)
+        tail_conditions.append(Event.timestamp >= start)
+    if end:
+        rolled_conditions.append(EventRollup.hour < end)
+        tail_conditions.append(Event.timestamp < end)
+    if service_id:
+        rolled_conditions.append(EventRollup.service_id == service_id)
+        tail_conditions.append(Event.service_id == service_id)
+
+    rolled = select(
+        EventRollup.hour,
+        EventRollup.service_id,
+        EventRollup.action,
+        EventRollup.status,
+        EventRollup.event_count,
+        EventRollup.journey_count,
+        EventRollup.journey_time_sum,
+        EventRollup.journey_time_sumsq,
+        EventRollup.journey_time_min,
+        EventRollup.journey_time_max,
+    ).where(*rolled_conditions)
+    return union_all(rolled, _aggregate_events(*tail_conditions))
+
+
+def kpi_totals(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    service_id: Optional[int] = None,
+    event_conditions: Sequence[ColumnElement] = (),
+) -> Select:
+    """
+    KPI counts for a window (see ``rollup_rows`` for the arguments) as one row.
+
+    The row has ``total_events``, ``success_count``, ``error_count``,
+    ``pending_count``, ``journey_count`` and ``journey_time_sum`` (zero for an
+    empty window), summed in the database so the figures cost one round trip.
+    """
+    rows = rollup_rows(start, end, service_id, event_conditions).subquery()
+
+    def total(column: ColumnElement) -> ColumnElement:
+        return func.coalesce(func.sum(column), 0)
+
+    def status_count(status: str) -> ColumnElement:
+        return total(case((rows.c.status == status, rows.c.event_count), else_=0))
+
+    return select(
+        total(rows.c.event_count).label("total_events"),
+        status_count("success").label("success_count"),
+        status_count("error").label("error_count"),
+        status_count("pending").label("pending_count"),
+        total(rows.c.journey_count).label("journey_count"),
+        func.coalesce(func.sum(rows.c.journey_time_sum), 0.0).label("journey_time_sum"),
+    )
+
+
+def _smaller(a: ColumnElement, b: ColumnElement) -> ColumnElement:
+    """NULL-ignoring minimum of two values, portable across backends."""
+    a, b = func.coalesce(a, b), func.coalesce(b, a)
+    return case((a <= b, a), else_=b)
+
+
+def _larger(a: ColumnElement, b: ColumnElement) -> ColumnElement:
+    """NULL-ignoring maximum of two values, portable across backends."""
+    a, b = func.coalesce(a, b), func.coalesce(b, a)
+    return case((a >= b, a), else_=b)
+
+
+def _upsert_rollups(conn: Connection, low: int, high: int) -> None:
+    """Add the events with ``low < id <= high`` into the rollup rows."""
+    insert = pg_insert if conn.dialect.name == "postgresql" else sqlite_insert
+    source = _aggregate_events(Event.id > low, Event.id <= high)
+    stmt = insert(EventRollup).from_select(
+        [column.name for column in source.selected_columns], source
+    )
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[EventRollup.hour, EventRollup.service_id, EventRollup.action, EventRollup.status],
+        set_={
+            "event_count": EventRollup.event_count + excluded.event_count,
+            "journey_count": EventRollup.journey_count + excluded.journey_count,
+            "journey_time_sum": EventRollup.journey_time_sum + excluded.journey_time_sum,
+            "journey_time_sumsq": EventRollup.journey_time_sumsq + excluded.journey_time_sumsq,
+            "journey_time_min": _smaller(EventRollup.journey_time_min, excluded.journey_time_min),
+            "journey_time_max": _larger(EventRollup.journey_time_max, excluded.journey_time_max),
+        },
+    )
+    conn.execute(stmt)
+
+
+def _settled_max_id(engine: Engine) -> Optional[int]:
+    """
+    Highest event id whose inserting transaction has committed.
+
+    Ids are assigned at insert time but become visible at commit, so a slow
+    transaction can commit an id below one that is already rolled up. On
+    Postgres the highest visible id is read first, then the snapshot's xmax:
+    once the oldest running transaction (the snapshot's xmin) is past it,
+    every transaction that could still hold a lower id has finished. Only the
+    refresh waits, never the writers; after ``SETTLE_TIMEOUT`` seconds (a long
+    import) it returns None and the refresh is skipped. SQLite has a single
+    writer, so ids commit in order.
+    """
+    with engine.connect() as conn:
+        ceiling, rolled = conn.execute(select(
+            func.max(Event.id),
+            select(RollupState.last_event_id).where(RollupState.name == ROLLUP_NAME).scalar_subquery(),
+        )).one()
+        # Nothing new since the last refresh: no need to wait for anyone
+        if conn.dialect.name != "postgresql" or ceiling is None or ceiling <= (rolled or 0):
+            return ceiling
+
+        xmax = conn.execute(text("SELECT pg_snapshot_xmax(pg_current_snapshot())::text")).scalar()
+        settled = text("SELECT pg_snapshot_xmin(pg_current_snapshot()) >= CAST(:xmax AS xid8)")
+        deadline = time.monotonic() + SETTLE_TIMEOUT
+        while not conn.execute(settled, {"xmax": xmax}).scalar():
+            if time.monotonic() >= deadline:
+                logger.warning("Skipping rollup refresh, inserts into events are still in flight")
+                return None
+            time.sleep(0.05)
+        return ceiling
+
+
+def refresh_rollups(engine: Engine, batch_size: int = 100_000) -> int:
+    """
+    Fold events above the high-water mark into ``event_rollups``.
+
+    Each batch of at most ``batch_size`` events is aggregated and the mark
+    advanced in one transaction. Returns the number of events rolled up.
+    """
+    ceiling = _settled_max_id(engine)
+
+    processed = 0
+    while ceiling is not None:
+        with engine.begin() as conn:
+            # Touch the state row first: the row (or SQLite write) lock makes a
+            # concurrent refresh wait and then read the advanced mark.
+            claimed = conn.execute(
+                update(RollupState)
+                .where(RollupState.name == ROLLUP_NAME)
+                .values(updated_at=datetime.utcnow())
+            ).rowcount
+            if not claimed:
+                conn.execute(RollupState.__table__.insert(), {"name": ROLLUP_NAME, "last_event_id": 0})
+            low = conn.execute(
+                select(RollupState.last_event_id).where(RollupState.name == ROLLUP_NAME)
+            ).scalar()
+
+            batch = (
+                select(Event.id)
+                .where(Event.id > low, Event.id <= ceiling)
+                .order_by(Event.id)
+                .limit(batch_size)
+                .subquery()
+            )
+            high, count = conn.execute(select(func.max(batch.c.id), func.count(batch.c.id))).one()
+            if high is None:
+                break
+
+            _upsert_rollups(conn, low, high)
+            conn.execute(
+                update(RollupState).where(RollupState.name == ROLLUP_NAME).values(last_event_id=high)
+            )
+            processed += count
+            logger.debug(f"Rolled up events {low + 1}..{high} ({count:,} events)")
+
+    if processed:
+        logger.info(f"Rolled up {processed:,} events into {ROLLUP_NAME}")
+    return processed
+
+
+def reset_rollups(conn: Connection) -> None:
+    """Empty the rollups and reset the high-water mark (after events are cleared)."""
+    conn.execute(EventRollup.__table__.delete())
+    conn.execute(RollupState.__table__.delete().where(RollupState.name == ROLLUP_NAME))
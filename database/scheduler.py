@@ -0,0 +1,99 @@
+"""
+Background scheduler for periodic database maintenance.
+
+One daemon thread per server process runs each registered job on its own
+interval: folding new events into the hourly rollups and rebuilding the
+dashboard summary. Jobs run one at a time and a failing job is logged and
+retried at its next interval. Several app processes may each run a
+scheduler; the jobs themselves skip work another process has just done.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+import streamlit as st
+from config.settings import get_dashboard_config, get_rollup_config
+from database.connection import get_engine
+from database.rollups import refresh_rollups
+from database.summary import refresh_dashboard_summary
+from utils.logger import logger
+
+# How often the scheduler thread wakes up to look for due jobs
+TICK_SECONDS = 1.0
+
+
+@dataclass
+class Job:
+    """A function run every ``interval`` seconds."""
+    name: str
+    interval: float
+    func: Callable[[], object]
+    last_run: Optional[float] = None
+    last_error: Optional[str] = None
+
+    def is_due(self, now: float) -> bool:
+        return self.last_run is None or now - self.last_run >= self.interval
+
+
+class Scheduler:
+    """Runs registered jobs on a background thread."""
+
+    def __init__(self):
+        self.jobs: List[Job] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_job(self, name: str, interval: float, func: Callable[[], object]) -> None:
+        """Register ``func`` to run every ``interval`` seconds; 0 disables it."""
+        if interval:
+            self.jobs.append(Job(name, float(interval), func))
+
+    def run_pending(self) -> None:
+        """Run every job that is due."""
+        for job in self.jobs:
+            now = time.monotonic()
+            if not job.is_due(now):
+                continue
+            job.last_run = now
+            try:
+                job.func()
+                job.last_error = None
+            except Exception as e:
+                job.last_error = str(e)
+                logger.warning(f"Scheduled job {job.name} failed: {e}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(TICK_SECONDS):
+            self.run_pending()
+
+    def start(self) -> None:
+        if self._thread is None and self.jobs:
+            self._thread = threading.Thread(target=self._run, name="db-scheduler", daemon=True)
+            self._thread.start()
+            logger.info(f"Background scheduler started: {', '.join(job.name for job in self.jobs)}")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+@st.cache_resource
+def start_scheduler() -> Scheduler:
+    """Create and start the process-wide maintenance scheduler."""
+    engine = get_engine()
+    rollup_config = get_rollup_config()
+    dashboard_interval = get_dashboard_config()["refresh_interval"]
+
+    scheduler = Scheduler()
+    scheduler.add_job(
+        "rollups",
+        rollup_config["refresh_interval"],
+        lambda: refresh_rollups(engine, rollup_config["batch_size"]),
+    )
+    # Skip the rebuild if another process refreshed within half an interval
+    scheduler.add_job(
+        "dashboard_summary",
+        dashboard_interval,
+        lambda: refresh_dashboard_summary(engine, min_age=dashboard_interval / 2),
+    )
+    scheduler.start()
+    return scheduler
@@ -0,0 +1,157 @@
+"""
+Materialized executive dashboard summary.
+
+The dashboard KPIs (services, 30-day event counts, test case and defect
+figures) are computed once per refresh into a single ``dashboard_summary`` row
+instead of on every page view. On PostgreSQL the row is a materialized view
+refreshed with ``REFRESH MATERIALIZED VIEW CONCURRENTLY``, so readers never
+block; on SQLite it is a one-row table rebuilt in a transaction.
+
+Event counts come from the hourly rollups, which ``refresh_dashboard_summary``
+brings up to date first. The row carries ``refreshed_at`` so the page can show
+how old the figures are. Refreshes run on the background scheduler (every
+``[dashboard] refresh_interval`` seconds) and from
+``python manage.py refresh-summary``.
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, Table, func, literal, literal_column, select, text,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql.expression import ColumnElement, Select
+from database.models import Defect, EventRollup, Service
+from database.rollups import refresh_rollups
+from utils.logger import logger
+
+SUMMARY_WINDOW_DAYS = 30
+
+# Kept out of Base.metadata: on PostgreSQL this is a materialized view, which
+# create_all must not create as a table.
+summary_metadata = MetaData()
+
+dashboard_summary = Table(
+    "dashboard_summary",
+    summary_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("services_count", Integer, nullable=False),
+    Column("total_events", Integer, nullable=False),
+    Column("success_events", Integer, nullable=False),
+    Column("error_events", Integer, nullable=False),
+    Column("total_test_cases", Integer, nullable=False),
+    Column("passed_test_cases", Integer, nullable=False),
+    Column("failed_test_cases", Integer, nullable=False),
+    Column("total_defects", Integer, nullable=False),
+    Column("open_defects", Integer, nullable=False),
+    Column("critical_defects", Integer, nullable=False),
+    Column("high_defects", Integer, nullable=False),
+    Column("medium_defects", Integer, nullable=False),
+    Column("low_defects", Integer, nullable=False),
+    Column("refreshed_at", DateTime, nullable=False),
+)
+
+# Arbitrary application-wide key for the advisory lock that keeps several app
+# processes from refreshing the view at the same time.
+_REFRESH_LOCK_KEY = 74_210_003
+
+
+def _count(model, *conditions) -> ColumnElement:
+    return select(func.count()).select_from(model).where(*conditions).scalar_subquery()
+
+
+def _total(column) -> ColumnElement:
+    """Sum of a counter cache column over all services."""
+    return select(func.coalesce(func.sum(column), 0)).scalar_subquery()
+
+
+def _events_since(since: ColumnElement, *conditions) -> ColumnElement:
+    return (
+        select(func.coalesce(func.sum(EventRollup.event_count), 0))
+        .where(EventRollup.hour >= since, *conditions)
+        .scalar_subquery()
+    )
+
+
+def summary_select(since: ColumnElement, refreshed_at: ColumnElement) -> Select:
+    """The one-row summary query; ``since`` starts the event window."""
+    return select(
+        literal(1).label("id"),
+        _count(Service).label("services_count"),
+        _events_since(since).label("total_events"),
+        _events_since(since, EventRollup.status == "success").label("success_events"),
+        _events_since(since, EventRollup.status == "error").label("error_events"),
+        # Counter caches kept on services (see database.counters)
+        _total(Service.test_cases_count).label("total_test_cases"),
+        _total(Service.passed_test_cases_count).label("passed_test_cases"),
+        _total(Service.failed_test_cases_count).label("failed_test_cases"),
+        _total(Service.defects_count).label("total_defects"),
+        _total(Service.open_defects_count).label("open_defects"),
+        _total(Service.critical_defects_count).label("critical_defects"),
+        _count(Defect, Defect.severity == "High").label("high_defects"),
+        _count(Defect, Defect.severity == "Medium").label("medium_defects"),
+        _count(Defect, Defect.severity == "Low").label("low_defects"),
+        refreshed_at.label("refreshed_at"),
+    )
+
+
+def create_dashboard_summary(conn: Connection) -> None:
+    """Create the summary view (PostgreSQL) or table (SQLite) if it is missing."""
+    if conn.dialect.name != "postgresql":
+        dashboard_summary.create(conn, checkfirst=True)
+        return
+
+    # The window is evaluated at refresh time, hour-aligned to match the rollups.
+    # LOCALTIMESTAMP assumes the database session time zone matches the app's,
+    # which writes event timestamps in its local time.
+    query = summary_select(
+        since=func.date_trunc("hour", func.localtimestamp() - literal_column(f"interval '{SUMMARY_WINDOW_DAYS} days'")),
+        refreshed_at=func.localtimestamp(),
+    )
+    definition = query.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    conn.execute(text(f"CREATE MATERIALIZED VIEW IF NOT EXISTS dashboard_summary AS {definition}"))
+    # REFRESH ... CONCURRENTLY needs a unique index
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_dashboard_summary_id ON dashboard_summary (id)"))
+
+
+def get_summary_age(conn: Connection) -> Optional[timedelta]:
+    """Time since the summary was last refreshed, or None if it never was."""
+    refreshed_at = conn.execute(select(dashboard_summary.c.refreshed_at)).scalar()
+    return None if refreshed_at is None else datetime.now() - refreshed_at
+
+
+def refresh_dashboard_summary(engine: Engine, min_age: Optional[float] = None) -> bool:
+    """
+    Bring the rollups up to date and rebuild the summary row.
+
+    With ``min_age`` (seconds) the refresh is skipped when another process
+    refreshed the summary more recently than that. Returns whether it ran.
+    """
+    def _fresh(conn: Connection) -> bool:
+        age = get_summary_age(conn) if min_age is not None else None
+        return age is not None and age.total_seconds() < min_age
+
+    with engine.connect() as conn:
+        if _fresh(conn):
+            return False
+    refresh_rollups(engine)
+
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _REFRESH_LOCK_KEY}).scalar():
+                return False
+        # Another process may have refreshed while we caught up the rollups
+        if _fresh(conn):
+            return False
+
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY dashboard_summary"))
+        else:
+            now = datetime.now()
+            since = (now - timedelta(days=SUMMARY_WINDOW_DAYS)).replace(minute=0, second=0, microsecond=0)
+            conn.execute(dashboard_summary.delete())
+            conn.execute(dashboard_summary.insert().from_select(
+                [column.name for column in dashboard_summary.columns],
+                summary_select(literal(since, DateTime), literal(now, DateTime)),
+            ))
+    logger.info("Dashboard summary refreshed")
+    return True
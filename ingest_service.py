@@ -0,0 +1,212 @@
+"""
+HTTP ingestion service for events.
+
+A small ASGI application sharing ``database/models.py`` with the dashboard.
+Run it with any ASGI server from the repository root (so the settings in
+.streamlit/secrets.toml apply)::
+
+    uvicorn ingest_service:app --host 0.0.0.0 --port 8600
+
+Endpoints:
+
+- ``POST /events``: a batch of events as NDJSON, one object per line with
+  ``service`` (name) or ``service_id``, ``action`` and optionally ``status``,
+  ``timestamp`` (ISO 8601, defaults to now), ``journey_time``,
+  ``error_message``, ``event_metadata`` and ``client_event_id``. The batch
+  is validated in one pass and its valid lines are written with one bulk
+  insert; the response counts the duplicates skipped (lines whose
+  ``client_event_id`` and ``timestamp`` were already loaded, so retrying a
+  batch is safe) and lists the rejected line numbers and why.
+- ``GET /health``: liveness plus counters (in flight, accepted, duplicates,
+  rejected, shed).
+
+Overload is shed instead of queued: beyond ``[ingest] max_pending`` requests
+in flight the service answers 429, and a request that cannot get one of the
+``max_concurrent_writes`` write slots within ``write_timeout`` seconds (or
+finds the database unavailable) gets 503. Both carry ``Retry-After``.
+"""
+import asyncio
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError, OperationalError
+from config.settings import get_ingest_config
+from database.bulk_load import ServiceIds, load_frame
+from database.connection import get_engine
+from utils.logger import logger
+from utils.validators import validate_event_frame
+
+# Rejected lines listed in a response; the count covers the rest
+MAX_REPORTED_ERRORS = 100
+
+
+class IngestApp:
+    """ASGI application accepting NDJSON event batches."""
+
+    def __init__(self, engine: Optional[Engine] = None, config: Optional[Dict[str, Any]] = None):
+        self.config = config or get_ingest_config()
+        self._engine = engine
+        self._service_ids: Optional[ServiceIds] = None
+        self._write_slots: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.counters = {"accepted": 0, "duplicates": 0, "rejected": 0, "shed": 0, "unavailable": 0}
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            self._engine = get_engine()
+        return self._engine
+
+    @property
+    def service_ids(self) -> ServiceIds:
+        if self._service_ids is None:
+            self._service_ids = ServiceIds(self.engine)
+        return self._service_ids
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        route = (scope["method"], scope["path"].rstrip("/") or "/")
+        if route == ("POST", "/events"):
+            status, body, headers = await self._ingest(receive)
+        elif route == ("GET", "/health"):
+            status, body, headers = 200, {"status": "ok", "in_flight": self.in_flight, **self.counters}, {}
+        elif scope["path"].rstrip("/") in ("/events", "/health"):
+            status, body, headers = 405, {"error": "method not allowed"}, {}
+        else:
+            status, body, headers = 404, {"error": "not found"}, {}
+        await _respond(send, status, body, headers)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    # Connect (and migrate) before taking traffic
+                    await asyncio.to_thread(lambda: self.engine)
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _ingest(self, receive) -> Tuple[int, Dict, Dict]:
+        if self.in_flight >= self.config["max_pending"]:
+            self.counters["shed"] += 1
+            return 429, {"error": "too many requests in flight"}, {"retry-after": "1"}
+        self.in_flight += 1
+        try:
+            body = await _read_body(receive, self.config["max_body_bytes"])
+            if body is None:
+                return 413, {"error": f"body larger than {self.config['max_body_bytes']} bytes"}, {}
+            return await self._write(body)
+        finally:
+            self.in_flight -= 1
+
+    async def _write(self, body: bytes) -> Tuple[int, Dict, Dict]:
+        if self._write_slots is None:
+            self._write_slots = asyncio.Semaphore(self.config["max_concurrent_writes"])
+        try:
+            await asyncio.wait_for(self._write_slots.acquire(), self.config["write_timeout"])
+        except asyncio.TimeoutError:
+            self.counters["unavailable"] += 1
+            return 503, {"error": "write capacity exhausted"}, {"retry-after": "1"}
+        try:
+            status, response, headers = await asyncio.to_thread(self._process, body)
+        except (OperationalError, DBAPIError) as e:
+            logger.warning(f"Ingest write failed: {e}")
+            self.counters["unavailable"] += 1
+            return 503, {"error": "database unavailable"}, {"retry-after": "5"}
+        finally:
+            self._write_slots.release()
+        self.counters["accepted"] += response.get("accepted", 0)
+        self.counters["duplicates"] += response.get("duplicates", 0)
+        self.counters["rejected"] += response.get("rejected", 0)
+        return status, response, headers
+
+    def _process(self, body: bytes) -> Tuple[int, Dict, Dict]:
+        """Parse, validate and write one batch (runs on a worker thread)."""
+        lines = body.splitlines()
+        if len(lines) > self.config["max_batch_rows"]:
+            return 413, {"error": f"batch larger than {self.config['max_batch_rows']} events"}, {}
+
+        records, line_numbers, errors = [], [], []
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                errors.append((number, "invalid JSON"))
+                continue
+            if not isinstance(record, dict):
+                errors.append((number, "each line must be a JSON object"))
+                continue
+            records.append(record)
+            line_numbers.append(number)
+
+        df = pd.DataFrame.from_records(records, index=line_numbers)
+        valid, invalid = validate_event_frame(df, default_timestamp=datetime.now())
+        errors.extend(invalid.items())
+
+        valid["service_id"] = self.service_ids.resolve(valid)
+        unknown = valid["service_id"].isna()
+        errors.extend((number, "unknown service") for number in valid.index[unknown])
+        valid = valid[~unknown]
+
+        accepted = duplicates = 0
+        if len(valid):
+            with self.engine.begin() as conn:
+                stats = load_frame(conn, valid, len(valid))
+            accepted, duplicates = stats.rows, stats.duplicates
+        errors.sort()
+        response = {
+            "accepted": accepted,
+            "duplicates": duplicates,
+            "rejected": len(errors),
+            "errors": [{"line": number, "error": message} for number, message in errors[:MAX_REPORTED_ERRORS]],
+        }
+        return (400 if errors and not (accepted or duplicates) else 200), response, {}
+
+
+async def _read_body(receive, limit: int) -> Optional[bytes]:
+    """The request body, or None once it exceeds ``limit`` bytes."""
+    chunks: List[bytes] = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+async def _respond(send, status: int, body: Dict, headers: Dict[str, str]) -> None:
+    payload = json.dumps(body).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode()),
+            *[(name.encode(), value.encode()) for name, value in headers.items()],
+        ],
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+app = IngestApp()
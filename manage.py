@@ -0,0 +1,241 @@
+"""
+Database maintenance commands.
+
+Run from the repository root so the settings in .streamlit/secrets.toml apply::
+
+    python manage.py partitions              # pre-create future months, apply retention
+    python manage.py partitions --convert    # convert an existing events table first
+    python manage.py rollups                 # fold new events into the hourly rollups
+    python manage.py refresh-summary         # rebuild the dashboard summary now
+    python manage.py archive                 # move old events to Parquet cold storage
+    python manage.py repair-counters         # recompute the test case and defect counters
+    python manage.py load-events events.csv  # bulk load events from a CSV file
+    python manage.py import-events dump.parquet  # resumable chunked import (CSV/NDJSON/Parquet)
+    python manage.py generate-events --rows 10000000 --seed 1  # synthetic load for performance tests
+
+Every command first creates or migrates the schema, like the app does on
+startup, so they also work on a database the app has not opened yet.
+"""
+import argparse
+import sys
+from config.settings import get_archive_config, get_db_backend, get_partitioning_config, get_rollup_config
+from database.archive import archive_events, hot_window_start
+from database.bulk_load import DEFAULT_BATCH_SIZE, bulk_load_events, read_events_csv, service_ids_by_name
+from database.connection import get_engine
+from database.counters import repair_counters
+from database.importer import DEFAULT_CHUNK_SIZE, FORMATS, ImportStats, import_events
+from database.migrations import ensure_schema
+from database.partitioning import convert_events_table, is_partitioned, maintain_partitions
+from database.rollups import refresh_rollups
+from database.summary import refresh_dashboard_summary
+from utils.data_generator import SCALE_CHUNK_SIZE, generate_scale_events
+
+
+def cmd_partitions(args: argparse.Namespace) -> int:
+    """Maintain the monthly partitions of the events table."""
+    if get_db_backend() != "postgresql":
+        print("Partitioning is only available on PostgreSQL; nothing to do.")
+        return 0
+
+    config = get_partitioning_config()
+    months_ahead = config["months_ahead"] if args.months_ahead is None else args.months_ahead
+    retention_months = config["retention_months"] if args.retention_months is None else args.retention_months
+    drop_expired = config["drop_expired"] or args.drop
+
+    with get_engine().begin() as conn:
+        if not is_partitioned(conn):
+            if not args.convert:
+                print("events is not partitioned; run with --convert to rebuild it as a partitioned table.")
+                return 1
+            if args.dry_run:
+                print("Would convert events to a monthly partitioned table.")
+                return 0
+            print("Converting events to a monthly partitioned table (copies every row)...")
+            convert_events_table(conn, months_ahead)
+
+        summary = maintain_partitions(
+            conn,
+            months_ahead=months_ahead,
+            retention_months=retention_months,
+            drop_expired=drop_expired,
+            dry_run=args.dry_run,
+        )
+
+    prefix = "Would have " if args.dry_run else ""
+    for action, names in summary.items():
+        if names:
+            print(f"{prefix}{action} {len(names)} partition(s): {', '.join(names)}")
+    if not any(summary.values()):
+        print("Partitions are up to date.")
+    return 0
+
+
+def cmd_rollups(args: argparse.Namespace) -> int:
+    """Fold events above the high-water mark into the hourly rollups."""
+    batch_size = args.batch_size or get_rollup_config()["batch_size"]
+    processed = refresh_rollups(get_engine(), batch_size)
+    print(f"Rolled up {processed:,} events.")
+    return 0
+
+
+def cmd_refresh_summary(args: argparse.Namespace) -> int:
+    """Bring the rollups up to date and rebuild the dashboard summary."""
+    if refresh_dashboard_summary(get_engine()):
+        print("Dashboard summary refreshed.")
+    else:
+        print("Another process is refreshing the dashboard summary.")
+    return 0
+
+
+def cmd_archive(args: argparse.Namespace) -> int:
+    """Move events older than the hot window into the Parquet archive."""
+    config = get_archive_config()
+    hot_days = config["hot_days"] if args.older_than_days is None else args.older_than_days
+    older_than = hot_window_start(hot_days)
+    archived = archive_events(
+        get_engine(),
+        config["path"],
+        older_than,
+        batch_size=args.batch_size or config["batch_size"],
+        dry_run=args.dry_run,
+    )
+    prefix = "Would archive" if args.dry_run else "Archived"
+    print(f"{prefix} {archived:,} events older than {older_than:%Y-%m-%d} to {config['path']}.")
+    return 0
+
+
+def cmd_repair_counters(args: argparse.Namespace) -> int:
+    """Recompute the test case and defect counter caches from the rows."""
+    with get_engine().begin() as conn:
+        corrected = repair_counters(conn)
+    drifted = {column: rows for column, rows in corrected.items() if rows}
+    for column, rows in drifted.items():
+        print(f"Corrected {column} on {rows} row(s).")
+    if not drifted:
+        print("Counters are consistent.")
+    return 0
+
+
+def cmd_load_events(args: argparse.Namespace) -> int:
+    """Bulk load events from a CSV file (COPY on PostgreSQL, batched inserts on SQLite)."""
+    engine = get_engine()
+    with engine.connect() as conn:
+        service_ids = service_ids_by_name(conn)
+    try:
+        stats = bulk_load_events(engine, read_events_csv(args.file, service_ids), args.batch_size)
+    except ValueError as e:
+        print(f"Nothing loaded: {e}")
+        return 1
+    print(f"Loaded {stats}.")
+    return 0
+
+
+def cmd_import_events(args: argparse.Namespace) -> int:
+    """Import a CSV, NDJSON or Parquet event file in resumable chunks."""
+    column_map = {}
+    for mapping in args.map or []:
+        source, _, target = mapping.partition("=")
+        if not target:
+            print(f"--map expects SOURCE=FIELD, got {mapping!r}")
+            return 1
+        column_map[source] = target
+
+    def report(number: int, stats: ImportStats) -> None:
+        print(f"Chunk {number:,}: {stats.rows_loaded:,} rows loaded, {stats.rows_duplicate:,} duplicates, "
+              f"{stats.rows_rejected:,} rejected ({stats.rows_per_second:,.0f} rows/s)")
+
+    try:
+        stats = import_events(
+            get_engine(), args.file, file_format=args.format, chunk_size=args.chunk_size,
+            column_map=column_map, restart=args.restart, on_chunk=report,
+        )
+    except ValueError as e:
+        print(e)
+        return 1
+    if stats.already_complete:
+        print(f"{args.file} was already imported; use --restart to import it again.")
+        return 0
+    if stats.chunks_skipped:
+        print(f"Skipped {stats.chunks_skipped:,} chunk(s) committed by an earlier run.")
+    for row, error in stats.errors:
+        print(f"  row {row:,}: {error}")
+    print(f"Imported {stats.rows_loaded:,} rows ({stats.rows_duplicate:,} duplicates skipped, "
+          f"{stats.rows_rejected:,} rejected) in {stats.seconds:.1f}s "
+          f"({stats.rows_per_second:,.0f} rows/s).")
+    return 0
+
+
+def cmd_generate_events(args: argparse.Namespace) -> int:
+    """Generate realistic synthetic events at scale for performance testing."""
+    engine = get_engine()
+    stats = generate_scale_events(
+        engine, args.rows, seed=args.seed, days=args.days, chunk_size=args.chunk_size,
+        on_chunk=lambda stats: print(f"{stats.rows:,} rows ({stats.rows_per_second:,.0f} rows/s)"),
+    )
+    print(f"Generated {stats}.")
+    print("Refreshing the rollups and dashboard summary...")
+    refresh_dashboard_summary(engine)
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Database maintenance commands.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    partitions = subparsers.add_parser("partitions", help=cmd_partitions.__doc__)
+    partitions.add_argument("--convert", action="store_true",
+                            help="rebuild an unpartitioned events table as a partitioned one")
+    partitions.add_argument("--months-ahead", type=int, help="future months to pre-create")
+    partitions.add_argument("--retention-months", type=int, help="months of events to keep attached")
+    partitions.add_argument("--drop", action="store_true", help="drop expired partitions instead of detaching")
+    partitions.add_argument("--dry-run", action="store_true", help="report what would change")
+    partitions.set_defaults(func=cmd_partitions)
+
+    rollups = subparsers.add_parser("rollups", help=cmd_rollups.__doc__)
+    rollups.add_argument("--batch-size", type=int, help="events aggregated per transaction")
+    rollups.set_defaults(func=cmd_rollups)
+
+    refresh_summary = subparsers.add_parser("refresh-summary", help=cmd_refresh_summary.__doc__)
+    refresh_summary.set_defaults(func=cmd_refresh_summary)
+
+    archive = subparsers.add_parser("archive", help=cmd_archive.__doc__)
+    archive.add_argument("--older-than-days", type=int, help="archive events older than this many days")
+    archive.add_argument("--batch-size", type=int, help="events archived per transaction")
+    archive.add_argument("--dry-run", action="store_true", help="count the events that would be archived")
+    archive.set_defaults(func=cmd_archive)
+
+    repair = subparsers.add_parser("repair-counters", help=cmd_repair_counters.__doc__)
+    repair.set_defaults(func=cmd_repair_counters)
+
+    load_events = subparsers.add_parser("load-events", help=cmd_load_events.__doc__)
+    load_events.add_argument("file", help="CSV file with a header row")
+    load_events.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per COPY or INSERT batch")
+    load_events.set_defaults(func=cmd_load_events)
+
+    import_events_parser = subparsers.add_parser("import-events", help=cmd_import_events.__doc__)
+    import_events_parser.add_argument("file", help="CSV, NDJSON or Parquet file (CSV/NDJSON may be compressed)")
+    import_events_parser.add_argument("--format", choices=FORMATS, help="file format (default: from the extension)")
+    import_events_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                                      help="rows read, validated and committed at a time")
+    import_events_parser.add_argument("--map", nargs="+", metavar="SOURCE=FIELD",
+                                      help="rename file columns onto event fields, e.g. ts=timestamp")
+    import_events_parser.add_argument("--restart", action="store_true",
+                                      help="discard the checkpoint and import the whole file again")
+    import_events_parser.set_defaults(func=cmd_import_events)
+
+    generate = subparsers.add_parser("generate-events", help=cmd_generate_events.__doc__)
+    generate.add_argument("--rows", type=int, required=True, help="number of events to add")
+    generate.add_argument("--seed", type=int, default=0, help="random seed; the same seed reproduces the same events")
+    generate.add_argument("--days", type=int, default=30, help="spread the events over this many days up to now")
+    generate.add_argument("--chunk-size", type=int, default=SCALE_CHUNK_SIZE,
+                          help="events generated and committed at a time")
+    generate.set_defaults(func=cmd_generate_events)
+
+    args = parser.parse_args(argv)
+    # Commands may run before the app has created or migrated the database
+    ensure_schema(get_engine(), partition_events=get_partitioning_config()["enabled"])
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,91 +5,224 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple
+from sqlalchemy import select
+from config.settings import get_archive_config
 from database.connection import get_session
-from database.models import Event, Service
+from database.event_metadata import PROMOTED_KEYS, metadata_conditions
+from database.explorer import PAGE_SIZE, EventFilters, EventKey, estimate_event_count, event_page
+from database.models import Service
+from database.partitioning import event_time_bounds
+from database.rollups import kpi_totals, rollup_rows
+from utils.analytics_engine import EventMetrics, kpis_from_totals, summarize_rollups
 from utils.auth import require_role
 from utils.validators import validate_date_range
 from utils.logger import logger
 from utils.ui import apply_chart_theme, render_page_header, STUDIO_COLORS
 
 
-def calculate_completion_rate(df: pd.DataFrame) -> float:
-    """Calculate completion rate (success events / total events)."""
+def load_event_kpis(
+    service_id: int = None,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    metadata: Dict[str, str] = None,
+) -> dict:
+    """
+    Load the KPI figures for the filters in one aggregate query.
+
+    Returns ``total_events``, the success, error and pending counts,
+    ``completion_rate``, ``error_rate`` (percentages) and ``avg_journey_time``
+    (seconds). Only the single totals row leaves the database, however many
+    events the window holds.
+    """
+    empty = {"total_events": 0, "success_count": 0, "error_count": 0, "pending_count": 0,
+             "journey_count": 0, "journey_time_sum": 0.0}
     try:
-        if df.empty or len(df) == 0:
-            return 0.0
-        if "status" not in df.columns:
-            return 0.0
-        success_count = len(df[df["status"] == "success"])
-        return (success_count / len(df)) * 100 if len(df) > 0 else 0.0
-    except Exception:
-        return 0.0
-
-
-def calculate_error_rate(df: pd.DataFrame) -> float:
-    """Calculate error rate (error events / total events)."""
-    try:
-        if df.empty or len(df) == 0:
-            return 0.0
-        if "status" not in df.columns:
-            return 0.0
-        error_count = len(df[df["status"] == "error"])
-        return (error_count / len(df)) * 100 if len(df) > 0 else 0.0
-    except Exception:
-        return 0.0
-
-
-def calculate_avg_journey_time(df: pd.DataFrame) -> float:
-    """Calculate average journey time in seconds."""
-    try:
-        if df.empty or len(df) == 0:
-            return 0.0
-        if "journey_time" not in df.columns:
-            return 0.0
-        journey_times = df["journey_time"].dropna()
-        if len(journey_times) == 0:
-            return 0.0
-        return float(journey_times.mean())
-    except Exception:
-        return 0.0
-
-
-def load_events_data(service_id: int = None, start_date: datetime = None, end_date: datetime = None) -> pd.DataFrame:
-    """Load events data from database with optional filters."""
+        window_start, window_end = event_time_bounds(start_date, end_date)
+        with get_session(readonly=True) as session:
+            totals = session.execute(
+                kpi_totals(window_start, window_end, service_id, metadata_conditions(metadata or {}))
+            ).mappings().one()
+        return kpis_from_totals(totals)
+    except Exception as e:
+        logger.error(f"Error loading event KPIs: {e}")
+        st.error(f"Error loading data: {e}")
+        return kpis_from_totals(empty)
+
+
+def load_event_rollups(
+    service_id: int = None,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    metadata: Dict[str, str] = None,
+) -> pd.DataFrame:
+    """
+    Load hourly event rollups with optional filters.
+
+    One row per hour, service, action and status, with ``event_count`` and the
+    journey-time aggregates; enough for the KPIs and charts without loading
+    every event in the window. Metadata filters are aggregated from the
+    matching events in the database, since the rollups do not keep metadata.
+    """
     try:
-        with get_session() as session:
-            query = session.query(Event, Service).join(Service)
-
-            if service_id:
-                query = query.filter(Event.service_id == service_id)
-            if start_date:
-                query = query.filter(Event.timestamp >= start_date)
-            if end_date:
-                # Add one day to include the entire end date
-                end_date_inclusive = end_date + timedelta(days=1)
-                query = query.filter(Event.timestamp < end_date_inclusive)
-
-            results = query.all()
-            data = []
-            for event, service in results:
-                data.append({
-                    "id": event.id,
-                    "service": service.name,
-                    "channel": service.channel,
-                    "action": event.action,
-                    "status": event.status,
-                    "timestamp": event.timestamp,
-                    "journey_time": event.journey_time,
-                    "error_message": event.error_message
-                })
-            return pd.DataFrame(data)
+        window_start, window_end = event_time_bounds(start_date, end_date)
+        rows = rollup_rows(
+            window_start, window_end, service_id, metadata_conditions(metadata or {})
+        ).subquery()
+        with get_session(readonly=True) as session:
+            result = session.execute(
+                select(rows, Service.name.label("service"), Service.channel)
+                .join(Service, Service.id == rows.c.service_id)
+            )
+            return pd.DataFrame(result.all(), columns=list(result.keys()))
     except Exception as e:
-        logger.error(f"Error loading events data: {e}")
+        logger.error(f"Error loading event rollups: {e}")
         st.error(f"Error loading data: {e}")
         return pd.DataFrame()
 
 
+def load_event_page(
+    filters: EventFilters,
+    after: Optional[EventKey] = None,
+    descending: bool = True,
+) -> Tuple[pd.DataFrame, Optional[EventKey]]:
+    """
+    Load one page of the event explorer and the key of the next (see ``database.explorer``).
+
+    Days moved to the cold-storage archive are read from Parquet and included
+    (see ``database.archive``).
+    """
+    try:
+        with get_session(readonly=True) as session:
+            return event_page(
+                session.connection(), filters, after, descending, archive_path=get_archive_config()["path"]
+            )
+    except Exception as e:
+        logger.error(f"Error loading event page: {e}")
+        st.error(f"Error loading data: {e}")
+        return pd.DataFrame(), None
+
+
+def load_event_count(filters: EventFilters) -> Tuple[int, bool]:
+    """Count the events matching the explorer filters, and whether the count is exact."""
+    try:
+        with get_session(readonly=True) as session:
+            return estimate_event_count(session.connection(), filters, get_archive_config()["path"])
+    except Exception as e:
+        logger.error(f"Error counting events: {e}")
+        return 0, False
+
+
+def show_event_explorer(
+    service_id: Optional[int],
+    start_date: date,
+    end_date: date,
+    metadata: Dict[str, str],
+    metrics: EventMetrics,
+):
+    """Browse the raw events in the window a page at a time, with column filters."""
+    # Half-open day bounds on the bare column keep the filter sargable,
+    # so monthly partitions outside the range are pruned
+    window_start, window_end = event_time_bounds(start_date, end_date)
+
+    with st.expander("Column filters"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            statuses = st.multiselect("Status", options=list(metrics.status_counts.index))
+        with col2:
+            actions = st.multiselect("Action", options=sorted(metrics.by_action["action"]))
+        with col3:
+            channels = st.multiselect("Channel", options=sorted(metrics.by_channel["channel"]))
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            error_text = st.text_input("Error message contains").strip()
+        with col2:
+            min_journey_time = st.number_input("Min Journey Time (s)", min_value=0.0, value=None)
+        with col3:
+            max_journey_time = st.number_input("Max Journey Time (s)", min_value=0.0, value=None)
+
+    sort_order = st.radio("Sort", options=["Newest first", "Oldest first"], horizontal=True)
+    descending = sort_order == "Newest first"
+
+    filters = EventFilters(
+        start=window_start,
+        end=window_end,
+        service_id=service_id,
+        metadata=metadata,
+        statuses=tuple(statuses),
+        actions=tuple(actions),
+        channels=tuple(channels),
+        error_text=error_text,
+        min_journey_time=min_journey_time,
+        max_journey_time=max_journey_time,
+    )
+
+    # Keys of the pages visited so far, restarted whenever the query changes;
+    # page n starts after keys[n]
+    query = repr((filters, descending))
+    if st.session_state.get("event_explorer_query") != query:
+        st.session_state["event_explorer_query"] = query
+        st.session_state["event_explorer_keys"] = [None]
+    keys = st.session_state["event_explorer_keys"]
+    page_number = len(keys) - 1
+
+    df, next_key = load_event_page(filters, keys[-1], descending)
+    total, exact = load_event_count(filters)
+
+    if df.empty:
+        st.info("No events match the column filters.")
+        return
+
+    first_row = page_number * PAGE_SIZE + 1
+    total_text = f"{total:,}" if exact else f"more than {total:,}"
+    st.caption(f"Events {first_row:,}–{first_row + len(df) - 1:,} of {total_text}.")
+
+    # Format timestamp for display
+    df_display = df.copy()
+    df_display["timestamp"] = pd.to_datetime(df_display["timestamp"]).dt.strftime("%Y-%m-%d %H:%M:%S")
+    df_display = df_display.rename(columns={
+        "id": "ID",
+        "service": "Service",
+        "channel": "Channel",
+        "action": "Action",
+        "status": "Status",
+        "timestamp": "Timestamp",
+        "journey_time": "Journey Time (s)",
+        "error_message": "Error Message"
+    })
+
+    st.dataframe(
+        df_display,
+        use_container_width=True,
+        hide_index=True,
+        height=400
+    )
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        if st.button("⏮ First", disabled=page_number == 0, use_container_width=True):
+            del keys[1:]
+            st.rerun()
+    with col2:
+        if st.button("◀ Previous", disabled=page_number == 0, use_container_width=True):
+            keys.pop()
+            st.rerun()
+    with col3:
+        if st.button("Next ▶", disabled=next_key is None, use_container_width=True):
+            keys.append(next_key)
+            st.rerun()
+    with col4:
+        # Export option
+        st.download_button(
+            label="📥 Download Page as CSV",
+            data=df.to_csv(index=False),
+            file_name=f"events_{start_date}_{end_date}_page{page_number + 1}.csv",
+            mime="text/csv",
+            use_container_width=True
+        )
+
+
 def show_analytics_page():
     """Display analytics dashboard."""
     require_role(["Analyst", "Tester", "Viewer"])
@@ -97,7 +230,7 @@ def show_analytics_page():
     render_page_header("Digital Journey Analytics", icon="analytics")
 
     # Load services for filter
-    with get_session() as session:
+    with get_session(readonly=True) as session:
         services = session.query(Service).all()
         service_options = {0: "All Services"}
         service_options.update({s.id: s.name for s in services})
@@ -127,6 +260,16 @@ def show_analytics_page():
             max_value=datetime.now()
         )
 
+    # Metadata filters, applied in the database
+    metadata_filter = {}
+    with st.expander("Metadata filters"):
+        meta_cols = st.columns(len(PROMOTED_KEYS))
+        for meta_col, key in zip(meta_cols, PROMOTED_KEYS):
+            with meta_col:
+                value = st.text_input(key.replace("_", " ").title(), key=f"metadata_{key}").strip()
+                if value:
+                    metadata_filter[key] = value
+
     # Validate date range
     is_valid, error_msg = validate_date_range(start_date, end_date)
     if not is_valid:
@@ -137,12 +280,15 @@ def show_analytics_page():
     start_datetime = datetime.combine(start_date, datetime.min.time())
     end_datetime = datetime.combine(end_date, datetime.max.time())
 
-    # Load data
+    # Load data: the KPIs are one aggregate query, the charts come from the
+    # hourly rollups and the detail table pages through the raw events
     service_filter = None if selected_service_id == 0 else selected_service_id
     with st.spinner("Crunching analytics data..."):
-        df = load_events_data(service_filter, start_datetime, end_datetime)
+        kpis = load_event_kpis(service_filter, start_datetime, end_datetime, metadata_filter)
+        if kpis["total_events"]:
+            rollups = load_event_rollups(service_filter, start_datetime, end_datetime, metadata_filter)
 
-    if df.empty:
+    if not kpis["total_events"] or rollups.empty:
         st.info("📊 No data available for the selected filters.")
         st.markdown("""
         **To add data:**
@@ -159,47 +305,44 @@ def show_analytics_page():
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        total_events = len(df)
+        total_events = kpis["total_events"]
         st.metric("Total Events", f"{total_events:,}")
 
     with col2:
-        completion_rate = calculate_completion_rate(df)
-        st.metric("Completion Rate", f"{completion_rate:.2f}%")
+        st.metric("Completion Rate", f"{kpis['completion_rate']:.2f}%")
 
     with col3:
-        error_rate = calculate_error_rate(df)
-        st.metric("Error Rate", f"{error_rate:.2f}%")
+        st.metric("Error Rate", f"{kpis['error_rate']:.2f}%")
 
     with col4:
-        avg_journey_time = calculate_avg_journey_time(df)
-        st.metric("Avg Journey Time", f"{avg_journey_time:.2f}s")
+        st.metric("Avg Journey Time", f"{kpis['avg_journey_time']:.2f}s")
 
     # Charts Section
     st.markdown("---")
     st.subheader("📉 Visualizations")
 
+    # Every chart comes from one pass over the rollups
+    metrics = summarize_rollups(rollups)
+
     # Event Status Distribution
     col1, col2 = st.columns(2)
 
     with col1:
         try:
-            if "status" in df.columns and not df["status"].empty:
-                status_counts = df["status"].value_counts()
-                if len(status_counts) > 0:
-                    fig_status = px.pie(
-                        values=status_counts.values,
-                        names=status_counts.index,
-                        title="Event Status Distribution",
-                        color_discrete_map={
-                            "success": STUDIO_COLORS["emerald"],
-                            "error": STUDIO_COLORS["rose"],
-                            "pending": STUDIO_COLORS["amber"]
-                        }
-                    )
-                    fig_status.update_layout(showlegend=True)
-                    st.plotly_chart(apply_chart_theme(fig_status), use_container_width=True)
-                else:
-                    st.info("No status data available for chart")
+            status_counts = metrics.status_counts
+            if len(status_counts) > 0:
+                fig_status = px.pie(
+                    values=status_counts.values,
+                    names=status_counts.index,
+                    title="Event Status Distribution",
+                    color_discrete_map={
+                        "success": STUDIO_COLORS["emerald"],
+                        "error": STUDIO_COLORS["rose"],
+                        "pending": STUDIO_COLORS["amber"]
+                    }
+                )
+                fig_status.update_layout(showlegend=True)
+                st.plotly_chart(apply_chart_theme(fig_status), use_container_width=True)
             else:
                 st.info("No status data available for chart")
         except Exception as e:
@@ -207,11 +350,8 @@ def show_analytics_page():
 
     with col2:
         # Events Over Time
-        df_time = df.copy()
-        df_time["date"] = pd.to_datetime(df_time["timestamp"]).dt.date
-        daily_counts = df_time.groupby(["date", "status"]).size().reset_index(name="count")
         fig_timeline = px.line(
-            daily_counts,
+            metrics.daily,
             x="date",
             y="count",
             color="status",
@@ -223,58 +363,40 @@ def show_analytics_page():
 
     # Service Performance
     st.markdown("#### Service Performance")
-    service_perf = df.groupby("service").agg({
-        "status": lambda x: (x == "success").sum() / len(x) * 100,
-        "id": "count"
-    }).rename(columns={"status": "completion_rate", "id": "total_events"})
-    service_perf = service_perf.reset_index()
-
+    completion_scale = [STUDIO_COLORS["border"], STUDIO_COLORS["indigo"], STUDIO_COLORS["cyan"]]
     fig_service = px.bar(
-        service_perf,
+        metrics.by_service,
         x="service",
         y="completion_rate",
         title="Completion Rate by Service",
         labels={"service": "Service", "completion_rate": "Completion Rate (%)"},
         color="completion_rate",
-        color_continuous_scale=[STUDIO_COLORS["border"], STUDIO_COLORS["indigo"], STUDIO_COLORS["cyan"]]
+        color_continuous_scale=completion_scale
     )
     fig_service.update_layout(xaxis_tickangle=-45)
     st.plotly_chart(apply_chart_theme(fig_service), use_container_width=True)
 
+    col1, col2 = st.columns(2)
+    for column, breakdown, key, label in [
+        (col1, metrics.by_channel, "channel", "Channel"),
+        (col2, metrics.by_action, "action", "Action"),
+    ]:
+        with column:
+            fig_breakdown = px.bar(
+                breakdown,
+                x=key,
+                y="completion_rate",
+                title=f"Completion Rate by {label}",
+                labels={key: label, "completion_rate": "Completion Rate (%)"},
+                color="completion_rate",
+                color_continuous_scale=completion_scale
+            )
+            st.plotly_chart(apply_chart_theme(fig_breakdown), use_container_width=True)
+
     # Detailed Data Table
     st.markdown("---")
     st.subheader("📋 Event Details")
-
-    # Format timestamp for display
-    df_display = df.copy()
-    df_display["timestamp"] = pd.to_datetime(df_display["timestamp"]).dt.strftime("%Y-%m-%d %H:%M:%S")
-    df_display = df_display.rename(columns={
-        "id": "ID",
-        "service": "Service",
-        "channel": "Channel",
-        "action": "Action",
-        "status": "Status",
-        "timestamp": "Timestamp",
-        "journey_time": "Journey Time (s)",
-        "error_message": "Error Message"
-    })
-
-    st.dataframe(
-        df_display,
-        use_container_width=True,
-        hide_index=True,
-        height=400
-    )
-
-    # Export option
-    csv = df.to_csv(index=False)
-    st.download_button(
-        label="📥 Download Data as CSV",
-        data=csv,
-        file_name=f"events_{start_date}_{end_date}.csv",
-        mime="text/csv"
-    )
-
+    show_event_explorer(service_filter, start_date, end_date, metadata_filter, metrics)
 
 if __name__ == "__main__":
     show_analytics_page()
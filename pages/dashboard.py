@@ -5,86 +5,109 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from sqlalchemy import func, case
+from sqlalchemy import func, case, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
-from database.connection import get_session
-from database.models import Event, Service, TestCase, Defect
+from database.async_connection import gather_queries
+from database.connection import get_engine
+from database.models import Service
+from database.rollups import rollup_rows
+from database.summary import dashboard_summary, refresh_dashboard_summary
 from utils.auth import require_role
 from utils.logger import logger
 from utils.ui import apply_chart_theme, render_page_header, STUDIO_COLORS
 
 
+async def _read_summary(session: AsyncSession):
+    """The materialized dashboard summary row, or None before the first refresh."""
+    result = await session.execute(select(dashboard_summary))
+    return result.mappings().first()
+
+
+async def _service_performance(session: AsyncSession, since: datetime):
+    """Per-service event totals and success counts since a point in time, from the hourly rollups."""
+    rollups = rollup_rows(start=since).subquery()
+    result = await session.execute(
+        select(
+            Service.name,
+            func.sum(rollups.c.event_count).label('total_events'),
+            func.sum(case((rollups.c.status == 'success', rollups.c.event_count), else_=0)).label('success_count')
+        ).join(rollups, Service.id == rollups.c.service_id).group_by(Service.id, Service.name)
+    )
+    return result.all()
+
+
 def load_dashboard_data():
     """Load all data needed for dashboard."""
     try:
-        with get_session() as session:
-            # Services count
-            services_count = session.query(Service).count()
-
-            # Events summary (last 30 days)
-            thirty_days_ago = datetime.now() - timedelta(days=30)
-            events = session.query(Event).filter(Event.timestamp >= thirty_days_ago).all()
-            total_events = len(events)
-            success_events = len([e for e in events if e.status == "success"])
-            error_events = len([e for e in events if e.status == "error"])
-
-            # Test cases summary
-
-            with st.spinner("Loading test cases..."):
-                test_cases = session.query(TestCase).all()
-                total_test_cases = len(test_cases)
-                passed_test_cases = len([tc for tc in test_cases if tc.status == "Passed"])
-                failed_test_cases = len([tc for tc in test_cases if tc.status == "Failed"])
-
-            # Defects summary
-            with st.spinner("Loading defects..."):
-                defects = session.query(Defect).all()
-                total_defects = len(defects)
-                open_defects = len([d for d in defects if d.status == "Open"])
-                critical_defects = len([d for d in defects if d.severity == "Critical"])
-
-            # Service performance data (Optimized)
-            with st.spinner("Crunching analytics data..."):
-                stmt = session.query(
-                    Service.name,
-                    func.count(Event.id).label('total_events'),
-                    func.sum(case((Event.status == 'success', 1), else_=0)).label('success_count')
-                ).outerjoin(Event, (Service.id == Event.service_id) & (Event.timestamp >= thirty_days_ago)).group_by(Service.id, Service.name)
-                
-                perf_results = stmt.all()
-                
-                service_perf = []
-                for name, total, success in perf_results:
-                    if total > 0:
-                        rate = (success / total) * 100
-                        service_perf.append({
-                            "service": name,
-                            "success_rate": rate,
-                            "total_events": total
-                        })
-
-            return {
-                "services_count": services_count,
-                "total_events": total_events,
-                "success_events": success_events,
-                "error_events": error_events,
-                "total_test_cases": total_test_cases,
-                "passed_test_cases": passed_test_cases,
-                "failed_test_cases": failed_test_cases,
-                "total_defects": total_defects,
-                "open_defects": open_defects,
-                "critical_defects": critical_defects,
-                "service_perf": pd.DataFrame(service_perf) if service_perf else pd.DataFrame(),
-                "defects_by_severity": pd.DataFrame([
-                    {"severity": d.severity, "count": 1} for d in defects
-                ]) if defects else pd.DataFrame()
-            }
+        # Service performance over the last 30 days. The bound is passed as a
+        # constant and compared with the bare timestamp column, so a
+        # partitioned events table only scans the partitions covering the
+        # window. It starts on the hour so the hourly rollups cover exactly
+        # the same window.
+        thirty_days_ago = (datetime.now() - timedelta(days=30)).replace(minute=0, second=0, microsecond=0)
+
+        # The KPIs come from the materialized summary, a single row rebuilt by
+        # the background scheduler; the queries run concurrently.
+        results = gather_queries(
+            summary=_read_summary,
+            service_perf=lambda session: _service_performance(session, thirty_days_ago),
+        )
+        summary = results["summary"]
+        if summary is None:
+            # First view before the scheduler's first run
+            refresh_dashboard_summary(get_engine())
+            summary = gather_queries(summary=_read_summary)["summary"]
+
+        defects_by_severity = pd.DataFrame([
+            {"severity": severity, "count": summary[f"{severity.lower()}_defects"]}
+            for severity in ("Critical", "High", "Medium", "Low")
+            if summary[f"{severity.lower()}_defects"]
+        ])
+
+        service_perf = []
+        for name, total, success in results["service_perf"]:
+            if total > 0:
+                rate = (success / total) * 100
+                service_perf.append({
+                    "service": name,
+                    "success_rate": rate,
+                    "total_events": total
+                })
+
+        return {
+            "services_count": summary["services_count"],
+            "total_events": summary["total_events"],
+            "success_events": summary["success_events"],
+            "error_events": summary["error_events"],
+            "total_test_cases": summary["total_test_cases"],
+            "passed_test_cases": summary["passed_test_cases"],
+            "failed_test_cases": summary["failed_test_cases"],
+            "total_defects": summary["total_defects"],
+            "open_defects": summary["open_defects"],
+            "critical_defects": summary["critical_defects"],
+            "service_perf": pd.DataFrame(service_perf) if service_perf else pd.DataFrame(),
+            "defects_by_severity": defects_by_severity,
+            "refreshed_at": summary["refreshed_at"],
+        }
     except Exception as e:
         logger.error(f"Error loading dashboard data: {e}")
         st.error(f"Error loading dashboard data: {e}")
         return None
 
 
+def format_staleness(refreshed_at: datetime) -> str:
+    """Describe how old the summary figures are, e.g. 'Updated 4 min ago'."""
+    age = max((datetime.now() - refreshed_at).total_seconds(), 0)
+    if age < 60:
+        ago = "just now"
+    elif age < 3600:
+        ago = f"{int(age // 60)} min ago"
+    else:
+        ago = f"{age / 3600:.1f} h ago"
+    return f"🕒 Updated {ago} ({refreshed_at:%Y-%m-%d %H:%M})"
+
+
 def show_dashboard_page():
     """Display executive dashboard."""
     require_role(["Analyst", "Tester", "Viewer"])
@@ -111,6 +134,7 @@ def show_dashboard_page():
     # Key Metrics Row 1
     st.markdown("---")
     st.subheader("📊 Key Metrics")
+    st.caption(format_staleness(data["refreshed_at"]))
 
     col1, col2, col3, col4 = st.columns(4)
 
@@ -169,7 +193,7 @@ def show_dashboard_page():
     with col2:
         # Defects by Severity
         if not data["defects_by_severity"].empty:
-            severity_counts = data["defects_by_severity"].groupby("severity").size().reset_index(name="count")
+            severity_counts = data["defects_by_severity"].groupby("severity")["count"].sum().reset_index()
             severity_order = ["Critical", "High", "Medium", "Low"]
             severity_counts["severity"] = pd.Categorical(severity_counts["severity"], categories=severity_order, ordered=True)
             severity_counts = severity_counts.sort_values("severity")
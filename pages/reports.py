@@ -7,7 +7,8 @@ from database.connection import get_session
 from database.models import Event, Service, TestCase, Defect
 from utils.auth import require_role
 from reports.pdf_generator import generate_analytics_report, generate_uat_report
-from pages.analytics import load_events_data, calculate_completion_rate, calculate_error_rate, calculate_avg_journey_time
+from pages.analytics import load_event_kpis, load_event_rollups
+from utils.analytics_engine import summarize_rollups
 from pages.uat_tracker import load_test_cases, load_defects
 import pandas as pd
 from utils.logger import logger
@@ -46,7 +47,7 @@ def show_reports_page():
             )
 
         # Service filter
-        with get_session() as session:
+        with get_session(readonly=True) as session:
             services = session.query(Service).all()
             service_options = {0: "All Services"}
             service_options.update({s.id: s.name for s in services})
@@ -66,28 +67,18 @@ def show_reports_page():
                     start_datetime = datetime.combine(start_date, datetime.min.time())
                     end_datetime = datetime.combine(end_date, datetime.max.time())
 
-                    events_df = load_events_data(service_filter, start_datetime, end_datetime)
+                    # KPIs are aggregated in the database
+                    kpi_data = load_event_kpis(service_filter, start_datetime, end_datetime)
 
-                    if events_df.empty:
+                    if not kpi_data["total_events"]:
                         st.warning("⚠️ No data available for the selected filters. Please add data first or adjust your filters.")
                         st.info("💡 Tip: Use 'Generate Sample Data' in the sidebar to create sample data for testing.")
                     else:
-                        # Calculate KPIs
-                        kpi_data = {
-                            "total_events": len(events_df),
-                            "completion_rate": calculate_completion_rate(events_df),
-                            "error_rate": calculate_error_rate(events_df),
-                            "avg_journey_time": calculate_avg_journey_time(events_df)
-                        }
-
-                        # Service performance
-                        service_perf = events_df.groupby("service").agg({
-                            "status": lambda x: (x == "success").sum() / len(x) * 100,
-                            "id": "count"
-                        }).rename(columns={"status": "completion_rate", "id": "total_events"}).reset_index()
+                        # Breakdowns from the hourly rollups, in one pass
+                        metrics = summarize_rollups(load_event_rollups(service_filter, start_datetime, end_datetime))
 
                         # Generate PDF
-                        pdf_buffer = generate_analytics_report(kpi_data, events_df, service_perf)
+                        pdf_buffer = generate_analytics_report(kpi_data, metrics)
 
                         # Download button
                         st.success("Report generated successfully!")
@@ -105,7 +96,7 @@ def show_reports_page():
         st.subheader("UAT & Testing Report Configuration")
 
         # Service filter
-        with get_session() as session:
+        with get_session(readonly=True) as session:
             services = session.query(Service).all()
             service_options = {0: "All Services"}
             service_options.update({s.id: s.name for s in services})
@@ -123,8 +114,8 @@ def show_reports_page():
                 with st.spinner("Generating report..."):
                     # Load data
                     service_filter = None if selected_service_id == 0 else selected_service_id
-                    test_cases_df = load_test_cases(service_filter)
-                    defects_df = load_defects(service_filter)
+                    test_cases_df = load_test_cases(service_filter, readonly=True)
+                    defects_df = load_defects(service_filter, readonly=True)
 
                     if test_cases_df.empty and defects_df.empty:
                         st.warning("No data available for the selected filters.")
@@ -4,6 +4,7 @@ UAT & Regression Testing Tracker page.
 import streamlit as st
 import pandas as pd
 from datetime import datetime
+from sqlalchemy import func, select
 from database.connection import get_session
 from database.models import TestCase, Defect, Service
 from utils.auth import require_role, check_role_access
@@ -11,10 +12,10 @@ from utils.validators import validate_required_field, validate_severity, validat
 from utils.logger import logger
 
 
-def load_test_cases(service_id: int = None) -> pd.DataFrame:
-    """Load test cases from database."""
+def load_test_cases(service_id: int = None, readonly: bool = False) -> pd.DataFrame:
+    """Load test cases from database (``readonly`` routes to the read replica)."""
     try:
-        with get_session() as session:
+        with get_session(readonly=readonly) as session:
             query = session.query(TestCase, Service).join(Service)
             if service_id:
                 query = query.filter(TestCase.service_id == service_id)
@@ -28,6 +29,7 @@ def load_test_cases(service_id: int = None) -> pd.DataFrame:
                     "description": test_case.description,
                     "expected_result": test_case.expected_result,
                     "status": test_case.status,
+                    "defects": test_case.defects_count,
                     "created_at": test_case.created_at
                 })
             return pd.DataFrame(data)
@@ -36,10 +38,10 @@ def load_test_cases(service_id: int = None) -> pd.DataFrame:
         return pd.DataFrame()
 
 
-def load_defects(service_id: int = None) -> pd.DataFrame:
-    """Load defects from database."""
+def load_defects(service_id: int = None, readonly: bool = False) -> pd.DataFrame:
+    """Load defects from database (``readonly`` routes to the read replica)."""
     try:
-        with get_session() as session:
+        with get_session(readonly=readonly) as session:
             query = session.query(Defect, Service).join(Service)
             if service_id:
                 query = query.filter(Defect.service_id == service_id)
@@ -61,6 +63,31 @@ def load_defects(service_id: int = None) -> pd.DataFrame:
         return pd.DataFrame()
 
 
+# Test case statuses and their counter cache columns on Service
+TEST_CASE_STATUS_COUNTERS = {
+    "Not Started": Service.not_started_test_cases_count,
+    "Passed": Service.passed_test_cases_count,
+    "Failed": Service.failed_test_cases_count,
+    "Blocked": Service.blocked_test_cases_count,
+}
+
+
+def load_tracker_counts(service_id: int = None) -> dict:
+    """Test case and defect totals from the per-service counter caches (one row per service)."""
+    columns = {
+        "test_cases": Service.test_cases_count,
+        "defects": Service.defects_count,
+        "open_defects": Service.open_defects_count,
+        "critical_defects": Service.critical_defects_count,
+        **TEST_CASE_STATUS_COUNTERS,
+    }
+    with get_session(readonly=True) as session:
+        query = select(*[func.coalesce(func.sum(column), 0).label(name) for name, column in columns.items()])
+        if service_id:
+            query = query.where(Service.id == service_id)
+        return dict(session.execute(query).mappings().one())
+
+
 def show_uat_tracker_page():
     """Display UAT tracker page."""
     require_role(["Analyst", "Tester", "Viewer"])
@@ -92,11 +119,12 @@ def show_uat_tracker_page():
             test_cases_df = load_test_cases(service_filter if service_filter != 0 else None)
 
         if not test_cases_df.empty:
-            st.markdown(f"**Total Test Cases: {len(test_cases_df)}**")
+            counts = load_tracker_counts(service_filter if service_filter != 0 else None)
+            st.markdown(f"**Total Test Cases: {counts['test_cases']}**")
 
             # Test case status summary
-            if "status" in test_cases_df.columns:
-                status_counts = test_cases_df["status"].value_counts()
+            status_counts = {status: counts[status] for status in TEST_CASE_STATUS_COUNTERS if counts[status]}
+            if status_counts:
                 cols = st.columns(len(status_counts))
                 for idx, (status, count) in enumerate(status_counts.items()):
                     with cols[idx]:
@@ -125,6 +153,7 @@ def show_uat_tracker_page():
                         "id": st.column_config.NumberColumn("ID", disabled=True),
                         "service": st.column_config.TextColumn("Service", disabled=True),
                         "title": st.column_config.TextColumn("Title", disabled=True),
+                        "defects": st.column_config.NumberColumn("Defects", disabled=True),
                         "created_at": st.column_config.DatetimeColumn("Created At", disabled=True),
                     },
                     use_container_width=True,
@@ -136,27 +165,27 @@ def show_uat_tracker_page():
                     try:
                         with get_session() as session:
                             changes_count = 0
+
+                            # Load every edited test case in one query instead of one per row
+                            edited_ids = [int(tc_id) for tc_id in edited_df["id"]]
+                            test_cases_by_id = {
+                                tc.id: tc
+                                for tc in session.query(TestCase).filter(TestCase.id.in_(edited_ids))
+                            }
                             
                             # Process checks for deletion
                             rows_to_delete = edited_df[edited_df["Delete"] == True]
                             for _, row in rows_to_delete.iterrows():
-                                tc_to_delete = session.query(TestCase).get(row["id"])
+                                tc_to_delete = test_cases_by_id.get(int(row["id"]))
                                 if tc_to_delete:
                                     session.delete(tc_to_delete)
                                     changes_count += 1
                             
-                            # Process updates (scan for status changes)
-                            # Since we don't have the original df easily accessible to compare diffs row-by-row efficiently without iterating,
-                            # and N is small, we can just update status for all non-deleted rows if they differ.
-                            # Optimization: Just look at touched rows if possible? 
-                            # Simpler: Iterate edited_df, skip deleted.
-                            
-                            # Actually, st.data_editor returns the final state.
-                            # We can just iterate and update.
-                            
+                            # Process updates (scan for status changes).
+                            # st.data_editor returns the final state, so compare every non-deleted row.
                             for _, row in edited_df.iterrows():
                                 if not row["Delete"]:
-                                    tc = session.query(TestCase).get(row["id"])
+                                    tc = test_cases_by_id.get(int(row["id"]))
                                     if tc and tc.status != row["status"]:
                                         tc.status = row["status"]
                                         changes_count += 1
@@ -242,7 +271,11 @@ def show_uat_tracker_page():
             defects_df = load_defects(defect_service_filter if defect_service_filter != 0 else None)
 
         if not defects_df.empty:
-            st.markdown(f"**Total Defects: {len(defects_df)}**")
+            counts = load_tracker_counts(defect_service_filter if defect_service_filter != 0 else None)
+            st.markdown(
+                f"**Total Defects: {counts['defects']}** · Open: {counts['open_defects']} · "
+                f"Critical: {counts['critical_defects']}"
+            )
 
             # Defect summary by severity and status
             col1, col2 = st.columns(2)
@@ -299,11 +332,18 @@ def show_uat_tracker_page():
                     try:
                         with get_session() as session:
                             changes_count = 0
+
+                            # Load every edited defect in one query instead of one per row
+                            edited_ids = [int(defect_id) for defect_id in edited_defects_df["id"]]
+                            defects_by_id = {
+                                defect.id: defect
+                                for defect in session.query(Defect).filter(Defect.id.in_(edited_ids))
+                            }
                             
                             # Process deletions
                             rows_to_delete = edited_defects_df[edited_defects_df["Delete"] == True]
                             for _, row in rows_to_delete.iterrows():
-                                defect_to_delete = session.query(Defect).get(row["id"])
+                                defect_to_delete = defects_by_id.get(int(row["id"]))
                                 if defect_to_delete:
                                     session.delete(defect_to_delete)
                                     changes_count += 1
@@ -311,7 +351,7 @@ def show_uat_tracker_page():
                             # Process updates
                             for _, row in edited_defects_df.iterrows():
                                 if not row["Delete"]:
-                                    defect = session.query(Defect).get(row["id"])
+                                    defect = defects_by_id.get(int(row["id"]))
                                     if defect:
                                         if defect.status != row["status"] or defect.severity != row["severity"]:
                                             defect.status = row["status"]
@@ -6,21 +6,39 @@ import sys
 import os
 import shutil
 
+SECRETS_FILE = os.path.join(".streamlit", "secrets.toml")
+
+
+def set_db_backend(backend: str, secrets_file: str = SECRETS_FILE):
+    """Set `backend` in the [db] table of the secrets file, adding the table if needed."""
+    with open(secrets_file) as f:
+        lines = f.read().splitlines()
+
+    backend_line = f'backend = "{backend}"'
+    # Drop any existing backend setting inside [db]
+    result, in_db = [], False
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith("["):
+            in_db = stripped == "[db]"
+        if in_db and stripped.replace(" ", "").startswith("backend="):
+            continue
+        result.append(line)
+
+    stripped_lines = [line.strip() for line in result]
+    if "[db]" in stripped_lines:
+        result.insert(stripped_lines.index("[db]") + 1, backend_line)
+    else:
+        result = ["[db]", backend_line, ""] + result
+
+    with open(secrets_file, "w") as f:
+        f.write("\n".join(result) + "\n")
+
+
 def setup_sqlite_testing():
     """Set up SQLite connection for testing."""
     print("Setting up SQLite for testing...")
     
-    # Backup original connection file
-    if os.path.exists("database/connection.py"):
-        if not os.path.exists("database/connection_postgresql.py.backup"):
-            shutil.copy("database/connection.py", "database/connection_postgresql.py.backup")
-            print("[OK] Backed up PostgreSQL connection file")
-    
-    # Copy SQLite connection
-    if os.path.exists("database/connection_sqlite.py"):
-        shutil.copy("database/connection_sqlite.py", "database/connection.py")
-        print("[OK] Switched to SQLite connection")
-    
     # Create minimal secrets if it doesn't exist
     secrets_dir = ".streamlit"
     secrets_file = os.path.join(secrets_dir, "secrets.toml")
@@ -53,21 +71,23 @@ password = "view123"
 role = "Viewer"
 """)
             print("[OK] Created minimal secrets.toml")
+
+    set_db_backend("sqlite", secrets_file)
+    print('[OK] Set backend = "sqlite" in [db]')
     
     print("\n[OK] Setup complete! You can now run: streamlit run app.py")
-    print("\nNote: This uses SQLite for testing. For production, restore connection_postgresql.py.backup")
+    print("\nNote: This uses SQLite for testing. For production, run: python quick_test.py restore")
 
 
 def restore_postgresql():
     """Restore PostgreSQL connection."""
     print("Restoring PostgreSQL connection...")
     
-    backup_file = "database/connection_postgresql.py.backup"
-    if os.path.exists(backup_file):
-        shutil.copy(backup_file, "database/connection.py")
-        print("[OK] Restored PostgreSQL connection")
+    if os.path.exists(SECRETS_FILE):
+        set_db_backend("postgresql")
+        print('[OK] Set backend = "postgresql" in [db]')
     else:
-        print("[WARN] No backup found. You'll need to restore connection.py manually")
+        print(f"[WARN] {SECRETS_FILE} not found. Nothing to restore")
 
 
 if __name__ == "__main__":
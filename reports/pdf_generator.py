@@ -8,16 +8,36 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import pandas as pd
 from io import BytesIO
+from utils.analytics_engine import EventMetrics
 from utils.logger import logger
 
 
+def _breakdown_table(breakdown: pd.DataFrame, key: str, label: str, header_color: str) -> Table:
+    """Completion rate and event count per value of ``key`` (an ``EventMetrics`` breakdown)."""
+    data = [[label, 'Completion Rate (%)', 'Total Events']]
+    for row in breakdown.itertuples(index=False):
+        data.append([str(getattr(row, key)), f"{row.completion_rate:.2f}", f"{row.total_events:,}"])
+
+    table = Table(data, colWidths=[2.5 * inch, 2 * inch, 1.5 * inch])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(header_color)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    return table
+
+
 def generate_analytics_report(
     kpi_data: Dict[str, Any],
-    events_df: pd.DataFrame,
-    service_perf_df: pd.DataFrame,
+    metrics: Optional[EventMetrics],
     output_path: str = None
 ) -> BytesIO:
     """
@@ -25,8 +45,7 @@ def generate_analytics_report(
     
     Args:
         kpi_data: Dictionary with KPI metrics
-        events_df: DataFrame with events data
-        service_perf_df: DataFrame with service performance data
+        metrics: Status distribution and breakdowns from utils.analytics_engine
         output_path: Optional file path to save PDF. If None, returns BytesIO buffer.
     
     Returns:
@@ -47,11 +66,7 @@ def generate_analytics_report(
                 "avg_journey_time": 0.0
             }
         
-        if events_df is None or events_df.empty:
-            events_df = pd.DataFrame()
-        
-        if service_perf_df is None or service_perf_df.empty:
-            service_perf_df = pd.DataFrame()
+        has_events = metrics is not None and metrics.total_events > 0
 
         # Custom styles
         title_style = ParagraphStyle(
@@ -109,20 +124,31 @@ def generate_analytics_report(
         story.append(kpi_table)
         story.append(Spacer(1, 0.3 * inch))
 
-        # Service Performance
-        if not service_perf_df.empty:
-            story.append(Paragraph("Service Performance", heading_style))
-            service_data = [['Service', 'Completion Rate (%)', 'Total Events']]
-            for _, row in service_perf_df.iterrows():
-                service_data.append([
-                    str(row.get('service', 'N/A')),
-                    f"{row.get('completion_rate', 0):.2f}",
-                    str(row.get('total_events', 0))
-                ])
-
-            service_table = Table(service_data, colWidths=[2.5 * inch, 2 * inch, 1.5 * inch])
-            service_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2ecc71')),
+        # Service, Channel and Action Performance
+        if has_events:
+            for breakdown, key, label, header_color in [
+                (metrics.by_service, "service", "Service", '#2ecc71'),
+                (metrics.by_channel, "channel", "Channel", '#16a085'),
+                (metrics.by_action, "action", "Action", '#27ae60'),
+            ]:
+                story.append(Paragraph(f"{label} Performance", heading_style))
+                story.append(_breakdown_table(breakdown, key, label, header_color))
+                story.append(Spacer(1, 0.3 * inch))
+
+        # Event Summary
+        if has_events:
+            story.append(Paragraph("Event Summary", heading_style))
+            story.append(Paragraph(f"Total events analyzed: {metrics.total_events:,}", styles['Normal']))
+            
+            # Status distribution
+            status_data = [['Status', 'Count', 'Percentage']]
+            for status, count in metrics.status_counts.items():
+                percentage = (count / metrics.total_events) * 100
+                status_data.append([str(status), f"{count:,}", f"{percentage:.2f}%"])
+
+            status_table = Table(status_data, colWidths=[2 * inch, 1.5 * inch, 1.5 * inch])
+            status_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#9b59b6')),
                 ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
                 ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
                 ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
@@ -131,34 +157,7 @@ def generate_analytics_report(
                 ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
                 ('GRID', (0, 0), (-1, -1), 1, colors.black)
             ]))
-            story.append(service_table)
-            story.append(Spacer(1, 0.3 * inch))
-
-        # Event Summary
-        if not events_df.empty:
-            story.append(Paragraph("Event Summary", heading_style))
-            story.append(Paragraph(f"Total events analyzed: {len(events_df)}", styles['Normal']))
-            
-            # Status distribution
-            if 'status' in events_df.columns:
-                status_counts = events_df['status'].value_counts()
-                status_data = [['Status', 'Count', 'Percentage']]
-                for status, count in status_counts.items():
-                    percentage = (count / len(events_df)) * 100
-                    status_data.append([str(status), str(count), f"{percentage:.2f}%"])
-
-                status_table = Table(status_data, colWidths=[2 * inch, 1.5 * inch, 1.5 * inch])
-                status_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#9b59b6')),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 11),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                ]))
-                story.append(status_table)
+            story.append(status_table)
 
         # Insights Section
         story.append(Spacer(1, 0.3 * inch))
@@ -1,9 +1,9 @@
 """
 Helper script to set up Supabase connection.
-This will restore the PostgreSQL connection file and help you configure it.
+This switches the database backend back to PostgreSQL and helps you configure it.
 """
 import os
-import shutil
+from quick_test import set_db_backend
 
 def setup_supabase():
     """Set up Supabase connection."""
@@ -11,86 +11,13 @@ def setup_supabase():
     print("Supabase Setup Helper")
     print("=" * 60)
     
-    # Check if backup exists
-    backup_file = "database/connection_postgresql.py.backup"
-    if not os.path.exists(backup_file):
-        print("\n[ERROR] PostgreSQL backup file not found!")
-        print("Creating PostgreSQL connection file from template...")
-        
-        # Create PostgreSQL connection file
-        pg_content = '''"""
-Database connection and session management.
-"""
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import NullPool
-from contextlib import contextmanager
-from typing import Generator
-import streamlit as st
-from config.settings import get_db_config
-from database.models import Base
-
-
-def get_database_url() -> str:
-    """Construct database URL from configuration."""
-    config = get_db_config()
-    return (
-        f"postgresql://{config['user']}:{config['password']}"
-        f"@{config['host']}:{config['port']}/{config['database']}"
-    )
-
-
-@st.cache_resource
-def get_engine():
-    """Create and cache database engine."""
-    try:
-        database_url = get_database_url()
-        engine = create_engine(
-            database_url,
-            poolclass=NullPool,
-            echo=False,
-            connect_args={"connect_timeout": 10}
-        )
-        return engine
-    except Exception as e:
-        st.error(f"Failed to connect to database: {e}")
-        st.stop()
-
-
-@contextmanager
-def get_session() -> Generator[Session, None, None]:
-    """Get database session with automatic cleanup."""
-    engine = get_engine()
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    session = SessionLocal()
-    try:
-        yield session
-        session.commit()
-    except Exception as e:
-        session.rollback()
-        raise e
-    finally:
-        session.close()
-
-
-def init_database():
-    """Initialize database tables."""
-    engine = get_engine()
-    Base.metadata.create_all(bind=engine)
-    return engine
-'''
-        
-        with open("database/connection.py", "w") as f:
-            f.write(pg_content)
-        print("[OK] Created PostgreSQL connection file")
-    else:
-        # Restore from backup
-        print(f"\n[OK] Found backup file: {backup_file}")
-        shutil.copy(backup_file, "database/connection.py")
-        print("[OK] Restored PostgreSQL connection file")
+    # Database backend is selected in secrets.toml; make sure it points at Postgres
+    secrets_file = ".streamlit/secrets.toml"
+    if os.path.exists(secrets_file):
+        set_db_backend("postgresql", secrets_file)
+        print('\n[OK] Set backend = "postgresql" in [db]')
     
     # Check secrets file
-    secrets_file = ".streamlit/secrets.toml"
     if os.path.exists(secrets_file):
         print(f"\n[OK] Secrets file exists: {secrets_file}")
         print("\nNext steps:")
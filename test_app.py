@@ -155,6 +155,990 @@ def test_auth_utilities():
         return False
 
 
+def test_query_diagnostics():
+    """Test that the N+1 detector and query budget catch per-row queries."""
+    print("\nTesting query diagnostics...")
+    
+    try:
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import Session
+        from database.models import Base, Service
+        from database.instrumentation import instrument_engine, query_budget, QueryBudgetExceeded
+        
+        engine = instrument_engine(create_engine("sqlite://"))
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add_all([Service(name=f"Service {i}", channel="web") for i in range(10)])
+            session.commit()
+        
+        # One query per row must be flagged, with the offending call site
+        try:
+            with query_budget(max_queries=20):
+                with Session(engine) as session:
+                    for service_id in range(1, 11):
+                        session.get(Service, service_id)
+            print("[ERROR] N+1 pattern was not detected")
+            return False
+        except QueryBudgetExceeded as e:
+            if "test_app.py" not in str(e):
+                print(f"[ERROR] N+1 report is missing the call site: {e}")
+                return False
+        
+        # A single batched query stays within budget
+        with query_budget(max_queries=2):
+            with Session(engine) as session:
+                session.query(Service).filter(Service.id.in_(range(1, 11))).all()
+        
+        print("[OK] Query diagnostics working correctly")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error testing query diagnostics: {e}")
+        return False
+
+
+def test_event_rollups():
+    """Test that incremental rollups plus the unrolled tail match the raw events."""
+    print("\nTesting event rollups...")
+    
+    try:
+        from datetime import datetime, timedelta
+        from sqlalchemy import create_engine, func, select
+        from database.dimensions import DIMENSIONS, encode_names
+        from database.models import Base, Event, Service
+        from database.rollups import kpi_totals, refresh_rollups, rollup_rows
+        
+        engine = create_engine("sqlite://")
+        # The lookup caches are per process; this is a fresh database
+        for dimension in DIMENSIONS.values():
+            dimension.clear()
+        Base.metadata.create_all(engine)
+        start = datetime(2024, 1, 1)
+        events = [
+            {"service_id": 1, "action": "login", "status": "success" if i % 4 else "error",
+             "timestamp": start + timedelta(minutes=7 * i), "journey_time": float(i) if i % 4 else None}
+            for i in range(200)
+        ]
+        with engine.begin() as conn:
+            conn.execute(Service.__table__.insert(), {"name": "Portal", "channel": "web"})
+            conn.execute(Event.__table__.insert(), encode_names(conn, events[:150]))
+        
+        # Small batches exercise the upsert into existing hours
+        refresh_rollups(engine, batch_size=40)
+        with engine.begin() as conn:
+            conn.execute(Event.__table__.insert(), encode_names(conn, events[150:]))
+        
+        with engine.connect() as conn:
+            rows = rollup_rows().subquery()
+            rolled = conn.execute(select(
+                func.sum(rows.c.event_count), func.sum(rows.c.journey_time_sum),
+                func.min(rows.c.journey_time_min), func.max(rows.c.journey_time_max),
+            )).one()
+            raw = conn.execute(select(
+                func.count(Event.id), func.sum(Event.journey_time),
+                func.min(Event.journey_time), func.max(Event.journey_time),
+            )).one()
+            totals = conn.execute(kpi_totals(start=start + timedelta(hours=5))).mappings().one()
+        
+        if tuple(rolled) != tuple(raw):
+            print(f"[ERROR] Rollups {tuple(rolled)} do not match events {tuple(raw)}")
+            return False
+        
+        window = [event for event in events if event["timestamp"] >= start + timedelta(hours=5)]
+        journey_times = [event["journey_time"] for event in window if event["journey_time"] is not None]
+        expected = {
+            "total_events": len(window),
+            "success_count": sum(event["status"] == "success" for event in window),
+            "error_count": sum(event["status"] == "error" for event in window),
+            "pending_count": 0,
+            "journey_count": len(journey_times),
+            "journey_time_sum": sum(journey_times),
+        }
+        if dict(totals) != expected:
+            print(f"[ERROR] KPI totals {dict(totals)} do not match events {expected}")
+            return False
+        
+        print("[OK] Event rollups working correctly")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error testing event rollups: {e}")
+        return False
+
+
+def test_event_dimensions():
+    """Test that event names round-trip through their lookup ids and unknown statuses are refused."""
+    print("\nTesting event dimensions...")
+
+    try:
+        from datetime import datetime
+        import pandas as pd
+        from sqlalchemy import create_engine, func, select
+        from database.dimensions import DIMENSIONS, decode_categorical, encode_names
+        from database.models import STATUS_IDS, Base, Event, EventStatusName, Service
+
+        engine = create_engine("sqlite://")
+        for dimension in DIMENSIONS.values():
+            dimension.clear()
+        Base.metadata.create_all(engine)
+        rows = [
+            {"service_id": 1, "action": action, "status": status, "timestamp": datetime(2024, 1, 1, i),
+             "error_message": "Gateway Timeout" if status == "error" else None}
+            for i, (action, status) in enumerate([("login", "success"), ("pay", "error"), ("login", "pending")])
+        ]
+        with engine.begin() as conn:
+            conn.execute(Service.__table__.insert(), {"name": "Portal", "channel": "web"})
+            encoded = encode_names(conn, rows)
+            conn.execute(Event.__table__.insert(), encoded)
+        if [row["status_id"] for row in encoded] != [STATUS_IDS[row["status"]] for row in rows]:
+            print(f"[ERROR] Statuses were not encoded with their seeded ids: {encoded}")
+            return False
+
+        # Decoded from a fresh cache, as another process would
+        for dimension in DIMENSIONS.values():
+            dimension.clear()
+        with engine.connect() as conn:
+            stored = pd.read_sql(select(Event.action_id, Event.status_id, Event.error_message_id).order_by(Event.id), conn)
+            for key in DIMENSIONS:
+                decoded = list(decode_categorical(stored[f"{key}_id"], key, conn))
+                names = [row[key] for row in rows]
+                if [None if pd.isna(name) else name for name in decoded] != names:
+                    print(f"[ERROR] {key} decoded as {decoded} instead of {names}")
+                    return False
+
+        # A mistyped status is refused instead of becoming a new status
+        try:
+            with engine.begin() as conn:
+                encode_names(conn, [{**rows[0], "status": "sucess"}])
+            print("[ERROR] An unknown status was accepted")
+            return False
+        except ValueError:
+            pass
+        with engine.connect() as conn:
+            statuses = conn.execute(select(func.count()).select_from(EventStatusName)).scalar()
+        if statuses != len(STATUS_IDS):
+            print(f"[ERROR] event_statuses holds {statuses} rows")
+            return False
+
+        print("[OK] Event dimensions working correctly")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error testing event dimensions: {e}")
+        return False
+
+
+def test_dashboard_summary():
+    """Test that the SQLite dashboard summary row matches direct counts."""
+    print("\nTesting dashboard summary...")
+
+    try:
+        from datetime import datetime, timedelta
+        from sqlalchemy import create_engine, func, select
+        from sqlalchemy.orm import Session
+        from database.bulk_load import bulk_load_events
+        from database.dimensions import DIMENSIONS
+        from database.models import STATUS_IDS, Base, Defect, Event, Service, TestCase
+        from database.summary import create_dashboard_summary, dashboard_summary, refresh_dashboard_summary
+
+        engine = create_engine("sqlite://")
+        for dimension in DIMENSIONS.values():
+            dimension.clear()
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            create_dashboard_summary(conn)
+        with Session(engine) as session:
+            portal, app = Service(name="Portal", channel="web"), Service(name="App", channel="mobile")
+            session.add_all([portal, app])
+            session.flush()
+            session.add_all([
+                TestCase(service_id=portal.id, title="Login", expected_result="Logged in", status="Passed"),
+                TestCase(service_id=app.id, title="Pay", expected_result="Paid", status="Failed"),
+                TestCase(service_id=app.id, title="Search", expected_result="Found"),
+                Defect(service_id=portal.id, title="Timeout", description="d", severity="Critical"),
+                Defect(service_id=app.id, title="Crash", description="d", severity="High", status="Resolved"),
+                Defect(service_id=app.id, title="Typo", description="d", severity="Low"),
+            ])
+            session.commit()
+        # Events every 11 hours over 40 days, so some fall before the 30-day window
+        now = datetime.now()
+        bulk_load_events(engine, [
+            {"service_id": 1 + i % 2, "action": "login", "status": ["success", "error", "pending"][i % 3],
+             "timestamp": now - timedelta(hours=11 * i + 1)}
+            for i in range(88)
+        ])
+
+        if not refresh_dashboard_summary(engine):
+            print("[ERROR] Summary refresh did not run")
+            return False
+        since = (now - timedelta(days=30)).replace(minute=0, second=0, microsecond=0)
+        with engine.connect() as conn:
+            summary = conn.execute(select(dashboard_summary)).one()._mapping
+
+            def count(model, *conditions):
+                return conn.execute(select(func.count()).select_from(model).where(*conditions)).scalar()
+
+            expected = {
+                "services_count": count(Service),
+                "total_events": count(Event, Event.timestamp >= since),
+                "success_events": count(Event, Event.timestamp >= since, Event.status_id == STATUS_IDS["success"]),
+                "error_events": count(Event, Event.timestamp >= since, Event.status_id == STATUS_IDS["error"]),
+                "total_test_cases": count(TestCase),
+                "passed_test_cases": count(TestCase, TestCase.status == "Passed"),
+                "failed_test_cases": count(TestCase, TestCase.status == "Failed"),
+                "total_defects": count(Defect),
+                "open_defects": count(Defect, Defect.status == "Open"),
+                "critical_defects": count(Defect, Defect.severity == "Critical"),
+                "high_defects": count(Defect, Defect.severity == "High"),
+                "medium_defects": count(Defect, Defect.severity == "Medium"),
+                "low_defects": count(Defect, Defect.severity == "Low"),
+            }
+        actual = {key: summary[key] for key in expected}
+        if actual != expected or expected["total_events"] in (0, 88):
+            print(f"[ERROR] Summary {actual} != direct counts {expected}")
+            return False
+        if refresh_dashboard_summary(engine, min_age=60):
+            print("[ERROR] A fresh summary was refreshed again")
+            return False
+
+        print("[OK] Dashboard summary working correctly")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error testing dashboard summary: {e}")
+        return False
+
+
+def test_metadata_filters():
+    """Test that metadata filters return the matching events, with blank and malformed metadata migrated."""
+    print("\nTesting event metadata filters...")
+
+    try:
+        from datetime import datetime, timedelta
+        from sqlalchemy import create_engine, select, text
+        from database.bulk_load import bulk_load_events
+        from database.dimensions import DIMENSIONS
+        from database.event_metadata import metadata_conditions
+        from database.migrations import _add_event_metadata_indexes
+        from database.models import Base, Event, Service
+
+        engine = create_engine("sqlite://")
+        for dimension in DIMENSIONS.values():
+            dimension.clear()
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(Service.__table__.insert(), {"name": "Portal", "channel": "web"})
+        metadata = [
+            {"region": "eu-west", "app_version": "4.0.0"},
+            {"region": "us-east", "app_version": "4.0.0"},
+            {"region": "eu-west", "tier": "gold"},
+            {"device": "ios"},
+            None,
+        ]
+        start = datetime(2024, 1, 1)
+        bulk_load_events(engine, [
+            {"service_id": 1, "action": "login", "status": "success", "timestamp": start + timedelta(minutes=i),
+             "event_metadata": values}
+            for i, values in enumerate(metadata)
+        ])
+        with engine.begin() as conn:
+            # Text written before the column was JSON: blank or not JSON at all
+            conn.execute(
+                text("INSERT INTO events (service_id, action_id, status_id, timestamp, event_metadata) "
+                     "VALUES (1, 1, 1, :timestamp, :metadata)"),
+                [{"timestamp": start, "metadata": value} for value in ("", "   ", "region=eu-west")],
+            )
+            # The v5 step promotes the keys to indexed generated columns
+            _add_event_metadata_indexes(conn)
+
+        cases = [
+            ({"region": "eu-west"}, [1, 3]),
+            ({"region": "eu-west", "app_version": "4.0.0"}, [1]),
+            ({"tier": "gold"}, [3]),
+            ({"device": "ios", "region": ""}, [4]),
+            ({"region": "ap-south"}, []),
+        ]
+        with engine.connect() as conn:
+            for filters, expected in cases:
+                query = select(Event.id).where(*metadata_conditions(filters)).order_by(Event.id)
+                found = conn.execute(query).scalars().all()
+                if found != expected:
+                    print(f"[ERROR] Metadata filter {filters} returned {found} instead of {expected}")
+                    return False
+            query = select(Event.id).where(*metadata_conditions({"region": "eu-west"}))
+            plan = conn.execute(text(f"EXPLAIN QUERY PLAN {query.compile(compile_kwargs={'literal_binds': True})}")).all()
+            if "ix_events_meta_region" not in str(plan):
+                print(f"[ERROR] The region filter does not use its index: {plan}")
+                return False
+
+        print("[OK] Event metadata filters working correctly")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error testing event metadata filters: {e}")
+        return False
+
+
+def test_bulk_load():
+    """Test that the bulk loader writes events the ORM reads back unchanged."""
+    print("\nTesting bulk event loader...")
+    
+    try:
+        from datetime import datetime, timedelta
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import Session
+        from database.bulk_load import bulk_load_events
+        from database.dimensions import DIMENSIONS
+        from database.models import Base, Event, Service
+        
+        engine = create_engine("sqlite://")
+        for dimension in DIMENSIONS.values():
+            dimension.clear()
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(Service.__table__.insert(), {"name": "Portal", "channel": "web"})
+        start = datetime(2024, 1, 1, 9, 30)
+        rows = [
+            {"service_id": 1, "action": f"step_{i % 3}", "status": "error" if i % 5 == 0 else "success",
+             "timestamp": start + timedelta(seconds=i), "journey_time": None if i % 5 == 0 else i / 2,
+             "error_message": "Timeout" if i % 5 == 0 else None, "event_metadata": {"region": "eu"} if i % 2 else None}
+            for i in range(25)
+        ]
+        
+        stats = bulk_load_events(engine, iter(rows), batch_size=10)
+        if (stats.rows, stats.batches) != (25, 3):
+            print(f"[ERROR] Loaded {stats.rows} rows in {stats.batches} batches, expected 25 in 3")
+            return False
+        
+        with Session(engine) as session:
+            loaded = [
+                {"service_id": e.service_id, "action": e.action, "status": e.status, "timestamp": e.timestamp,
+                 "journey_time": e.journey_time, "error_message": e.error_message, "event_metadata": e.event_metadata}
+                for e in session.query(Event).order_by(Event.id)
+            ]
+        if loaded != rows:
+            print("[ERROR] Bulk loaded events do not match the input rows")
+            return False
+        
+        print("[OK] Bulk event loader working correctly")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error testing bulk event loader: {e}")
+        return False
+
+
+def test_columnar_fetch():
+    """Test that the columnar events reader returns what the ORM reads."""
+    print("\nTesting columnar event fetch...")
+
+    try:
+        from datetime import datetime, timedelta
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import Session
+        from database.bulk_load import bulk_load_events
+        from database.columnar import events_select, read_events_frame
+        from database.dimensions import DIMENSIONS
+        from database.models import Base, Event, Service
+
+        engine = create_engine("sqlite://")
+        for dimension in DIMENSIONS.values():
+            dimension.clear()
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(Service.__table__.insert(), [{"name": "Portal", "channel": "web"}, {"name": "App", "channel": "mobile"}])
+        start = datetime(2024, 1, 1, 9, 30)
+        bulk_load_events(engine, (
+            {"service_id": 1 + i % 2, "action": f"step_{i % 3}", "status": "error" if i % 4 == 0 else "success",
+             "timestamp": start + timedelta(seconds=i, microseconds=i), "journey_time": None if i % 4 == 0 else i / 4,
+             "error_message": "Timeout" if i % 4 == 0 else None}
+            for i in range(30)
+        ))
+
+        with engine.connect() as conn:
+            # Blocks smaller than the result exercise the concatenation
+            df = read_events_frame(conn, events_select().order_by(Event.id), batch_size=7)
+            empty = read_events_frame(conn, events_select().where(Event.service_id == 3))
+        with Session(engine) as session:
+            expected = [
+                (e.id, s.name, s.channel, e.action, e.status, e.timestamp, e.journey_time, e.error_message)
+                for e, s in session.query(Event, Service).join(Service).order_by(Event.id)
+            ]
+        loaded = [
+            tuple(None if value != value else value for value in row)  # NaN to None
+            for row in df.astype(object).itertuples(index=False, name=None)
+        ]
+        if loaded != expected:
+            print("[ERROR] Columnar fetch does not match the ORM rows")
+            return False
+        if list(empty.columns) != list(df.columns) or len(empty):
+            print(f"[ERROR] Empty result has columns {list(empty.columns)}")
+            return False
+
+        print("[OK] Columnar event fetch working correctly")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error testing columnar event fetch: {e}")
+        return False
+
+
+def test_analytics_engine():
+    """Test that the analytics engine gives the same figures from events and from rollups."""
+    print("\nTesting analytics engine...")
+
+    try:
+        from datetime import datetime, timedelta
+        import pandas as pd
+        from sqlalchemy import create_engine, select
+        from database.bulk_load import bulk_load_events
+        from database.columnar import events_select, read_events_frame
+        from database.dimensions import DIMENSIONS
+        from database.models import Base, Service
+        from database.rollups import refresh_rollups, rollup_rows
+        from utils.analytics_engine import summarize_events, summarize_rollups
+
+        engine = create_engine("sqlite://")
+        for dimension in DIMENSIONS.values():
+            dimension.clear()
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(Service.__table__.insert(), [{"name": "Portal", "channel": "web"}, {"name": "App", "channel": "mobile"}])
+        start = datetime(2024, 1, 1)
+        statuses = ["success", "success", "error", "pending"]
+        bulk_load_events(engine, (
+            {"service_id": 1 + i % 2, "action": f"step_{i % 3}", "status": statuses[i % 4],
+             "timestamp": start + timedelta(minutes=37 * i), "journey_time": float(i) if i % 4 < 2 else None}
+            for i in range(120)
+        ))
+        # Part rolled up, part still in the tail
+        refresh_rollups(engine)
+        bulk_load_events(engine, (
+            {"service_id": 1, "action": "step_0", "status": "success",
+             "timestamp": start + timedelta(days=4, minutes=i), "journey_time": 2.0}
+            for i in range(10)
+        ))
+
+        with engine.connect() as conn:
+            events = read_events_frame(conn, events_select())
+            rows = rollup_rows().subquery()
+            result = conn.execute(
+                select(rows, Service.name.label("service"), Service.channel)
+                .join(Service, Service.id == rows.c.service_id)
+            )
+            rollups = pd.DataFrame(result.all(), columns=list(result.keys()))
+
+        from_events = summarize_events(events)
+        from_rollups = summarize_rollups(rollups)
+        expected = {
+            "total_events": 130, "success_count": 70, "error_count": 30, "pending_count": 30,
+            "completion_rate": 70 / 130 * 100, "error_rate": 30 / 130 * 100,
+            "avg_journey_time": (sum(float(i) for i in range(120) if i % 4 < 2) + 20.0) / 70,
+        }
+        for name, metrics in [("events", from_events), ("rollups", from_rollups)]:
+            if {k: round(v, 6) for k, v in metrics.kpis.items()} != {k: round(v, 6) for k, v in expected.items()}:
+                print(f"[ERROR] KPIs from {name} {metrics.kpis} do not match {expected}")
+                return False
+
+        for key in ["by_service", "by_channel", "by_action"]:
+            a = getattr(from_events, key).astype({key[3:]: str})
+            b = getattr(from_rollups, key).astype({key[3:]: str})
+            if not a.sort_values(key[3:]).reset_index(drop=True).equals(b.sort_values(key[3:]).reset_index(drop=True)):
+                print(f"[ERROR] {key} differs between events and rollups")
+                return False
+        if from_events.daily["count"].sum() != 130 or len(from_events.daily) != len(from_rollups.daily):
+            print("[ERROR] Daily series does not cover every event")
+            return False
+        if summarize_events(events.iloc[:0]).total_events != 0:
+            print("[ERROR] Empty frame should give no events")
+            return False
+
+        print("[OK] Analytics engine working correctly")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error testing analytics engine: {e}")
+        return False
+
+
+def test_event_explorer():
+    """Test that keyset pages cover the filtered events exactly once, in order, archived ones too."""
+    print("\nTesting event explorer pagination...")
+
+    try:
+        import os
+        import tempfile
+        from datetime import datetime, timedelta
+        from sqlalchemy import create_engine
+        from database.archive import archive_events
+        from database.bulk_load import bulk_load_events
+        from database.dimensions import DIMENSIONS
+        from database.explorer import EventFilters, estimate_event_count, event_page
+        from database.models import Base, Service
+        from database.rollups import refresh_rollups
+
+        engine = create_engine("sqlite://")
+        for dimension in DIMENSIONS.values():
+            dimension.clear()
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(Service.__table__.insert(), [{"name": "Portal", "channel": "web"}, {"name": "App", "channel": "mobile"}])
+        start = datetime(2024, 1, 1)
+        # Three events per timestamp, so pages break inside runs of equal timestamps
+        events = [
+            {"service_id": 1 + i % 2, "action": f"step_{i % 3}", "status": "error" if i % 5 == 0 else "success",
+             "timestamp": start + timedelta(minutes=50 * (i // 3)), "journey_time": float(i % 40),
+             "error_message": "Gateway Timeout" if i % 5 == 0 else None}
+            for i in range(300)
+        ]
+        bulk_load_events(engine, events)
+        refresh_rollups(engine)
+        ids = {i: i + 1 for i in range(300)}
+
+        def expected(predicate, descending):
+            keys = sorted(((e["timestamp"], ids[i]) for i, e in enumerate(events) if predicate(e)), reverse=descending)
+            return [event_id for _, event_id in keys]
+
+        window = EventFilters(start=start + timedelta(hours=20), end=start + timedelta(hours=60))
+        cases = [
+            (window, lambda e: window.start <= e["timestamp"] < window.end),
+            (EventFilters(statuses=("error",), channels=("web",)), lambda e: e["status"] == "error" and e["service_id"] == 1),
+            (EventFilters(error_text="timeout", max_journey_time=20.0), lambda e: e["error_message"] and e["journey_time"] <= 20),
+        ]
+        archive_path = os.path.join(tempfile.mkdtemp(), "archive")
+        for archived in (False, True):
+            if archived:
+                # The first two days move to Parquet; pages cross from the table into them
+                archive_events(engine, archive_path, start + timedelta(days=2))
+            with engine.connect() as conn:
+                for filters, predicate in cases:
+                    for descending in (True, False):
+                        seen, key = [], None
+                        while True:
+                            page, key = event_page(conn, filters, key, descending, page_size=7, archive_path=archive_path)
+                            seen.extend(page["id"].tolist())
+                            if key is None:
+                                break
+                        if seen != expected(predicate, descending):
+                            print(f"[ERROR] Pages for {filters} (descending={descending}, archived={archived}) returned {seen}")
+                            return False
+                    total, exact = estimate_event_count(conn, filters, archive_path)
+                    if (total, exact) != (len(expected(predicate, True)), True):
+                        print(f"[ERROR] Count for {filters} is {total} (exact={exact}, archived={archived})")
+                        return False
+
+        print("[OK] Event explorer working correctly")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error testing event explorer: {e}")
+        return False
+
+
+def test_event_archive():
+    """Test that a batch interrupted after writing its files is archived once on the next run."""
+    print("\nTesting event archive...")
+
+    try:
+        import os
+        import tempfile
+        from datetime import datetime, timedelta
+        from unittest import mock
+        import database.archive as archive
+        from sqlalchemy import create_engine, func, select
+        from database.bulk_load import bulk_load_events
+        from database.dimensions import DIMENSIONS
+        from database.models import ArchiveCheckpoint, Base, Event, Service
+
+        engine = create_engine("sqlite://")
+        for dimension in DIMENSIONS.values():
+            dimension.clear()
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(Service.__table__.insert(), {"name": "Portal", "channel": "web"})
+        start = datetime(2024, 1, 1)
+        bulk_load_events(engine, [
+            {"service_id": 1, "action": "login", "status": "success", "timestamp": start + timedelta(hours=i)}
+            for i in range(96)
+        ])
+        path = os.path.join(tempfile.mkdtemp(), "archive")
+
+        # Stop after the first day file of the first batch, before its events are deleted
+        write_day = archive._write_day
+
+        def crash(*args):
+            write_day(*args)
+            raise KeyboardInterrupt
+
+        with mock.patch("database.archive._write_day", side_effect=crash):
+            try:
+                archive.archive_events(engine, path, start + timedelta(days=3), batch_size=50)
+            except KeyboardInterrupt:
+                pass
+        archived = archive.archive_events(engine, path, start + timedelta(days=3), batch_size=20)
+
+        ids = archive.read_archived_events(path)["id"].tolist()
+        with engine.connect() as conn:
+            remaining = conn.execute(select(func.count()).select_from(Event)).scalar()
+            pending = conn.execute(select(func.count()).select_from(ArchiveCheckpoint)).scalar()
+        if (archived, sorted(ids), remaining, pending) != (72, list(range(1, 73)), 24, 0):
+            print(f"[ERROR] Archived {archived}, archive holds {len(ids)} events ({len(set(ids))} distinct), "
+                  f"{remaining} left in the table, {pending} pending checkpoints")
+            return False
+
+        print("[OK] Event archive working correctly")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error testing event archive: {e}")
+        return False
+
+
+def test_event_dedup():
+    """Test that events reloaded with the same client_event_id are skipped and counted."""
+    print("\nTesting client_event_id deduplication...")
+
+    try:
+        from datetime import datetime, timedelta
+        from sqlalchemy import create_engine, func, select
+        from database.bulk_load import bulk_load_events
+        from database.dimensions import DIMENSIONS
+        from database.models import Base, Event, Service
+
+        engine = create_engine("sqlite://")
+        for dimension in DIMENSIONS.values():
+            dimension.clear()
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(Service.__table__.insert(), {"name": "Portal", "channel": "web"})
+        start = datetime(2024, 1, 1, 9, 30)
+        rows = [
+            {"service_id": 1, "action": "login", "status": "success", "timestamp": start + timedelta(seconds=i),
+             "client_event_id": f"evt-{i}"}
+            for i in range(20)
+        ]
+
+        first = bulk_load_events(engine, iter(rows), batch_size=8)
+        # A retried delivery overlapping the first, plus five new events and two without ids
+        retry = rows[10:] + [
+            {**row, "client_event_id": f"evt-{i + 20}"} for i, row in enumerate(rows[:5])
+        ] + [{**row, "client_event_id": None} for row in rows[:2]]
+        second = bulk_load_events(engine, iter(retry), batch_size=8)
+        if (first.rows, first.duplicates) != (20, 0) or (second.rows, second.duplicates) != (7, 10):
+            print(f"[ERROR] Loaded {first.rows}+{second.rows} rows with {first.duplicates}+{second.duplicates} "
+                  "duplicates, expected 20+7 with 0+10")
+            return False
+
+        with engine.connect() as conn:
+            count = conn.execute(select(func.count()).select_from(Event.__table__)).scalar()
+        if count != 27:
+            print(f"[ERROR] {count} events stored, expected 27")
+            return False
+
+        print("[OK] client_event_id deduplication working correctly")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error testing client_event_id deduplication: {e}")
+        return False
+
+
+def test_event_collector():
+    """Test that queued events are written in batches and flushed on close."""
+    print("\nTesting event collector...")
+    
+    try:
+        import os
+        import tempfile
+        from sqlalchemy import create_engine, func, select
+        from database.collector import EventCollector
+        from database.dimensions import DIMENSIONS
+        from database.models import Base, Event, Service
+        
+        # A file database: the flusher thread needs to see the same tables
+        path = os.path.join(tempfile.mkdtemp(), "collector.db")
+        engine = create_engine(f"sqlite:///{path}")
+        for dimension in DIMENSIONS.values():
+            dimension.clear()
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(Service.__table__.insert(), {"name": "Portal", "channel": "web"})
+        
+        collector = EventCollector(engine, queue_size=100, batch_size=20, flush_interval=0.05)
+        for i in range(50):
+            collector.log_event("Portal", "login", journey_time=float(i))
+            # Malformed events among good ones only fail themselves
+            if i == 5:
+                collector.log_event("Portal", None)
+                collector.log_event("Portal", "login", timestamp="yesterday")
+                collector.log_event("Portal", "login", status="sucess")
+        collector.log_event("Unknown", "login")
+        if not collector.flush(timeout=10):
+            print("[ERROR] Collector did not flush in time")
+            return False
+        collector.log_event(1, "logout")
+        collector.log_event(99, "logout")
+        collector.close()
+        
+        metrics = collector.metrics()
+        with engine.connect() as conn:
+            stored = conn.execute(select(func.count()).select_from(Event)).scalar()
+        if (stored, metrics.written, metrics.failed, metrics.queue_depth) != (51, 51, 5, 0):
+            print(f"[ERROR] Stored {stored} events, metrics {metrics}")
+            return False
+        if collector.log_event("Portal", "login") or collector.metrics().rejected != 1:
+            print("[ERROR] Closed collector accepted an event")
+            return False
+        
+        print("[OK] Event collector working correctly")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error testing event collector: {e}")
+        return False
+
+
+def test_ingest_service():
+    """Test that the ingestion service writes valid NDJSON lines and reports the rest."""
+    print("\nTesting ingestion service...")
+    
+    try:
+        import asyncio
+        import json
+        import os
+        import tempfile
+        from datetime import datetime, timezone
+        from sqlalchemy import create_engine, func, select
+        from config.settings import get_ingest_config
+        from database.dimensions import DIMENSIONS
+        from database.models import Base, Event, Service
+        from ingest_service import IngestApp
+        
+        path = os.path.join(tempfile.mkdtemp(), "ingest.db")
+        engine = create_engine(f"sqlite:///{path}")
+        for dimension in DIMENSIONS.values():
+            dimension.clear()
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(Service.__table__.insert(), {"name": "Portal", "channel": "web"})
+        
+        async def post(app, body: bytes):
+            messages = [{"type": "http.request", "body": body, "more_body": False}]
+            sent = []
+            
+            async def receive():
+                return messages.pop(0)
+            
+            async def send(message):
+                sent.append(message)
+            
+            await app({"type": "http", "method": "POST", "path": "/events"}, receive, send)
+            return sent[0]["status"], json.loads(sent[1]["body"])
+        
+        app = IngestApp(engine, get_ingest_config())
+        body = b"\n".join([
+            b'{"service": "Portal", "action": "login", "journey_time": 2.5}',
+            b'{"service_id": 1, "action": "logout", "timestamp": "2024-01-01T10:00:00"}',
+            b'{"service": "Unknown", "action": "login"}',
+            b'not json',
+            b'{"service": "Portal", "action": "login", "status": "done"}',
+        ])
+        status, response = asyncio.run(post(app, body))
+        with engine.connect() as conn:
+            stored = conn.execute(select(func.count()).select_from(Event)).scalar()
+        if (status, response["accepted"], stored) != (200, 2, 2):
+            print(f"[ERROR] Ingest returned {status} {response}, stored {stored} events")
+            return False
+        if [error["line"] for error in response["errors"]] != [3, 4, 5]:
+            print(f"[ERROR] Unexpected rejected lines: {response['errors']}")
+            return False
+        
+        # A batch without a single text action is rejected per line, not a 500
+        status, response = asyncio.run(post(app, b'{"service": "Portal", "action": 5}\n{"service_id": 1, "action": 7.5}'))
+        if status != 400 or [error["line"] for error in response["errors"]] != [1, 2]:
+            print(f"[ERROR] Numeric actions returned {status} {response}")
+            return False
+
+        # Ids out of the int64 range and booleans are rejected per line too
+        status, response = asyncio.run(post(
+            app, b'{"service_id": 99999999999999999999999, "action": "login"}\n{"service_id": true, "action": "login"}'
+        ))
+        if status != 400 or [error["error"] for error in response["errors"]] != ["service_id must be an integer"] * 2:
+            print(f"[ERROR] Invalid service ids returned {status} {response}")
+            return False
+
+        # Timestamps with an offset are stored in local time like the naive ones
+        status, _ = asyncio.run(post(app, b'{"service_id": 1, "action": "offset", "timestamp": "2024-07-01T12:00:00+02:00"}'))
+        with engine.connect() as conn:
+            stored = conn.execute(
+                select(Event.timestamp).order_by(Event.id.desc()).limit(1)
+            ).scalar()
+        expected = datetime(2024, 7, 1, 10, 0, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+        if (status, stored) != (200, expected):
+            print(f"[ERROR] Offset timestamp returned {status}, stored as {stored} instead of {expected}")
+            return False
+
+        # Over max_pending the service sheds load instead of queueing
+        app.in_flight = app.config["max_pending"]
+        status, _ = asyncio.run(post(app, body))
+        if status != 429:
+            print(f"[ERROR] Overloaded service returned {status} instead of 429")
+            return False
+        
+        print("[OK] Ingestion service working correctly")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error testing ingestion service: {e}")
+        return False
+
+
+def test_event_import():
+    """Test that an interrupted file import resumes without loading rows twice."""
+    print("\nTesting event file import...")
+    
+    try:
+        import os
+        import tempfile
+        from sqlalchemy import create_engine, func, select
+        from database.dimensions import DIMENSIONS
+        from database.importer import import_events
+        from database.models import Base, Event, Service
+        
+        directory = tempfile.mkdtemp()
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'import.db')}")
+        for dimension in DIMENSIONS.values():
+            dimension.clear()
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(Service.__table__.insert(), {"name": "Portal", "channel": "web"})
+        
+        path = os.path.join(directory, "events.csv")
+        with open(path, "w") as f:
+            f.write("svc,action,status,ts,journey_time\n")
+            for i in range(10):
+                f.write(f"Portal,login,success,2024-01-01T10:{i:02d}:00,{i}\n")
+            f.write("Unknown,login,success,2024-01-01T11:00:00,\n")
+            f.write("Portal,,success,2024-01-01T11:00:00,\n")
+        column_map = {"svc": "service", "ts": "timestamp"}
+        
+        def interrupt(number, stats):
+            if number == 2:
+                raise KeyboardInterrupt
+        
+        try:
+            import_events(engine, path, chunk_size=4, column_map=column_map, on_chunk=interrupt)
+        except KeyboardInterrupt:
+            pass
+        stats = import_events(engine, path, chunk_size=4, column_map=column_map)
+        with engine.connect() as conn:
+            stored = conn.execute(select(func.count()).select_from(Event)).scalar()
+        if (stored, stats.chunks_skipped, stats.rows_rejected) != (10, 2, 2):
+            print(f"[ERROR] Stored {stored} events after resuming, stats {stats}")
+            return False
+        if not import_events(engine, path, chunk_size=4, column_map=column_map).already_complete:
+            print("[ERROR] A completed import was loaded again")
+            return False
+        
+        print("[OK] Event file import working correctly")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error testing event file import: {e}")
+        return False
+
+
+def test_scale_generator():
+    """Test that scale mode writes exactly the requested, reproducible, time-ordered events."""
+    print("\nTesting scale data generator...")
+
+    try:
+        import pandas as pd
+        from sqlalchemy import create_engine
+        from database.dimensions import DIMENSIONS
+        from database.models import Base
+        from utils.data_generator import generate_scale_events
+
+        frames = []
+        for _ in range(2):
+            engine = create_engine("sqlite://")
+            for dimension in DIMENSIONS.values():
+                dimension.clear()
+            Base.metadata.create_all(engine)
+            stats = generate_scale_events(engine, 5000, seed=11, days=7, chunk_size=1000)
+            if stats.rows != 5000:
+                print(f"[ERROR] Generated {stats.rows} events, expected 5000")
+                return False
+            frames.append(pd.read_sql(
+                "SELECT service_id, action_id, status_id, timestamp, journey_time, error_message_id, event_metadata "
+                "FROM events ORDER BY id", engine
+            ))
+
+        events = frames[0]
+        columns = [column for column in events.columns if column != "timestamp"]
+        if not events[columns].equals(frames[1][columns]):
+            print("[ERROR] The same seed generated different events")
+            return False
+        if not pd.to_datetime(events["timestamp"]).is_monotonic_increasing:
+            print("[ERROR] Generated events are not in time order")
+            return False
+        if set(events["status_id"]) != {1, 2, 3} or events["service_id"].nunique() != 5:
+            print("[ERROR] Generated events do not cover every status and service")
+            return False
+        if (events["journey_time"].notna() != (events["status_id"] == 1)).any():
+            print("[ERROR] Journey times must be recorded for successful events only")
+            return False
+
+        print("[OK] Scale data generator working correctly")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error testing scale data generator: {e}")
+        return False
+
+
+def test_counter_caches():
+    """Test that counter caches follow ORM inserts, updates and deletes."""
+    print("\nTesting counter caches...")
+    
+    try:
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import Session
+        from database.counters import repair_counters
+        from database.models import Base, Defect, Service, TestCase
+        
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            portal, app = Service(name="Portal", channel="web"), Service(name="App", channel="mobile")
+            session.add_all([portal, app])
+            session.flush()
+            login = TestCase(service=portal, title="Login", expected_result="Logged in", status="Passed")
+            transfer = TestCase(service_id=portal.id, title="Transfer", expected_result="Sent")
+            session.add_all([login, transfer])
+            session.flush()
+            session.add_all([
+                Defect(service_id=portal.id, test_case_id=login.id, title="Timeout", description="d", severity="Critical"),
+                Defect(service_id=portal.id, test_case_id=login.id, title="Typo", description="d", severity="Low"),
+                Defect(service_id=app.id, title="Crash", description="d", severity="High", status="Resolved"),
+            ])
+            session.commit()
+            
+            # Updates move counts between statuses and services; deletes remove them
+            transfer.status = "Failed"
+            crash = session.query(Defect).filter(Defect.title == "Crash").one()
+            crash.service_id, crash.status = portal.id, "Open"
+            session.delete(session.query(Defect).filter(Defect.title == "Typo").one())
+            session.commit()
+            
+            expected = (2, 0, 1, 1, 0, 2, 2, 1)
+            actual = (
+                portal.test_cases_count, portal.not_started_test_cases_count, portal.passed_test_cases_count,
+                portal.failed_test_cases_count, app.defects_count, portal.defects_count,
+                portal.open_defects_count, login.defects_count,
+            )
+            if actual != expected:
+                print(f"[ERROR] Counters {actual} != expected {expected}")
+                return False
+            
+            with engine.begin() as conn:
+                corrected = repair_counters(conn)
+            if any(corrected.values()):
+                print(f"[ERROR] Repair changed counters that should be consistent: {corrected}")
+                return False
+        
+        print("[OK] Counter caches working correctly")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Error testing counter caches: {e}")
+        return False
+
+
 def main():
     """Run all tests."""
     print("=" * 60)
@@ -168,6 +1152,22 @@ def main():
     results.append(("Secrets File", test_secrets_file()))
     results.append(("Database Models", test_database_models()))
     results.append(("Auth Utilities", test_auth_utilities()))
+    results.append(("Query Diagnostics", test_query_diagnostics()))
+    results.append(("Event Rollups", test_event_rollups()))
+    results.append(("Event Dimensions", test_event_dimensions()))
+    results.append(("Dashboard Summary", test_dashboard_summary()))
+    results.append(("Metadata Filters", test_metadata_filters()))
+    results.append(("Bulk Event Loader", test_bulk_load()))
+    results.append(("Columnar Event Fetch", test_columnar_fetch()))
+    results.append(("Analytics Engine", test_analytics_engine()))
+    results.append(("Event Explorer", test_event_explorer()))
+    results.append(("Event Archive", test_event_archive()))
+    results.append(("Event Deduplication", test_event_dedup()))
+    results.append(("Event Collector", test_event_collector()))
+    results.append(("Ingestion Service", test_ingest_service()))
+    results.append(("Event File Import", test_event_import()))
+    results.append(("Scale Data Generator", test_scale_generator()))
+    results.append(("Counter Caches", test_counter_caches()))
     
     print("\n" + "=" * 60)
     print("Test Results Summary")
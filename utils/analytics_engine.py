@@ -0,0 +1,122 @@
+"""
+Event analytics engine shared by the Analytics and Reports pages and the PDF report.
+
+Events are reduced in a single vectorized ``groupby`` to a small cube with
+one row per day, service, channel, action and status, holding the event
+count and journey-time count and sum. Every figure is then derived from that
+cube: the overall KPIs, the status distribution, completion rates by service,
+channel and action, and the daily series. The cube is a few thousand rows
+however many events went in, so the breakdowns cost next to nothing.
+
+``summarize_events`` takes an events frame (see ``read_events_frame``);
+``summarize_rollups`` takes hourly rollup rows (see ``load_event_rollups``),
+which are already aggregated, and gives the same figures for the same events.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Mapping
+import pandas as pd
+
+STATUSES = ["success", "error", "pending"]
+
+# Dimensions of the cube, and what each cell holds
+CUBE_KEYS = ["date", "service", "channel", "action", "status"]
+MEASURES = ["total_events", "success_count", "error_count", "pending_count", "journey_count", "journey_time_sum"]
+
+
+@dataclass
+class EventMetrics:
+    """Figures for a set of events."""
+    kpis: Dict[str, float]  # See kpis_from_totals
+    status_counts: pd.Series  # Events per status
+    by_service: pd.DataFrame  # One row per service: MEASURES plus the rates
+    by_channel: pd.DataFrame
+    by_action: pd.DataFrame
+    daily: pd.DataFrame  # date, status, count
+
+    @property
+    def total_events(self) -> int:
+        return self.kpis["total_events"]
+
+
+def kpis_from_totals(totals: Mapping) -> Dict[str, float]:
+    """
+    The KPI figures from event totals (a ``kpi_totals`` row or summed MEASURES).
+
+    Returns ``total_events``, the success, error and pending counts,
+    ``completion_rate`` and ``error_rate`` (percentages) and
+    ``avg_journey_time`` (seconds).
+    """
+    total_events = int(totals["total_events"])
+    journey_count = int(totals["journey_count"])
+    return {
+        "total_events": total_events,
+        "success_count": int(totals["success_count"]),
+        "error_count": int(totals["error_count"]),
+        "pending_count": int(totals["pending_count"]),
+        "completion_rate": float(totals["success_count"]) / total_events * 100 if total_events else 0.0,
+        "error_rate": float(totals["error_count"]) / total_events * 100 if total_events else 0.0,
+        "avg_journey_time": float(totals["journey_time_sum"]) / journey_count if journey_count else 0.0,
+    }
+
+
+def _with_rates(df: pd.DataFrame) -> pd.DataFrame:
+    """Add completion and error rates (%) and the average journey time to summed MEASURES."""
+    total = df["total_events"].where(df["total_events"] > 0)
+    journeys = df["journey_count"].where(df["journey_count"] > 0)
+    return df.assign(
+        completion_rate=(df["success_count"] / total * 100).fillna(0.0),
+        error_rate=(df["error_count"] / total * 100).fillna(0.0),
+        avg_journey_time=(df["journey_time_sum"] / journeys).fillna(0.0),
+    )
+
+
+def _breakdown(cube: pd.DataFrame, key: str) -> pd.DataFrame:
+    return _with_rates(cube.groupby(key, observed=True)[MEASURES].sum().reset_index())
+
+
+def _summarize_cube(cube: pd.DataFrame) -> EventMetrics:
+    """Derive every figure from a cube with CUBE_KEYS and ``event_count``, ``journey_count``, ``journey_time_sum``."""
+    counts = cube["event_count"]
+    cube = cube.rename(columns={"event_count": "total_events"}).assign(**{
+        f"{status}_count": counts.where(cube["status"] == status, 0) for status in STATUSES
+    })
+    return EventMetrics(
+        kpis=kpis_from_totals(cube[MEASURES].sum()),
+        status_counts=cube.groupby("status", observed=True)["total_events"].sum().sort_values(ascending=False),
+        by_service=_breakdown(cube, "service"),
+        by_channel=_breakdown(cube, "channel"),
+        by_action=_breakdown(cube, "action"),
+        daily=cube.groupby(["date", "status"], observed=True)["total_events"].sum().reset_index(name="count"),
+    )
+
+
+def _empty_cube() -> pd.DataFrame:
+    columns: List[str] = CUBE_KEYS + ["event_count", "journey_count", "journey_time_sum"]
+    return pd.DataFrame({column: pd.Series(dtype="int64" if column.endswith("count") else object) for column in columns})
+
+
+def summarize_events(df: pd.DataFrame) -> EventMetrics:
+    """All figures for an events frame (``service``, ``channel``, ``action``, ``status``, ``timestamp``, ``journey_time``)."""
+    if df.empty:
+        return _summarize_cube(_empty_cube())
+    day = pd.to_datetime(df["timestamp"]).dt.normalize().rename("date")
+    cube = (
+        df.groupby([day, *CUBE_KEYS[1:]], observed=True, dropna=False)["journey_time"]
+        .agg(event_count="size", journey_count="count", journey_time_sum="sum")
+        .reset_index()
+    )
+    return _summarize_cube(cube)
+
+
+def summarize_rollups(df: pd.DataFrame) -> EventMetrics:
+    """All figures for hourly rollup rows (with ``service`` and ``channel`` joined in)."""
+    if df.empty:
+        return _summarize_cube(_empty_cube())
+    day = pd.to_datetime(df["hour"]).dt.normalize().rename("date")
+    cube = (
+        df.groupby([day, *CUBE_KEYS[1:]], observed=True, dropna=False)
+        [["event_count", "journey_count", "journey_time_sum"]]
+        .sum()
+        .reset_index()
+    )
+    return _summarize_cube(cube)
@@ -1,12 +1,78 @@
 """
 Sample data generator for testing and demonstration.
+
+``generate_sample_data`` seeds an empty database with a small demo data set.
+``generate_scale_events`` adds any number of realistic events for
+performance testing (``python manage.py generate-events --rows 10000000``):
+columns are drawn with NumPy a chunk at a time and streamed through the bulk
+loader, so memory stays bounded and a seed reproduces the same data.
 """
 import random
+import time
 from datetime import datetime, timedelta
-from database.connection import get_session
+from typing import Callable, List, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from config.settings import get_archive_config
+from database.archive import clear_archive
+from database.bulk_load import DEFAULT_BATCH_SIZE, LoadStats, load_frame
+from database.connection import get_engine, get_session
 from database.models import Service, Event, TestCase, Defect
+from database.rollups import reset_rollups
+from database.summary import refresh_dashboard_summary
 from utils.logger import logger
 
+SAMPLE_SERVICES = [
+    {"name": "Online Banking Portal", "channel": "web", "description": "Customer banking portal"},
+    {"name": "Mobile Banking App", "channel": "mobile", "description": "iOS and Android mobile app"},
+    {"name": "Payment Gateway API", "channel": "api", "description": "RESTful payment processing API"},
+    {"name": "Customer Support Chat", "channel": "web", "description": "Live chat support system"},
+    {"name": "Loan Application System", "channel": "web", "description": "Digital loan application platform"}
+]
+
+# Scale mode: share of traffic, baseline error and pending rates, log-normal
+# journey times (median seconds, sigma) and action mix per sample service
+SERVICE_PROFILES = {
+    "Online Banking Portal": {
+        "traffic": 0.35, "error_rate": 0.04, "pending_rate": 0.03, "journey_median": 18.0, "journey_sigma": 0.6,
+        "actions": {"login": 0.35, "view_statement": 0.30, "transfer": 0.20, "payment": 0.15},
+    },
+    "Mobile Banking App": {
+        "traffic": 0.30, "error_rate": 0.06, "pending_rate": 0.04, "journey_median": 12.0, "journey_sigma": 0.7,
+        "actions": {"login": 0.40, "transfer": 0.25, "payment": 0.20, "view_statement": 0.15},
+    },
+    "Payment Gateway API": {
+        "traffic": 0.20, "error_rate": 0.02, "pending_rate": 0.05, "journey_median": 1.5, "journey_sigma": 0.5,
+        "actions": {"payment": 0.60, "checkout": 0.40},
+    },
+    "Customer Support Chat": {
+        "traffic": 0.08, "error_rate": 0.08, "pending_rate": 0.03, "journey_median": 240.0, "journey_sigma": 0.9,
+        "actions": {"chat_start": 0.50, "chat_end": 0.50},
+    },
+    "Loan Application System": {
+        "traffic": 0.07, "error_rate": 0.10, "pending_rate": 0.08, "journey_median": 600.0, "journey_sigma": 0.8,
+        "actions": {"apply_loan": 0.70, "login": 0.30},
+    },
+}
+
+ERROR_MESSAGES = ["Error: Timeout", "Error: Validation failed", "Error: Network error", "Error: Invalid input"]
+ERROR_WEIGHTS = [0.30, 0.30, 0.20, 0.20]
+# During an incident most failures are timeouts and network errors
+INCIDENT_ERROR_WEIGHTS = [0.60, 0.05, 0.30, 0.05]
+
+APP_VERSIONS = {"3.8.2": 0.15, "3.9.0": 0.35, "4.0.1": 0.50}
+REGIONS = {"eu-west": 0.50, "us-east": 0.35, "ap-south": 0.15}
+DEVICES = {"web": {"desktop": 0.75, "tablet": 0.25}, "mobile": {"ios": 0.55, "android": 0.45}, "api": {"server": 1.0}}
+
+# Events generated and committed at a time in scale mode
+SCALE_CHUNK_SIZE = 100_000
+
+# Incidents per service per week, and their length in minutes
+INCIDENTS_PER_WEEK = 1.0
+INCIDENT_MINUTES = (15, 180)
+
 
 def generate_sample_data():
     """Generate sample data for demonstration."""
@@ -19,16 +85,8 @@ def generate_sample_data():
                 return "Sample data already exists."
 
             # Create Services
-            services_data = [
-                {"name": "Online Banking Portal", "channel": "web", "description": "Customer banking portal"},
-                {"name": "Mobile Banking App", "channel": "mobile", "description": "iOS and Android mobile app"},
-                {"name": "Payment Gateway API", "channel": "api", "description": "RESTful payment processing API"},
-                {"name": "Customer Support Chat", "channel": "web", "description": "Live chat support system"},
-                {"name": "Loan Application System", "channel": "web", "description": "Digital loan application platform"}
-            ]
-
             services = []
-            for svc_data in services_data:
+            for svc_data in SAMPLE_SERVICES:
                 service = Service(**svc_data)
                 session.add(service)
                 services.append(service)
@@ -38,6 +96,9 @@ def generate_sample_data():
             actions = ["login", "checkout", "payment", "transfer", "view_statement", "apply_loan", "chat_start", "chat_end"]
             statuses = ["success", "error", "pending"]
             status_weights = [0.85, 0.10, 0.05]  # 85% success, 10% error, 5% pending
+            app_versions = ["3.8.2", "3.9.0", "4.0.1"]
+            regions = ["eu-west", "us-east", "ap-south"]
+            devices = {"web": ["desktop", "tablet"], "mobile": ["ios", "android"], "api": ["server"]}
 
             events = []
             for _ in range(1000):  # Generate 1000 events
@@ -51,6 +112,11 @@ def generate_sample_data():
                 )
                 journey_time = random.uniform(2.0, 120.0) if status == "success" else None
                 error_message = f"Error: {random.choice(['Timeout', 'Validation failed', 'Network error', 'Invalid input'])}" if status == "error" else None
+                event_metadata = {
+                    "app_version": random.choice(app_versions),
+                    "region": random.choice(regions),
+                    "device": random.choice(devices[service.channel]),
+                }
 
                 event = Event(
                     service_id=service.id,
@@ -58,7 +124,8 @@ def generate_sample_data():
                     status=status,
                     timestamp=timestamp,
                     journey_time=journey_time,
-                    error_message=error_message
+                    error_message=error_message,
+                    event_metadata=event_metadata
                 )
                 events.append(event)
 
@@ -110,13 +177,157 @@ def generate_sample_data():
 
             # Context manager will commit automatically
             logger.info("Sample data generated successfully")
-            return "Sample data generated successfully!"
+
+        # Show the new data on the dashboard without waiting for the scheduler
+        refresh_dashboard_summary(get_engine())
+        return "Sample data generated successfully!"
 
     except Exception as e:
         logger.error(f"Error generating sample data: {e}")
         raise
 
 
+def _diurnal(hours: np.ndarray) -> np.ndarray:
+    """Relative traffic by hour of day: quiet nights, a late-morning peak and a smaller evening one."""
+    return 0.1 + np.exp(-(((hours - 11.0) / 3.0) ** 2)) + 0.7 * np.exp(-(((hours - 20.0) / 2.5) ** 2))
+
+
+def _cdf(weights: List[float]) -> np.ndarray:
+    """Cumulative probabilities from relative weights."""
+    weights = np.asarray(weights, dtype=float)
+    return np.cumsum(weights / weights.sum())
+
+
+def _pick(rng: np.random.Generator, cdfs: np.ndarray) -> np.ndarray:
+    """One category index per row of ``cdfs`` (a cumulative distribution per row)."""
+    return (rng.random(len(cdfs))[:, None] >= cdfs[:, :-1]).sum(axis=1)
+
+
+def _ensure_sample_services(engine: Engine) -> List[Service]:
+    """The sample services, created if missing (existing services and events are kept)."""
+    with Session(engine, expire_on_commit=False) as session:
+        existing = {service.name: service for service in session.query(Service)}
+        for svc_data in SAMPLE_SERVICES:
+            if svc_data["name"] not in existing:
+                existing[svc_data["name"]] = Service(**svc_data)
+                session.add(existing[svc_data["name"]])
+        session.commit()
+        return [existing[svc_data["name"]] for svc_data in SAMPLE_SERVICES]
+
+
+def generate_scale_events(
+    engine: Engine,
+    rows: int,
+    seed: int = 0,
+    days: int = 30,
+    chunk_size: int = SCALE_CHUNK_SIZE,
+    on_chunk: Optional[Callable[[LoadStats], None]] = None,
+) -> LoadStats:
+    """
+    Add ``rows`` events spread over the last ``days`` days to the sample services.
+
+    Traffic follows a daily curve (quieter at weekends). Each service has its
+    own traffic share, error rate, action mix and log-normal journey times,
+    and suffers about one incident a week: for 15 minutes to 3 hours its
+    traffic rises, 30-70% of its events fail, mostly with timeouts, and
+    successful journeys take twice as long. Events are generated in time
+    order, ``chunk_size`` rows at a time, and each chunk is committed with the
+    bulk loader; ``on_chunk(stats)`` reports progress. The same ``seed``,
+    ``days`` and ``chunk_size`` reproduce the same events, relative to now.
+    """
+    rng = np.random.default_rng(seed)
+    services = _ensure_sample_services(engine)
+    profiles = [SERVICE_PROFILES[service.name] for service in services]
+    service_ids = np.array([service.id for service in services])
+
+    # Traffic, error rate and slowdown per (minute, service) over the window
+    end = datetime.now().replace(second=0, microsecond=0)
+    start = end - timedelta(days=days)
+    minutes = np.arange(days * 24 * 60)
+    minute_of_week = start.weekday() * 1440 + start.hour * 60 + start.minute + minutes
+    weekend = (minute_of_week // 1440) % 7 >= 5
+    base = _diurnal((minute_of_week % 1440) / 60.0) * np.where(weekend, 0.6, 1.0)
+    traffic = base[:, None] * np.array([profile["traffic"] for profile in profiles])[None, :]
+    error_rate = np.tile([profile["error_rate"] for profile in profiles], (len(minutes), 1))
+    slowdown = np.ones_like(traffic)
+    incident = np.zeros(traffic.shape, dtype=bool)
+    for s in range(len(services)):
+        for _ in range(rng.poisson(INCIDENTS_PER_WEEK * days / 7)):
+            first = rng.integers(len(minutes))
+            window = slice(first, first + rng.integers(*INCIDENT_MINUTES))
+            traffic[window, s] *= rng.uniform(1.5, 3.0)
+            error_rate[window, s] = rng.uniform(0.3, 0.7)
+            slowdown[window, s] = 2.0
+            incident[window, s] = True
+
+    # Exactly ``rows`` events, split into chunks of whole minutes so timestamps only increase
+    counts = rng.multinomial(rows, (traffic / traffic.sum()).ravel()).reshape(traffic.shape)
+    per_minute = np.cumsum(counts.sum(axis=1))
+    bounds = [0, *(np.searchsorted(per_minute, np.arange(chunk_size, rows, chunk_size)) + 1), len(minutes)]
+
+    actions = sorted({action for profile in profiles for action in profile["actions"]})
+    action_cdfs = np.array([_cdf([profile["actions"].get(action, 0.0) for action in actions]) for profile in profiles])
+    pending_rate = np.array([profile["pending_rate"] for profile in profiles])
+    journey_median = np.array([profile["journey_median"] for profile in profiles])
+    journey_sigma = np.array([profile["journey_sigma"] for profile in profiles])
+    error_cdfs = np.array([_cdf(ERROR_WEIGHTS), _cdf(INCIDENT_ERROR_WEIGHTS)])
+    # Metadata combinations, weighted per service by its channel's devices; rows share these dicts
+    devices = sorted({device for weights in DEVICES.values() for device in weights})
+    metadata = [
+        {"app_version": version, "region": region, "device": device}
+        for version in APP_VERSIONS for region in REGIONS for device in devices
+    ]
+    metadata_cdfs = np.array([
+        _cdf([
+            APP_VERSIONS[m["app_version"]] * REGIONS[m["region"]] * DEVICES[svc_data["channel"]].get(m["device"], 0.0)
+            for m in metadata
+        ])
+        for svc_data in SAMPLE_SERVICES
+    ])
+    metadata = np.array(metadata, dtype=object)
+
+    stats = LoadStats()
+    started = time.perf_counter()
+    start64 = np.datetime64(start, "us")
+    for low, high in zip(bounds, bounds[1:]):
+        cells = counts[low:high].ravel()
+        if not cells.sum():
+            continue
+        cell = np.repeat(np.arange(len(cells)), cells)
+        minute, s = low + cell // len(services), cell % len(services)
+        n = len(cell)
+
+        offsets = minute * 60_000_000 + rng.integers(0, 60_000_000, n)
+        order = np.argsort(offsets, kind="stable")
+        minute, s, offsets = minute[order], s[order], offsets[order]
+
+        draw = rng.random(n)
+        failed = error_rate[minute, s]
+        status = np.where(draw < failed, 1, np.where(draw < failed + pending_rate[s], 2, 0))
+        journey_time = journey_median[s] * slowdown[minute, s] * np.exp(journey_sigma[s] * rng.standard_normal(n))
+        error = np.where(status == 1, _pick(rng, error_cdfs[incident[minute, s].astype(int)]), -1)
+
+        frame = pd.DataFrame({
+            "service_id": service_ids[s],
+            "action": pd.Categorical.from_codes(_pick(rng, action_cdfs[s]), categories=actions),
+            "status": pd.Categorical.from_codes(status, categories=["success", "error", "pending"]),
+            "timestamp": start64 + offsets.astype("timedelta64[us]"),
+            "journey_time": np.where(status == 0, journey_time.round(3), np.nan),
+            "error_message": pd.Categorical.from_codes(error, categories=ERROR_MESSAGES),
+            "event_metadata": metadata[_pick(rng, metadata_cdfs[s])],
+        })
+        with engine.begin() as conn:
+            loaded = load_frame(conn, frame, DEFAULT_BATCH_SIZE)
+        stats.rows += loaded.rows
+        stats.batches += loaded.batches
+        stats.seconds = time.perf_counter() - started
+        if on_chunk:
+            on_chunk(stats)
+
+    logger.info(f"Generated {stats}")
+    return stats
+
+
 def clear_all_data():
     """Clear all data from database (use with caution)."""
     try:
@@ -124,10 +335,14 @@ def clear_all_data():
             session.query(Defect).delete()
             session.query(TestCase).delete()
             session.query(Event).delete()
+            reset_rollups(session.connection())
             session.query(Service).delete()
             # Context manager will commit automatically
             logger.info("All data cleared")
-            return "All data cleared successfully!"
+
+        clear_archive(get_archive_config()["path"])
+        refresh_dashboard_summary(get_engine())
+        return "All data cleared successfully!"
     except Exception as e:
         logger.error(f"Error clearing data: {e}")
         raise
@@ -395,3 +395,39 @@ def apply_chart_theme(fig):
     fig.update_yaxes(showgrid=True, gridcolor='rgba(51, 65, 85, 0.3)')
     
     return fig
+
+
+def render_performance_panel(query_log, pool_stats=None):
+    """Render the per-rerun SQL statistics in a collapsed sidebar section."""
+    with st.sidebar.expander("⏱️ Performance", expanded=False):
+        col1, col2 = st.columns(2)
+        col1.metric("Queries", query_log.query_count)
+        col2.metric("DB Time", f"{query_log.total_ms:.0f} ms")
+        col1.metric("Rows", "n/a" if query_log.total_rows is None else f"{query_log.total_rows:,}")
+        col2.metric("Rerun", f"{query_log.elapsed_ms():.0f} ms")
+
+        for problem in query_log.violations():
+            st.warning(problem)
+
+        if query_log.records:
+            slowest = sorted(query_log.records, key=lambda r: r.duration_ms, reverse=True)[:20]
+            st.dataframe(
+                [
+                    {
+                        "ms": round(r.duration_ms, 2),
+                        "rows": r.rows,
+                        "statement": " ".join(r.statement.split())[:300],
+                    }
+                    for r in slowest
+                ],
+                use_container_width=True,
+                hide_index=True,
+            )
+
+        if pool_stats:
+            st.caption(
+                "Pool: " + ", ".join(
+                    f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}"
+                    for key, value in pool_stats.items()
+                )
+            )
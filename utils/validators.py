@@ -3,6 +3,20 @@ Input validation utilities.
 """
 from datetime import datetime
 from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+from dateutil import tz
+
+EVENT_STATUSES = ["success", "error", "pending"]
+
+# Longest action name the event_actions table holds
+MAX_ACTION_LENGTH = 200
+
+# Longest Event.client_event_id
+MAX_CLIENT_EVENT_ID_LENGTH = 100
+
+# An ISO 8601 time ending in a UTC offset ("Z", "+02:00", "-0530", "+02")
+_UTC_OFFSET = r"\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?\s*(?:[Zz]|[+-]\d{2}(?::?\d{2})?)$"
 
 
 def validate_date_range(start_date: Optional[datetime], end_date: Optional[datetime]) -> Tuple[bool, str]:
@@ -35,4 +49,97 @@ def validate_status(status: str, valid_statuses: list) -> Tuple[bool, str]:
     return True, ""
 
 
+def validate_event_frame(
+    df: pd.DataFrame, default_timestamp: Optional[datetime] = None
+) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Validate a batch of events column by column.
+
+    Expects ``service`` (name) or ``service_id``, ``action``, and optionally
+    ``status`` (default "success"), ``timestamp`` (ISO 8601; missing ones
+    get ``default_timestamp`` if given),
+    ``journey_time``, ``error_message``, ``event_metadata`` (a dict) and
+    ``client_event_id``. Events with a ``client_event_id`` must carry their
+    own timestamp, since the id is only unique together with it.
+
+    Timestamps are stored as naive local time, like ``datetime.now()``, the
+    date filters and the rollup hours everywhere else in the app: one with a
+    UTC offset is converted to the host's local time zone, one without is
+    taken as local time already.
+
+    Returns the valid rows with normalised columns, and the first error of
+    each rejected row indexed like ``df``.
+    """
+    df = df.copy()
+    errors = np.full(len(df), None, dtype=object)
+
+    def reject(mask: pd.Series, message: str) -> None:
+        # Comparisons with missing values leave NA in the mask
+        rows = mask.fillna(False).to_numpy(dtype=bool)
+        errors[rows & pd.isna(errors)] = message
+
+    def column(name: str) -> pd.Series:
+        return df[name] if name in df.columns else pd.Series(None, index=df.index, dtype=object)
+
+    service, service_id = column("service"), column("service_id")
+    reject(service.isna() & service_id.isna(), "service or service_id is required")
+    # True would otherwise count as service 1
+    is_bool = service_id.map(lambda value: isinstance(value, (bool, np.bool_))).astype(bool)
+    numeric_ids = pd.to_numeric(service_id.where(~is_bool), errors="coerce").astype("float64")
+    # Out of the int64 range the cast below raises instead of rejecting the row
+    is_id = np.isfinite(numeric_ids) & (numeric_ids % 1 == 0) & (numeric_ids.abs() < 2 ** 63)
+    reject(service_id.notna() & ~is_id, "service_id must be an integer")
+    df["service_id"] = numeric_ids.where(is_id).astype("Int64")
+    df["service"] = service.where(service.isna(), service.astype(str))
+
+    action = column("action")
+    is_text = action.map(lambda value: isinstance(value, str)).astype(bool)
+    # .str only on the text values: a batch of numeric actions has no string column
+    text = action[is_text].astype(str).str.strip()
+    length = text.str.len().reindex(action.index)
+    reject(~is_text | (length == 0), "action is required")
+    reject(length > MAX_ACTION_LENGTH, f"action must be at most {MAX_ACTION_LENGTH} characters")
+    df["action"] = action.where(~is_text, text)
+
+    status = column("status").fillna("success")
+    reject(~status.isin(EVENT_STATUSES), f"status must be one of: {', '.join(EVENT_STATUSES)}")
+    df["status"] = status
+
+    client_event_id = column("client_event_id").astype(object)
+    is_key = client_event_id.map(lambda value: isinstance(value, (str, int)) and not isinstance(value, bool))
+    reject(client_event_id.notna() & ~is_key, "client_event_id must be text")
+    client_event_id = client_event_id.where(client_event_id.isna(), client_event_id.astype(str))
+    reject(client_event_id.dropna().astype(str).str.len().reindex(client_event_id.index) > MAX_CLIENT_EVENT_ID_LENGTH,
+           f"client_event_id must be at most {MAX_CLIENT_EVENT_ID_LENGTH} characters")
+    df["client_event_id"] = client_event_id
+
+    raw_timestamp = column("timestamp")
+    # Parsed as UTC so mixed offsets fit one column; naive values keep their wall time
+    parsed = pd.to_datetime(raw_timestamp, errors="coerce", format="ISO8601", utc=True)
+    is_text = raw_timestamp.map(lambda value: isinstance(value, str)).astype(bool)
+    has_offset = raw_timestamp[is_text].astype(str).str.strip().str.contains(_UTC_OFFSET).reindex(df.index, fill_value=False)
+    has_offset |= raw_timestamp.map(lambda value: getattr(value, "tzinfo", None) is not None).astype(bool)
+    timestamp = parsed.dt.tz_localize(None).where(~has_offset, parsed.dt.tz_convert(tz.tzlocal()).dt.tz_localize(None))
+    reject(raw_timestamp.isna() & client_event_id.notna(), "timestamp is required with client_event_id")
+    if default_timestamp is not None:
+        timestamp = timestamp.where(raw_timestamp.notna(), pd.Timestamp(default_timestamp))
+    reject(raw_timestamp.isna() & timestamp.isna(), "timestamp is required")
+    reject(raw_timestamp.notna() & timestamp.isna(), "timestamp must be an ISO 8601 date and time")
+    df["timestamp"] = timestamp
+
+    raw_journey_time = column("journey_time")
+    journey_time = pd.to_numeric(raw_journey_time, errors="coerce")
+    reject(raw_journey_time.notna() & journey_time.isna(), "journey_time must be a number")
+    reject(journey_time < 0, "journey_time must not be negative")
+    df["journey_time"] = journey_time
+
+    error_message = column("error_message")
+    reject(error_message.notna() & ~error_message.map(lambda value: isinstance(value, str)), "error_message must be text")
+    df["error_message"] = error_message
+
+    metadata = column("event_metadata")
+    reject(metadata.notna() & ~metadata.map(lambda value: isinstance(value, dict)), "event_metadata must be an object")
+    df["event_metadata"] = metadata
 
+    invalid = ~pd.isna(errors)
+    return df[~invalid], pd.Series(errors[invalid], index=df.index[invalid], dtype=object)